@@ -17,11 +17,11 @@ from pydantic import BaseModel, EmailStr, Field
 
 from app.middleware.auth import AuthUser, require_admin
 from app.services.drive import DriveManager
-from app.utils.db import (
-    create_courtier,
+from app.utils.db_async import (
+    create_courtier as db_create_courtier,
     get_all_courtiers,
     get_courtier_by_id,
-    update_courtier,
+    update_courtier as db_update_courtier,
 )
 
 logger = structlog.get_logger()
@@ -80,7 +80,7 @@ async def list_courtiers(admin: AuthUser = Depends(require_admin)):
     try:
         logger.info("Récupération liste courtiers (admin)", admin_email=admin.email)
 
-        courtiers = get_all_courtiers()
+        courtiers = await get_all_courtiers()
 
         response = []
         for courtier in courtiers:
@@ -157,7 +157,7 @@ async def create_courtier(
             'actif': data.actif
         }
 
-        courtier = create_courtier(courtier_data)
+        courtier = await db_create_courtier(courtier_data)
 
         logger.info(
             "Courtier créé",
@@ -207,7 +207,7 @@ async def get_courtier(
         Détails du courtier
     """
     try:
-        courtier = get_courtier_by_id(courtier_id)
+        courtier = await get_courtier_by_id(courtier_id)
 
         if not courtier:
             raise HTTPException(
@@ -259,7 +259,7 @@ async def update_courtier(
     """
     try:
         # Vérifier que le courtier existe
-        courtier = get_courtier_by_id(courtier_id)
+        courtier = await get_courtier_by_id(courtier_id)
 
         if not courtier:
             raise HTTPException(
@@ -281,7 +281,7 @@ async def update_courtier(
 
         # Appliquer updates
         if updates:
-            courtier = update_courtier(courtier_id, updates)
+            courtier = await db_update_courtier(courtier_id, updates)
             logger.info(
                 "Courtier mis à jour",
                 courtier_id=str(courtier_id),
@@ -289,7 +289,7 @@ async def update_courtier(
             )
         else:
             # Pas de changements
-            courtier = get_courtier_by_id(courtier_id)
+            courtier = await get_courtier_by_id(courtier_id)
 
         return CourtierResponse(
             id=courtier.get('id'),
@@ -16,10 +16,10 @@ import structlog
 from fastapi import APIRouter, HTTPException, status
 
 from app.services.notification import NotificationService
-from app.utils.db import (
+from app.utils.db_async import (
     get_all_courtiers_actifs,
     get_clients_modified_since,
-    get_pieces_dossier,
+    get_piece_counters,
     get_type_piece,
 )
 
@@ -49,7 +49,7 @@ async def send_daily_reports() -> Dict:
         logger.info("Début génération rapports quotidiens")
 
         notif = NotificationService()
-        courtiers = get_all_courtiers_actifs()
+        courtiers = await get_all_courtiers_actifs()
 
         if not courtiers:
             logger.info("Aucun courtier actif, pas de rapport à envoyer")
@@ -68,7 +68,7 @@ async def send_daily_reports() -> Dict:
             courtier_id = UUID(courtier.get('id'))
 
             # Récupérer clients modifiés aujourd'hui
-            clients_modified = get_clients_modified_since(
+            clients_modified = await get_clients_modified_since(
                 courtier_id,
                 since_datetime
             )
@@ -84,18 +84,12 @@ async def send_daily_reports() -> Dict:
             # Générer tableau HTML avec détails
             rows_html = []
             for client in clients_modified:
-                client_id = UUID(client.get('id'))
-                pieces = get_pieces_dossier(client_id)
-
-                nb_total = len(pieces)
-                nb_recues = sum(1 for p in pieces if p.get('statut') == 'recue')
-                nb_manquantes = sum(1 for p in pieces if p.get('statut') == 'manquante')
-                nb_non_conformes = sum(
-                    1 for p in pieces
-                    if p.get('statut') in ['non_conforme', 'non_reconnu']
-                )
-
-                progression = round((nb_recues / nb_total) * 100, 1) if nb_total > 0 else 0
+                counters = get_piece_counters(client)
+                nb_total = counters['total']
+                nb_recues = counters['recues']
+                nb_manquantes = counters['manquantes']
+                nb_non_conformes = counters['non_conformes']
+                progression = counters['pourcentage_completion']
 
                 rows_html.append(f"""
                     <tr>
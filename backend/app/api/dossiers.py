@@ -11,19 +11,23 @@ Authentification: JWT Supabase obligatoire
 Accès: Courtier ne voit que ses propres dossiers
 """
 
-from typing import List, Optional
+import base64
+import json
+from typing import Any, List, Optional, Tuple
 from uuid import UUID
 
 import structlog
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from pydantic import BaseModel, Field
 
 from app.middleware.auth import AuthUser, get_current_user
 from app.services.drive import DriveManager
 from app.services.report import ReportGenerator
-from app.utils.db import (
+from app.utils.db_async import (
+    DOSSIER_SORT_KEYS,
     get_client_by_id,
-    get_clients_by_courtier,
+    get_dossiers_with_stats,
+    get_piece_counters,
     get_pieces_dossier,
     get_type_piece,
     log_activity,
@@ -40,15 +44,15 @@ router = APIRouter(prefix="/api/dossiers", tags=["dossiers"])
 
 
 class DossierSummary(BaseModel):
-    """Résumé d'un dossier pour liste."""
+    """Résumé d'un dossier pour liste (champs partiels avec fields=)."""
     id: str
-    nom: str
-    prenom: str
-    email_principal: str
-    type_pret: str
-    statut: str
-    created_at: str
-    updated_at: str
+    nom: Optional[str] = None
+    prenom: Optional[str] = None
+    email_principal: Optional[str] = None
+    type_pret: Optional[str] = None
+    statut: Optional[str] = None
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
     nb_pieces_total: int = 0
     nb_pieces_recues: int = 0
     pourcentage_completion: float = 0.0
@@ -104,23 +108,92 @@ class DossierValidateRequest(BaseModel):
 # =============================================================================
 
 
-@router.get("/", response_model=List[DossierSummary])
+# Taille de page quand seul cursor est fourni
+DEFAULT_PAGE_SIZE = 50
+
+
+def _encode_cursor(sort: str, sort_value: Any, dossier_id: str) -> str:
+    """Curseur opaque de la page suivante : tri, (valeur de tri, id) du dernier dossier."""
+    raw = json.dumps([sort, sort_value, dossier_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str, sort: str) -> Tuple[Any, str]:
+    """Décode un curseur émis pour le tri sort ; HTTP 400 s'il est invalide."""
+    try:
+        cursor_sort, sort_value, dossier_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode("ascii"))
+        )
+        after = sort_value, str(UUID(str(dossier_id)))
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Curseur de pagination invalide"
+        )
+
+    if cursor_sort != sort:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Curseur émis pour un autre tri ({cursor_sort})"
+        )
+    return after
+
+
+@router.get("/", response_model=List[DossierSummary], response_model_exclude_unset=True)
 async def list_dossiers(
+    response: Response,
     statut: Optional[str] = Query(None, description="Filtrer par statut (en_cours, termine, annule)"),
+    q: Optional[str] = Query(None, min_length=2, description="Recherche dans nom, prénom et email"),
+    sort: str = Query("-created_at", description="Tri: created_at, updated_at, nom, pourcentage_completion (préfixe '-' = décroissant)"),
+    limit: Optional[int] = Query(None, ge=1, le=200, description="Nombre de dossiers par page (sans limit ni cursor : liste complète)"),
+    cursor: Optional[str] = Query(None, description="Curseur de page (en-tête X-Next-Cursor de la réponse précédente)"),
+    fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules (ex: id,nom,prenom)"),
     user: AuthUser = Depends(get_current_user)
 ):
     """
-    Liste les dossiers du courtier authentifié.
+    Liste les dossiers du courtier authentifié, page par page.
 
     Pour les admins : retourne TOUS les dossiers de TOUS les courtiers.
     Pour les courtiers : retourne seulement leurs dossiers.
 
     Filtres disponibles:
     - statut: Filtrer par statut (en_cours, termine, annule)
+    - q: Recherche texte (nom, prénom, email)
+
+    Pagination par curseur (optionnelle) : avec limit ou cursor, tant
+    qu'il reste des dossiers, la réponse porte l'en-tête X-Next-Cursor, à
+    passer en paramètre cursor. Sans l'un ni l'autre, tous les dossiers
+    sont retournés.
 
     Returns:
         Liste des dossiers (résumés)
     """
+    sort_key = sort.lstrip("-")
+    if sort_key not in DOSSIER_SORT_KEYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tri invalide ({', '.join(DOSSIER_SORT_KEYS)})"
+        )
+
+    # Projection : champs demandés + id et clé de tri (nécessaires au curseur)
+    summary_fields = list(DossierSummary.model_fields)
+    if fields:
+        requested = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in requested if f not in summary_fields]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Champs inconnus: {', '.join(unknown)}"
+            )
+        requested = ["id"] + [f for f in requested if f != "id"]
+    else:
+        requested = summary_fields
+    columns = ",".join(dict.fromkeys(requested + [sort_key]))
+
+    after = _decode_cursor(cursor, sort) if cursor else None
+    if limit is None and cursor:
+        limit = DEFAULT_PAGE_SIZE
+
     try:
         courtier_id = user.courtier_id
 
@@ -132,14 +205,6 @@ async def list_dossiers(
                     admin_email=user.email,
                     statut_filtre=statut
                 )
-                # Récupérer tous les clients (tous courtiers)
-                from app.utils.db import get_db
-                db = get_db()
-                query = db.table("clients").select("*")
-                if statut:
-                    query = query.eq("statut", statut)
-                response = query.order("created_at", desc=True).execute()
-                clients = response.data
             else:
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
@@ -151,33 +216,28 @@ async def list_dossiers(
                 courtier_id=str(courtier_id),
                 statut_filtre=statut
             )
-            # Récupérer clients du courtier
-            clients = get_clients_by_courtier(courtier_id, statut)
-
-        # Transformer en résumés
-        dossiers = []
-
-        for client in clients:
-            # Calculer stats pièces
-            pieces = get_pieces_dossier(UUID(client.get('id')))
-
-            nb_total = len(pieces)
-            nb_recues = sum(1 for p in pieces if p.get('statut') == 'recue')
-            pourcentage = round((nb_recues / nb_total) * 100, 1) if nb_total > 0 else 0
-
-            dossiers.append(DossierSummary(
-                id=client.get('id'),
-                nom=client.get('nom'),
-                prenom=client.get('prenom', ''),
-                email_principal=client.get('email_principal'),
-                type_pret=client.get('type_pret'),
-                statut=client.get('statut'),
-                created_at=client.get('created_at'),
-                updated_at=client.get('updated_at'),
-                nb_pieces_total=nb_total,
-                nb_pieces_recues=nb_recues,
-                pourcentage_completion=pourcentage
-            ))
+
+        # Une page + 1 élément (présence d'une page suivante), compteurs inclus
+        clients = await get_dossiers_with_stats(
+            courtier_id,
+            statut,
+            search=q,
+            sort=sort,
+            limit=limit + 1 if limit else None,
+            after=after,
+            columns=columns
+        )
+
+        if limit and len(clients) > limit:
+            clients = clients[:limit]
+            last = clients[-1]
+            response.headers["X-Next-Cursor"] = _encode_cursor(sort, last.get(sort_key), last.get('id'))
+
+        # Transformer en résumés (seulement les champs demandés)
+        dossiers = [
+            DossierSummary(**{field: client.get(field) for field in requested})
+            for client in clients
+        ]
 
         logger.info(
             "Dossiers récupérés",
@@ -187,6 +247,8 @@ async def list_dossiers(
 
         return dossiers
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(
             "Erreur récupération dossiers",
@@ -221,7 +283,7 @@ async def get_dossier(
     """
     try:
         # Récupérer client
-        client = get_client_by_id(dossier_id)
+        client = await get_client_by_id(dossier_id)
 
         if not client:
             raise HTTPException(
@@ -243,16 +305,13 @@ async def get_dossier(
             )
 
         # Récupérer pièces
-        pieces_raw = get_pieces_dossier(dossier_id)
+        pieces_raw = await get_pieces_dossier(dossier_id)
 
         # Récupérer DriveManager pour les liens
         drive = DriveManager()
 
         # Transformer en modèles
         pieces = []
-        nb_recues = 0
-        nb_manquantes = 0
-        nb_non_conformes = 0
 
         for piece in pieces_raw:
             type_piece = piece.get('types_pieces', {})
@@ -261,7 +320,7 @@ async def get_dossier(
             # Récupérer nom pièce si pas dans jointure
             type_piece_nom = type_piece.get('nom') if type_piece else None
             if not type_piece_nom and type_piece_id:
-                type_piece_data = get_type_piece(UUID(type_piece_id))
+                type_piece_data = await get_type_piece(UUID(type_piece_id))
                 type_piece_nom = type_piece_data.get('nom') if type_piece_data else None
 
             piece_detail = PieceDetail(
@@ -279,17 +338,8 @@ async def get_dossier(
 
             pieces.append(piece_detail)
 
-            # Compter statuts
-            statut = piece.get('statut')
-            if statut == 'recue':
-                nb_recues += 1
-            elif statut == 'manquante':
-                nb_manquantes += 1
-            elif statut in ['non_conforme', 'non_reconnu']:
-                nb_non_conformes += 1
-
-        nb_total = len(pieces)
-        pourcentage = round((nb_recues / nb_total) * 100, 1) if nb_total > 0 else 0
+        # Compteurs tenus à jour par trigger sur pieces_dossier
+        counters = get_piece_counters(client)
 
         # Récupérer lien rapport si disponible
         rapport_url = None
@@ -315,18 +365,18 @@ async def get_dossier(
             created_at=client.get('created_at'),
             updated_at=client.get('updated_at'),
             pieces=pieces,
-            nb_pieces_total=nb_total,
-            nb_pieces_recues=nb_recues,
-            nb_pieces_manquantes=nb_manquantes,
-            nb_pieces_non_conformes=nb_non_conformes,
-            pourcentage_completion=pourcentage
+            nb_pieces_total=counters['total'],
+            nb_pieces_recues=counters['recues'],
+            nb_pieces_manquantes=counters['manquantes'],
+            nb_pieces_non_conformes=counters['non_conformes'],
+            pourcentage_completion=counters['pourcentage_completion']
         )
 
         logger.info(
             "Détails dossier récupérés",
             dossier_id=str(dossier_id),
             courtier_id=str(user.courtier_id),
-            nb_pieces=nb_total
+            nb_pieces=len(pieces)
         )
 
         return dossier
@@ -367,7 +417,7 @@ async def update_dossier(
     """
     try:
         # Vérifier que le dossier appartient au courtier
-        client = get_client_by_id(dossier_id)
+        client = await get_client_by_id(dossier_id)
 
         if not client:
             raise HTTPException(
@@ -394,7 +444,7 @@ async def update_dossier(
 
         # Appliquer updates
         if updates:
-            update_client(dossier_id, updates)
+            await update_client(dossier_id, updates)
             logger.info(
                 "Dossier mis à jour",
                 dossier_id=str(dossier_id),
@@ -437,7 +487,7 @@ async def validate_dossier(
     """
     try:
         # Vérifier que le dossier appartient au courtier
-        client = get_client_by_id(dossier_id)
+        client = await get_client_by_id(dossier_id)
 
         if not client:
             raise HTTPException(
@@ -452,13 +502,13 @@ async def validate_dossier(
             )
 
         # Vérifier pièces obligatoires avant validation
-        pieces = get_pieces_dossier(dossier_id)
+        pieces = await get_pieces_dossier(dossier_id)
         pieces_obligatoires_manquantes = []
 
         for piece in pieces:
             type_piece_id = piece.get('type_piece_id')
             if type_piece_id:
-                type_piece = get_type_piece(UUID(type_piece_id))
+                type_piece = await get_type_piece(UUID(type_piece_id))
                 if type_piece and type_piece.get('obligatoire') and piece.get('statut') != 'recue':
                     pieces_obligatoires_manquantes.append(
                         type_piece.get('nom', 'Pièce inconnue')
@@ -477,14 +527,15 @@ async def validate_dossier(
             }
 
         # Marquer comme terminé
-        update_client(dossier_id, {'statut': 'termine'})
+        await update_client(dossier_id, {'statut': 'termine'})
 
         # Logger l'activité
-        log_activity(
+        await log_activity(
             action='dossier_valide',
             details={'validated_by': user.email},
             client_id=dossier_id,
-            courtier_id=user.courtier_id
+            courtier_id=user.courtier_id,
+            buffered=True
         )
 
         logger.info(
@@ -51,6 +51,42 @@ class Settings(BaseSettings):
         ...,
         description="Secret JWT Supabase pour vérification tokens (depuis Project Settings > API)"
     )
+    IDENTITY_CACHE_TTL: int = Field(
+        default=300,
+        description="Durée de vie du cache d'identification courtiers/clients par email (secondes, 0 = désactivé)"
+    )
+    SUPABASE_POOL_MAX_CONNECTIONS: int = Field(
+        default=20,
+        description="Connexions HTTP simultanées max du client Supabase asynchrone"
+    )
+    SUPABASE_POOL_MAX_KEEPALIVE: int = Field(
+        default=10,
+        description="Connexions keep-alive conservées par le client Supabase asynchrone"
+    )
+    SUPABASE_POOL_KEEPALIVE_EXPIRY: float = Field(
+        default=60.0,
+        description="Durée (secondes) avant fermeture d'une connexion keep-alive inactive"
+    )
+    SUPABASE_HTTP_TIMEOUT: float = Field(
+        default=30.0,
+        description="Timeout (secondes) des requêtes du client Supabase asynchrone"
+    )
+    ACTIVITY_LOG_BATCH_SIZE: int = Field(
+        default=50,
+        description="Nombre de logs d'activité en tampon déclenchant une insertion groupée"
+    )
+    ACTIVITY_LOG_FLUSH_SECONDS: float = Field(
+        default=5.0,
+        description="Délai max (secondes) avant insertion des logs d'activité en tampon"
+    )
+    CONFIG_CACHE_TTL: int = Field(
+        default=60,
+        description="Durée de vie de la copie locale de la table config (secondes, 0 = lecture directe)"
+    )
+    CONFIG_CACHE_REDIS: bool = Field(
+        default=False,
+        description="Propager les modifications de la table config entre processus via Redis pub/sub"
+    )
 
     # ==========================================================================
     # REDIS & WORKERS
@@ -82,6 +118,30 @@ class Settings(BaseSettings):
         default=300,
         description="Intervalle de polling en secondes (5min par défaut)"
     )
+    IMAP_IDLE_ENABLED: bool = Field(
+        default=True,
+        description="Écoute push IMAP IDLE (le polling reste actif en secours)"
+    )
+    IMAP_IDLE_TIMEOUT: int = Field(
+        default=1500,
+        description="Durée max d'une commande IDLE en secondes avant ré-émission (Gmail coupe à 29min)"
+    )
+    IMAP_IDLE_MAX_BACKOFF: int = Field(
+        default=300,
+        description="Délai max (secondes) entre deux tentatives de reconnexion IDLE"
+    )
+    IMAP_FETCH_BATCH_SIZE: int = Field(
+        default=50,
+        description="Nombre d'emails récupérés par commande UID FETCH"
+    )
+    IMAP_LAZY_ATTACHMENTS: bool = Field(
+        default=True,
+        description="Récupère d'abord en-têtes et BODYSTRUCTURE, les pièces jointes après identification"
+    )
+    IMAP_MAX_ATTEMPTS: int = Field(
+        default=3,
+        description="Nombre de traitements en échec avant d'abandonner un email (marqué comme lu)"
+    )
 
     # ==========================================================================
     # EMAIL (SMTP - pour envoi notifications)
@@ -134,6 +194,54 @@ class Settings(BaseSettings):
         description="ID du dossier racine Google Drive (DOSSIERS_PRETS)"
     )
 
+    # Miroir local des fichiers Drive
+    DRIVE_CACHE_DIR: str = Field(
+        default="/tmp/leonie/drive_cache",
+        description="Cache disque des fichiers Drive (validé par md5Checksum)"
+    )
+    DRIVE_CACHE_MAX_MB: int = Field(
+        default=500,
+        description="Taille max du cache disque Drive (MB, éviction LRU, 0 = désactivé)"
+    )
+
+    # Cache des recherches Drive (dossiers, fichiers par nom, listings)
+    DRIVE_LOOKUP_CACHE_TTL: int = Field(
+        default=300,
+        description="Durée de vie des recherches Drive en cache (secondes, 0 = désactivé)"
+    )
+    DRIVE_LOOKUP_CACHE_MAX_ENTRIES: int = Field(
+        default=2048,
+        description="Nombre max de recherches Drive en cache mémoire (éviction LRU)"
+    )
+    DRIVE_LOOKUP_CACHE_REDIS: bool = Field(
+        default=False,
+        description="Partager le cache des recherches Drive via Redis (API, polling, workers)"
+    )
+
+    # Uploads Drive
+    DRIVE_UPLOAD_CONCURRENCY: int = Field(
+        default=4,
+        description="Nombre max d'uploads Drive simultanés"
+    )
+    DRIVE_MULTIPART_MAX_MB: float = Field(
+        default=5,
+        description="Taille max (MB) d'un upload multipart ; au-delà, upload résumable par morceaux"
+    )
+    DRIVE_UPLOAD_SESSION_DIR: str = Field(
+        default="/tmp/leonie/drive_uploads",
+        description="Sessions d'upload résumables persistées (reprise après interruption)"
+    )
+
+    # Index local de l'arborescence Drive (flux changes.list)
+    DRIVE_CHANGES_POLL_SECONDS: int = Field(
+        default=30,
+        description="Intervalle de lecture des modifications Drive (secondes, 0 = index désactivé)"
+    )
+    DRIVE_INDEX_PATH: str = Field(
+        default="/tmp/leonie/drive_index.sqlite3",
+        description="Fichier SQLite de l'index local de l'arborescence Drive"
+    )
+
     # Anciens champs (deprecated, gardés pour compatibilité)
     GOOGLE_CREDENTIALS_FILE: str = Field(
         default="service-account.json",
@@ -160,6 +268,14 @@ class Settings(BaseSettings):
         default="/tmp/leonie",
         description="Dossier temporaire pour uploads"
     )
+    ATTACHMENT_STORE_DIR: str = Field(
+        default="/tmp/leonie/attachments",
+        description="Store local des pièces jointes (adressé par SHA-256)"
+    )
+    ATTACHMENT_STORE_RETENTION_HOURS: int = Field(
+        default=48,
+        description="Durée de conservation des pièces jointes dans le store (heures)"
+    )
 
     # Document Processing
     MAX_FILE_SIZE_MB: int = Field(
@@ -174,6 +290,30 @@ class Settings(BaseSettings):
         default="/tmp/leonie/documents",
         description="Dossier temporaire pour le traitement de documents"
     )
+    DOCUMENT_CACHE_DIR: str = Field(
+        default="/tmp/leonie/cache",
+        description="Cache disque des PDF convertis (indexé par hash du fichier source)"
+    )
+    DOCUMENT_CACHE_MAX_MB: int = Field(
+        default=500,
+        description="Taille max du cache disque des PDF convertis (MB, éviction LRU, 0 = désactivé)"
+    )
+    DOCUMENT_POOL_WORKERS: int = Field(
+        default=2,
+        description="Processus dédiés aux conversions/compressions/fusions (0 = thread)"
+    )
+    DOCUMENT_TASK_TIMEOUT: int = Field(
+        default=180,
+        description="Timeout d'une tâche de traitement de document (secondes)"
+    )
+    LIBREOFFICE_SERVER_POOL_SIZE: int = Field(
+        default=2,
+        description="Instances LibreOffice permanentes (unoserver) pour les conversions Office (0 = soffice à froid)"
+    )
+    LIBREOFFICE_SERVER_BASE_PORT: int = Field(
+        default=2003,
+        description="Premier port des instances LibreOffice (2 ports par instance)"
+    )
 
     # ==========================================================================
     # RAPPORTS
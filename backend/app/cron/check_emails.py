@@ -7,34 +7,135 @@ périodiquement pour récupérer et traiter les nouveaux emails.
 
 import asyncio
 import logging
-from typing import List
+from typing import Dict, List, Optional, Set
 
 from app.models.email import EmailData
+from app.services.attachment_store import get_attachment_store
 from app.services.email_fetcher import EmailFetcher
 from app.services.email_parser import EmailParser
 from app.services.router import EmailRouter
 
 logger = logging.getLogger(__name__)
 
+# Sérialise la récupération IMAP (polling APScheduler, listener IDLE, endpoint manuel)
+_check_lock = asyncio.Lock()
+# Sérialise le traitement par l'EmailAgent (la connexion de récupération est déjà fermée)
+_process_lock = asyncio.Lock()
 
 
-def _fetch_emails_sync() -> List[EmailData]:
+class _UidLedger:
     """
-    Fonction helper synchrone pour récupérer les emails via IMAP.
+    Suivi des UIDs récupérés mais pas encore traités avec succès.
 
-    Exécutée dans un thread séparé pour ne pas bloquer l'event loop.
+    Le curseur UID n'avance jamais au-delà du plus petit UID en cours de
+    traitement ou en échec : un email non traité est récupéré à nouveau
+    à la vérification suivante, jusqu'à max_attempts tentatives.
+    """
 
-    Returns:
-        Liste des emails récupérés.
+    def __init__(self):
+        self.uidvalidity: Optional[int] = None
+        self.in_flight: Set[int] = set()
+        self.failed: Set[int] = set()
+        self.attempts: Dict[int, int] = {}
+
+    def claim(self, uidvalidity: int, uids: List[int]) -> None:
+        if uidvalidity != self.uidvalidity:
+            # Nouveau label ou UIDVALIDITY modifié : anciens UIDs sans objet
+            self.uidvalidity = uidvalidity
+            self.failed.clear()
+            self.attempts.clear()
+        self.in_flight.update(uids)
+        self.failed.difference_update(uids)
+
+    def done(self, uid: int) -> None:
+        self.in_flight.discard(uid)
+        self.attempts.pop(uid, None)
+
+    def fail(self, uid: int, max_attempts: int) -> bool:
+        """
+        Enregistre l'échec d'un UID en cours.
+
+        Returns:
+            True si l'UID est abandonné (max_attempts atteint) : il ne
+            bloque plus le curseur et doit être marqué comme lu.
+        """
+        if uid not in self.in_flight:
+            return False
+
+        self.in_flight.discard(uid)
+        self.attempts[uid] = self.attempts.get(uid, 0) + 1
+        if self.attempts[uid] < max_attempts:
+            self.failed.add(uid)
+            return False
+
+        del self.attempts[uid]
+        logger.error(f"Email UID {uid} abandonné après {max_attempts} tentatives en échec")
+        return True
+
+    def cursor_target(self, ceiling: int) -> int:
+        """Dernier UID jusqu'auquel tout est traité (borné par ceiling)."""
+        pending = self.in_flight | self.failed
+        return min(ceiling, min(pending) - 1) if pending else ceiling
+
+
+_ledger = _UidLedger()
+
+
+class _ImapSession:
     """
-    with EmailFetcher() as fetcher:
-        return fetcher.fetch_new_emails()
+    Connexion IMAP ouverte à la demande pendant le traitement.
 
+    Sert au téléchargement différé des pièces jointes (IMAP_LAZY_ATTACHMENTS)
+    et au marquage comme lu ; fermée à la fin de la vérification.
 
-async def check_new_emails() -> dict:
+    Un fetcher déjà connecté (listener IDLE, bloqué pendant le traitement)
+    est réutilisé tel quel et n'est pas fermé.
+    """
+
+    def __init__(self, fetcher: Optional[EmailFetcher] = None):
+        self._fetcher = fetcher
+        self._owned = fetcher is None
+
+    def get(self) -> EmailFetcher:
+        if self._fetcher is None:
+            fetcher = EmailFetcher()
+            fetcher.connect()
+            status, _ = fetcher.imap.select(fetcher.settings.IMAP_LABEL)
+            if status != "OK":
+                fetcher.disconnect()
+                raise Exception(f"Impossible de sélectionner le label {fetcher.settings.IMAP_LABEL}")
+            self._fetcher = fetcher
+        return self._fetcher
+
+    def load_attachments(self, email: EmailData) -> None:
+        self.get().load_attachments(email)
+
+    def mark_as_read(self, uid: int) -> None:
+        try:
+            self.get().mark_uid_as_read(uid)
+        except Exception as e:
+            # Sans conséquence : l'email reste non lu, le curseur avance quand même
+            logger.warning(f"Marquage comme lu impossible (UID {uid}): {e}")
+
+    def close(self) -> None:
+        if self._owned and self._fetcher is not None:
+            self._fetcher.disconnect()
+            self._fetcher = None
+
+
+async def check_new_emails(fetcher: Optional[EmailFetcher] = None) -> dict:
     """
     Vérifie et récupère les nouveaux emails via IMAP.
     Délègue ensuite le traitement complet à l'EmailAgent.
+
+    La récupération est faite sous verrou puis la connexion est libérée
+    avant le traitement. Le curseur UID avance et l'email est marqué comme
+    lu après chaque traitement réussi uniquement.
+
+    Args:
+        fetcher: Fetcher déjà connecté à réutiliser pour la récupération
+            et le traitement (listener IDLE). Si None, une connexion IMAP
+            dédiée est ouverte puis fermée.
     """
     from app.services.email_agent import EmailAgent
     
@@ -43,13 +144,24 @@ async def check_new_emails() -> dict:
     logger.info("=" * 60)
 
     # Vérification du mode maintenance (Pause Prod)
-    from app.utils.db import get_config
+    from app.services.config_store import get_config_store
     from app.config import get_settings
     
     settings = get_settings()
-    maintenance_mode = get_config("maintenance_mode")
+    # Lecture mémoire (table config en cache, rechargée à expiration)
+    try:
+        maintenance_mode = get_config_store().maintenance_mode()
+    except Exception as e:
+        # Table config illisible : ni mode maintenance ni curseur UID fiables
+        logger.error(f"Lecture de la configuration impossible, vérification reportée: {e}")
+        return {
+            "total_emails": 0,
+            "processed_success": 0,
+            "processed_error": 0,
+            "status": "error"
+        }
     
-    if maintenance_mode is True:
+    if maintenance_mode:
         if settings.is_production:
             logger.warning("⚠️ MODE MAINTENANCE ACTIF (PROD) : Traitement des emails en pause sur Railway.")
             return {
@@ -67,41 +179,106 @@ async def check_new_emails() -> dict:
         "processed_error": 0,
     }
 
-    try:
-        # Récupération des emails dans un thread séparé (IMAP est bloquant)
-        logger.info("Récupération des emails via IMAP...")
-        emails = await asyncio.to_thread(_fetch_emails_sync)
+    own_fetcher = fetcher is None
+    if own_fetcher:
+        fetcher = EmailFetcher()
+
+    emails: List[EmailData] = []
+    fetch_state: Optional[dict] = None
+
+    async with _check_lock:
+        try:
+            # Récupération des emails dans un thread séparé (IMAP est bloquant)
+            logger.info("Récupération des emails via IMAP...")
+            if own_fetcher:
+                await asyncio.to_thread(fetcher.connect)
+            emails = await asyncio.to_thread(
+                fetcher.fetch_new_emails, exclude=frozenset(_ledger.in_flight)
+            )
+            fetch_state = fetcher.last_fetch
+            if fetch_state:
+                _ledger.claim(fetch_state["uidvalidity"], fetch_state["uids"])
+
+        except Exception as e:
+            logger.error(f"Erreur globale vérification emails: {e}", exc_info=True)
+
+        finally:
+            # Connexion libérée avant le traitement par l'agent
+            if own_fetcher:
+                await asyncio.to_thread(fetcher.disconnect)
+
+    stats["total_emails"] = len(emails)
+    # Polling : connexion de récupération déjà fermée, une connexion dédiée
+    # est ouverte au besoin. IDLE : la connexion du listener est réutilisée.
+    session = _ImapSession(None if own_fetcher else fetcher)
+    max_attempts = settings.IMAP_MAX_ATTEMPTS
+
+    def commit_cursor() -> None:
+        if fetch_state:
+            try:
+                fetcher.commit_uid_cursor(
+                    fetch_state["uidvalidity"], _ledger.cursor_target(fetch_state["ceiling"])
+                )
+            except Exception as e:
+                logger.warning(f"Sauvegarde du curseur UID impossible: {e}")
 
-        stats["total_emails"] = len(emails)
+    async def load_attachments(email: EmailData) -> None:
+        await asyncio.to_thread(session.load_attachments, email)
 
+    try:
         if not emails:
             logger.info("Aucun nouvel email trouvé depuis la dernière vérification")
             return stats
 
         logger.info(f"Nombre d'emails récupérés: {len(emails)}")
-        
-        # Initialisation de l'agent
-        agent = EmailAgent()
-
-        # Traitement de chaque email via l'Agent
-        for idx, email in enumerate(emails, 1):
-            logger.info(f"\n--- Email {idx}/{len(emails)} ---")
-            
-            try:
-                success = await agent.process_incoming_email(email)
-                if success:
-                    stats["processed_success"] += 1
-                else:
-                    # L'agent renvoie False si ignoré (orphelin) ou erreur
-                    logger.info("Email ignoré ou non traité par l'agent.")
-            
-            except Exception as e:
-                logger.error(f"Erreur critique traitement agent pour email {idx}: {e}", exc_info=True)
-                stats["processed_error"] += 1
-                continue
 
+        async with _process_lock:
+            # Initialisation de l'agent
+            agent = EmailAgent()
+
+            # Traitement de chaque email via l'Agent
+            for idx, email in enumerate(emails, 1):
+                logger.info(f"\n--- Email {idx}/{len(emails)} ---")
+                
+                try:
+                    success = await agent.process_incoming_email(
+                        email,
+                        attachment_loader=load_attachments
+                    )
+                    if success:
+                        stats["processed_success"] += 1
+                    else:
+                        # L'agent renvoie False si ignoré (orphelin) ou erreur
+                        logger.info("Email ignoré ou non traité par l'agent.")
+                
+                except Exception as e:
+                    logger.error(f"Erreur critique traitement agent pour email {idx}: {e}", exc_info=True)
+                    stats["processed_error"] += 1
+                    if email.uid is not None and _ledger.fail(email.uid, max_attempts):
+                        # Abandonné : marqué comme lu pour ne plus être récupéré
+                        await asyncio.to_thread(session.mark_as_read, email.uid)
+                    continue
+
+                # Traité : marqué comme lu, le curseur peut le dépasser
+                if email.uid is not None:
+                    await asyncio.to_thread(session.mark_as_read, email.uid)
+                    _ledger.done(email.uid)
+                    commit_cursor()
+
+    finally:
+        # UIDs non récupérés, non parsés ou non traités : repris à la prochaine vérification
+        if fetch_state:
+            for uid in fetch_state["uids"]:
+                if _ledger.fail(uid, max_attempts):
+                    await asyncio.to_thread(session.mark_as_read, uid)
+            commit_cursor()
+        await asyncio.to_thread(session.close)
+
+    # Nettoyage des pièces jointes expirées du store local
+    try:
+        await asyncio.to_thread(get_attachment_store().purge)
     except Exception as e:
-        logger.error(f"Erreur globale vérification emails: {e}", exc_info=True)
+        logger.warning(f"Erreur purge store pièces jointes: {e}")
 
     # Affichage des statistiques finales
     logger.info("\n" + "=" * 60)
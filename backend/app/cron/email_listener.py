@@ -0,0 +1,148 @@
+"""
+Écoute push des nouveaux emails via IMAP IDLE.
+
+Ce module maintient une connexion IMAP longue durée sur le label Léonie
+et déclenche le traitement des emails dès que le serveur signale un
+nouveau message, au lieu d'attendre le prochain cycle de polling.
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Optional
+
+from app.config import get_settings
+from app.cron.check_emails import check_new_emails
+from app.services.email_fetcher import EmailFetcher
+
+logger = logging.getLogger(__name__)
+
+
+class EmailIdleListener:
+    """
+    Listener IMAP IDLE exécuté dans un thread dédié.
+
+    La connexion IMAP est conservée entre deux notifications (pas de
+    login/select à chaque cycle) et réutilisée pour récupérer les emails.
+    En cas de coupure, le listener se reconnecte avec un backoff
+    exponentiel ; le polling APScheduler reste actif en secours.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        """
+        Initialise le listener.
+
+        Args:
+            loop: Event loop de l'application sur laquelle le traitement
+                des emails (check_new_emails) est exécuté.
+        """
+        self.settings = get_settings()
+        self.loop = loop
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Démarre le thread d'écoute IDLE."""
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            name="imap-idle-listener",
+            daemon=True
+        )
+        self._thread.start()
+        logger.info("Listener IMAP IDLE démarré")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Arrête le thread d'écoute IDLE.
+
+        Args:
+            timeout: Durée max d'attente de l'arrêt du thread (secondes).
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+        logger.info("Listener IMAP IDLE arrêté")
+
+    def _run(self) -> None:
+        """Boucle principale : connexion, IDLE, traitement, reconnexion."""
+        min_backoff = 5
+        backoff = min_backoff
+
+        while not self._stop_event.is_set():
+            fetcher = EmailFetcher()
+
+            try:
+                fetcher.connect()
+
+                if not fetcher.supports_idle():
+                    logger.warning(
+                        "Le serveur IMAP ne supporte pas IDLE. "
+                        "Seul le polling périodique sera utilisé."
+                    )
+                    return
+
+                label = self.settings.IMAP_LABEL
+                status, _ = fetcher.imap.select(label)
+                if status != "OK":
+                    raise Exception(f"Impossible de sélectionner le label {label}")
+
+                backoff = min_backoff
+
+                # Rattrapage des emails arrivés pendant la déconnexion
+                self._drain_new_emails(fetcher)
+
+                while not self._stop_event.is_set():
+                    if fetcher.idle(self.settings.IMAP_IDLE_TIMEOUT, self._stop_event):
+                        logger.info("IDLE: nouvel email signalé par le serveur")
+                        self._drain_new_emails(fetcher)
+
+            except Exception as e:
+                logger.error(
+                    f"Erreur listener IMAP IDLE, reconnexion dans {backoff}s: {e}",
+                    exc_info=True
+                )
+
+            finally:
+                fetcher.disconnect()
+
+            if self._stop_event.wait(backoff):
+                break
+            backoff = min(backoff * 2, self.settings.IMAP_IDLE_MAX_BACKOFF)
+
+    def _drain_new_emails(self, fetcher: EmailFetcher) -> None:
+        """
+        Traite les nouveaux emails jusqu'à ce qu'aucun ne soit trouvé.
+
+        Les emails arrivés pendant un traitement long ne sont pas toujours
+        re-signalés au démarrage de l'IDLE suivant : la vérification est
+        relancée avant de repasser en IDLE.
+
+        Args:
+            fetcher: Fetcher connecté, réutilisé pour la récupération.
+        """
+        while not self._stop_event.is_set():
+            if not self._process_new_emails(fetcher):
+                break
+
+    def _process_new_emails(self, fetcher: EmailFetcher) -> int:
+        """
+        Lance le traitement des nouveaux emails sur l'event loop principal.
+
+        Bloque jusqu'à la fin du traitement : la connexion IMAP n'est
+        jamais utilisée simultanément par deux threads.
+
+        Args:
+            fetcher: Fetcher connecté, réutilisé pour la récupération.
+
+        Returns:
+            Nombre d'emails récupérés.
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            check_new_emails(fetcher=fetcher),
+            self.loop
+        )
+        return future.result()["total_emails"]
@@ -22,7 +22,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from app.config import get_settings
-from app.utils.db import get_courtier_by_email, get_db
+from app.utils.db_async import get_courtier_by_email
 
 logger = structlog.get_logger()
 security = HTTPBearer()
@@ -167,7 +167,7 @@ async def get_current_user(
             payload.get('user_metadata', {}).get('role') == 'admin'
         )
 
-        courtier_data = get_courtier_by_email(email)
+        courtier_data = await get_courtier_by_email(email)
 
         if not courtier_data:
             # Si admin, autoriser même sans courtier_data
@@ -8,6 +8,7 @@ des emails reçus via IMAP.
 import base64
 from datetime import datetime
 from enum import Enum
+from pathlib import Path
 from typing import Dict, List, Optional
 
 from pydantic import BaseModel, EmailStr, Field, field_serializer
@@ -20,6 +21,22 @@ class EmailAttachment(BaseModel):
     content_type: str = Field(..., description="Type MIME du fichier")
     size_bytes: int = Field(..., ge=0, description="Taille en octets")
     content: Optional[bytes] = Field(None, description="Contenu binaire du fichier")
+    content_hash: Optional[str] = Field(
+        None,
+        description="SHA-256 du contenu, clé dans le store local des pièces jointes"
+    )
+    path: Optional[str] = Field(
+        None,
+        description="Chemin du fichier dans le store local (contenu non chargé en mémoire)"
+    )
+    imap_section: Optional[str] = Field(
+        None,
+        description="Section IMAP (BODY[section]) pour un chargement différé du contenu"
+    )
+    transfer_encoding: Optional[str] = Field(
+        None,
+        description="Content-Transfer-Encoding de la section IMAP (base64, quoted-printable...)"
+    )
 
     @field_serializer('content', when_used='json')
     def serialize_content(self, content: Optional[bytes]) -> Optional[str]:
@@ -33,13 +50,35 @@ class EmailAttachment(BaseModel):
             return None
         return base64.b64encode(content).decode('ascii')
 
+    def read_content(self) -> Optional[bytes]:
+        """
+        Retourne le contenu binaire, depuis la mémoire ou le store local.
+
+        Returns:
+            Contenu du fichier, ou None s'il n'est pas disponible.
+        """
+        if self.content is not None:
+            return self.content
+        if self.path and Path(self.path).is_file():
+            return Path(self.path).read_bytes()
+        return None
+
+    @property
+    def is_loaded(self) -> bool:
+        """Indique si le contenu est disponible (en mémoire ou dans le store)."""
+        return self.content is not None or (
+            self.path is not None and Path(self.path).is_file()
+        )
+
     model_config = {
         "json_schema_extra": {
             "example": {
                 "filename": "CNI_recto_verso.pdf",
                 "content_type": "application/pdf",
                 "size_bytes": 245678,
-                "content": None  # Binary content not shown in example
+                "content": None,  # Binary content not shown in example
+                "content_hash": "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08",
+                "path": "/tmp/leonie/attachments/9f/9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08"
             }
         }
     }
@@ -49,6 +88,7 @@ class EmailData(BaseModel):
     """Données d'un email reçu."""
 
     message_id: str = Field(..., description="ID unique du message email")
+    uid: Optional[int] = Field(None, description="UID IMAP du message dans le label")
     from_address: EmailStr = Field(..., description="Adresse email de l'expéditeur")
     from_name: Optional[str] = Field(None, description="Nom de l'expéditeur")
     to_addresses: List[EmailStr] = Field(
@@ -0,0 +1,200 @@
+"""
+Stockage local des pièces jointes, adressé par contenu (SHA-256).
+
+Les pièces jointes sont écrites sur disque par blocs au moment de leur
+décodage : EmailAttachment ne transporte plus que le hash et le chemin
+du fichier, pas le contenu binaire. Un même fichier reçu plusieurs fois
+n'est stocké qu'une seule fois.
+"""
+
+import binascii
+import hashlib
+import io
+import itertools
+import logging
+import os
+import quopri
+import re
+import tempfile
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Taille des blocs de lecture/écriture
+_CHUNK_SIZE = 64 * 1024
+
+_NON_BASE64_RE = re.compile(rb"[^A-Za-z0-9+/=]")
+
+
+class AttachmentStore:
+    """
+    Store de fichiers adressé par SHA-256.
+
+    Arborescence : <root>/<2 premiers caractères du hash>/<hash>.
+    L'écriture passe par un fichier temporaire du même répertoire puis un
+    renommage atomique : un fichier présent dans le store est toujours complet.
+    """
+
+    def __init__(self, root_dir: Optional[str] = None):
+        """
+        Initialise le store.
+
+        Args:
+            root_dir: Répertoire racine. Si None, utilise ATTACHMENT_STORE_DIR.
+        """
+        self.root = Path(root_dir or get_settings().ATTACHMENT_STORE_DIR)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, content_hash: str) -> Path:
+        """Retourne le chemin du fichier correspondant à un hash."""
+        return self.root / content_hash[:2] / content_hash
+
+    def exists(self, content_hash: str) -> bool:
+        """Indique si un contenu est présent dans le store."""
+        return self.path_for(content_hash).is_file()
+
+    def write_chunks(self, chunks: Iterable[bytes]) -> Tuple[str, Path, int]:
+        """
+        Écrit un contenu fourni par blocs et calcule son hash au fil de l'eau.
+
+        Args:
+            chunks: Blocs de contenu décodé.
+
+        Returns:
+            Tuple (hash SHA-256, chemin dans le store, taille en octets).
+        """
+        sha256 = hashlib.sha256()
+        size = 0
+
+        fd, tmp_name = tempfile.mkstemp(dir=self.root, prefix=".spool_")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    if not chunk:
+                        continue
+                    sha256.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+
+            content_hash = sha256.hexdigest()
+            target = self.path_for(content_hash)
+
+            if target.is_file():
+                # Contenu déjà présent : on rafraîchit sa date pour la rétention
+                os.unlink(tmp_name)
+                target.touch()
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_name, target)
+
+            return content_hash, target, size
+
+        except Exception:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+
+    def write_bytes(self, content: bytes) -> Tuple[str, Path, int]:
+        """
+        Écrit un contenu déjà en mémoire.
+
+        Args:
+            content: Contenu binaire.
+
+        Returns:
+            Tuple (hash SHA-256, chemin dans le store, taille en octets).
+        """
+        view = memoryview(content)
+        return self.write_chunks(
+            view[i:i + _CHUNK_SIZE] for i in range(0, len(view), _CHUNK_SIZE)
+        )
+
+    def write_encoded(self, payload: bytes, transfer_encoding: Optional[str]) -> Tuple[str, Path, int]:
+        """
+        Décode un contenu MIME (base64, quoted-printable...) directement vers le store.
+
+        Le base64 est décodé ligne à ligne : le contenu décodé n'est jamais
+        entièrement en mémoire.
+
+        Args:
+            payload: Contenu encodé (ex: BODY[section] IMAP).
+            transfer_encoding: Content-Transfer-Encoding de la partie.
+
+        Returns:
+            Tuple (hash SHA-256, chemin dans le store, taille en octets).
+        """
+        encoding = (transfer_encoding or "").lower()
+
+        if encoding == "base64":
+            return self.write_chunks(_iter_base64(payload))
+        if encoding == "quoted-printable":
+            return self.write_bytes(quopri.decodestring(payload))
+        return self.write_bytes(payload)
+
+    def read_bytes(self, content_hash: str) -> bytes:
+        """
+        Lit un contenu du store.
+
+        Raises:
+            FileNotFoundError: Si le contenu n'est pas (ou plus) présent.
+        """
+        return self.path_for(content_hash).read_bytes()
+
+    def purge(self, max_age_hours: Optional[float] = None) -> int:
+        """
+        Supprime les fichiers plus anciens que la durée de rétention.
+
+        Les fichiers temporaires .spool_* abandonnés (processus arrêté
+        pendant une écriture) sont purgés avec la même rétention : une
+        écriture en cours a toujours une date récente.
+
+        Args:
+            max_age_hours: Rétention en heures. Si None, utilise
+                ATTACHMENT_STORE_RETENTION_HOURS.
+
+        Returns:
+            Nombre de fichiers supprimés.
+        """
+        if max_age_hours is None:
+            max_age_hours = get_settings().ATTACHMENT_STORE_RETENTION_HOURS
+
+        limit = time.time() - max_age_hours * 3600
+        removed = 0
+
+        for path in itertools.chain(self.root.glob(".spool_*"), self.root.glob("*/*")):
+            try:
+                if path.is_file() and path.stat().st_mtime < limit:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue
+
+        if removed:
+            logger.info(f"Store pièces jointes: {removed} fichier(s) purgé(s)")
+        return removed
+
+
+def _iter_base64(payload: bytes) -> Iterable[bytes]:
+    """Décode un contenu base64 MIME ligne par ligne."""
+    remainder = b""
+    for line in io.BytesIO(payload):
+        # Même tolérance que email.message : caractères hors alphabet ignorés
+        data = remainder + _NON_BASE64_RE.sub(b"", line)
+        # Décodage par groupes complets de 4 caractères
+        usable = len(data) - len(data) % 4
+        remainder = data[usable:]
+        if usable:
+            yield binascii.a2b_base64(data[:usable])
+    if remainder:
+        yield binascii.a2b_base64(remainder + b"=" * (-len(remainder) % 4))
+
+
+@lru_cache()
+def get_attachment_store() -> AttachmentStore:
+    """Retourne le store de pièces jointes partagé (singleton)."""
+    return AttachmentStore()
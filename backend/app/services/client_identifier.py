@@ -16,7 +16,6 @@ from uuid import UUID
 from app.models.email import EmailData
 from app.utils.db import (
     get_db,
-    get_client_by_email,
     find_client_by_email_list,
     find_client_by_name,
     add_secondary_email,
@@ -236,7 +235,7 @@ class ClientIdentifier:
             
             # Vérifier si ce client existe déjà pour éviter doublon
             # (Cas où EmailAgent n'a pas trouvé par Sender, mais l'email extrait est connu)
-            existing_client = get_client_by_email(client_email)
+            existing_client = find_client_by_email_list([client_email], UUID(courtier.get('id')))
             if existing_client:
                 logger.info(f"⚡️ Client existant retrouvé via extraction body: {existing_client.get('id')}")
                 return existing_client
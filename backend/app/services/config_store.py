@@ -0,0 +1,338 @@
+"""
+Cache de la table Supabase `config` (configuration modifiable à chaud).
+
+Toute la table est chargée en une requête et conservée en mémoire pendant
+CONFIG_CACHE_TTL secondes : les lectures (maintenance_mode à chaque
+vérification d'emails, last_email_check, email_polling_interval...) sont
+des accès mémoire. Les écritures passent par le store (écriture Supabase
+puis mise à jour locale).
+
+Avec CONFIG_CACHE_REDIS, chaque écriture est publiée sur un canal Redis :
+les autres processus rechargent la table immédiatement au lieu d'attendre
+l'expiration. Les abonnés (subscribe) sont notifiés des clés modifiées,
+ce qui permet par exemple de replanifier le polling sans redémarrage.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+from app.config import get_settings
+from app.utils import db
+from app.utils.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+_REDIS_CHANNEL = "leonie:config"
+
+# Bornes de l'intervalle de polling des emails (secondes)
+DEFAULT_POLLING_INTERVAL = 120
+MIN_POLLING_INTERVAL = 60
+
+ConfigListener = Callable[[str, Any], None]
+
+
+class ConfigStore:
+    """
+    Cache TTL de la table config, avec invalidation push via Redis pub/sub.
+
+    Thread-safe : une instance est partagée par tout le processus.
+    """
+
+    def __init__(self, ttl_seconds: int, use_redis: bool = False):
+        """
+        Initialise le store.
+
+        Args:
+            ttl_seconds: Durée de vie de la copie locale (0 = lecture directe).
+            use_redis: Publier/écouter les modifications via Redis.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.use_redis = use_redis
+
+        self._values: Dict[str, Any] = {}
+        self._loaded = False
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._listeners: List[ConfigListener] = []
+
+        # Identifie nos propres publications Redis
+        self._origin = uuid.uuid4().hex
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # =========================================================================
+    # LECTURE / ÉCRITURE
+    # =========================================================================
+
+    def get(self, cle: str, default: Any = None) -> Any:
+        """
+        Lit une valeur de configuration.
+
+        Args:
+            cle: Clé de configuration.
+            default: Valeur si la clé est absente.
+
+        Returns:
+            Valeur JSON de la configuration, ou default.
+
+        Raises:
+            Exception: Si la table n'a jamais pu être chargée (pas de copie
+                locale : default ne remplace jamais une valeur illisible,
+                ex. imap_uid_cursor).
+        """
+        if self.ttl_seconds <= 0:
+            valeur = db.get_config(cle)
+            return default if valeur is None else valeur
+
+        if self._expires_at <= time.monotonic():
+            self.refresh()
+        valeur = self._values.get(cle)
+        return default if valeur is None else valeur
+
+    def set(self, cle: str, valeur: Any, description: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Écrit une valeur (Supabase puis copie locale) et notifie les autres processus.
+
+        Args:
+            cle: Clé de configuration.
+            valeur: Valeur JSON à stocker.
+            description: Description de la configuration (optionnel).
+
+        Returns:
+            Dict contenant les données de configuration.
+        """
+        result = db.set_config(cle, valeur, description)
+
+        with self._lock:
+            changed = self._values.get(cle) != valeur
+            self._values[cle] = valeur
+        if changed:
+            self._notify([cle])
+            self._publish(cle)
+        return result
+
+    def refresh(self) -> None:
+        """
+        Recharge toute la table et notifie les clés modifiées.
+
+        Raises:
+            Exception: Si le chargement échoue sans copie locale antérieure.
+        """
+        try:
+            values = db.get_all_config()
+        except Exception as e:
+            if not self._loaded:
+                raise
+            # Copie locale conservée, nouvel essai à la prochaine expiration
+            logger.warning(f"Rechargement config impossible: {e}")
+            self._expires_at = time.monotonic() + self.ttl_seconds
+            return
+
+        with self._lock:
+            previous, first_load = self._values, not self._loaded
+            self._values = values
+            self._loaded = True
+            self._expires_at = time.monotonic() + self.ttl_seconds
+
+        # Premier chargement : rien n'a « changé »
+        if not first_load:
+            changed = [
+                cle for cle in set(previous) | set(values)
+                if previous.get(cle) != values.get(cle)
+            ]
+            self._notify(changed)
+
+    def invalidate(self) -> None:
+        """Force le rechargement à la prochaine lecture."""
+        self._expires_at = 0.0
+
+    # =========================================================================
+    # ACCESSEURS TYPÉS
+    # =========================================================================
+
+    def get_bool(self, cle: str, default: bool = False) -> bool:
+        """Valeur booléenne (accepte true/false, "true"/"false", 1/0)."""
+        valeur = self.get(cle)
+        if valeur is None:
+            return default
+        if isinstance(valeur, str):
+            return valeur.strip().lower() in ("true", "1", "yes", "oui")
+        return bool(valeur)
+
+    def get_int(self, cle: str, default: int = 0) -> int:
+        """Valeur entière (default si absente ou invalide)."""
+        valeur = self.get(cle)
+        try:
+            return default if valeur is None else int(valeur)
+        except (TypeError, ValueError):
+            logger.warning(f"Config {cle} non entière: {valeur!r}")
+            return default
+
+    def get_dict(self, cle: str) -> Dict[str, Any]:
+        """Valeur objet ({} si absente ou d'un autre type)."""
+        valeur = self.get(cle)
+        return valeur if isinstance(valeur, dict) else {}
+
+    def maintenance_mode(self) -> bool:
+        """Mode maintenance (pause du traitement des emails en production)."""
+        return self.get_bool("maintenance_mode")
+
+    def email_polling_interval(self) -> int:
+        """
+        Intervalle de polling des emails en secondes.
+
+        La valeur est soit un objet ({"seconds": 300} ou {"minutes": 5}),
+        soit une valeur directe en secondes ("300" = 5 min). Minimum 60
+        secondes pour éviter le spam, 120 par défaut.
+        """
+        valeur = self.get("email_polling_interval")
+        interval_seconds = DEFAULT_POLLING_INTERVAL
+
+        try:
+            if isinstance(valeur, dict):
+                if "seconds" in valeur:
+                    interval_seconds = int(valeur["seconds"])
+                elif "minutes" in valeur:
+                    interval_seconds = int(valeur["minutes"]) * 60
+            elif valeur:
+                interval_seconds = int(valeur)
+        except (TypeError, ValueError):
+            logger.warning(f"Config email_polling_interval invalide: {valeur!r}")
+
+        return max(MIN_POLLING_INTERVAL, interval_seconds)
+
+    # =========================================================================
+    # NOTIFICATIONS
+    # =========================================================================
+
+    def subscribe(self, listener: ConfigListener) -> None:
+        """
+        Abonne un callback aux modifications : listener(cle, nouvelle_valeur).
+
+        Le callback est appelé depuis le thread qui a détecté la modification
+        (lecteur, écrivain ou thread Redis).
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, cles: List[str]) -> None:
+        for cle in cles:
+            valeur = self._values.get(cle)
+            for listener in list(self._listeners):
+                try:
+                    listener(cle, valeur)
+                except Exception as e:
+                    logger.warning(f"Erreur abonné config ({cle}): {e}")
+
+    def _publish(self, cle: str) -> None:
+        if not self.use_redis:
+            return
+
+        try:
+            get_redis().publish(_REDIS_CHANNEL, json.dumps({"cle": cle, "origin": self._origin}))
+        except Exception as e:
+            logger.debug(f"Publication config Redis impossible: {e}")
+
+    # =========================================================================
+    # ÉCOUTE REDIS
+    # =========================================================================
+
+    def start(self) -> bool:
+        """
+        Lance l'écoute des modifications publiées par les autres processus.
+
+        Returns:
+            False si Redis n'est pas activé.
+        """
+        if not self.use_redis or self.ttl_seconds <= 0:
+            return False
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="config-listener", daemon=True)
+        self._thread.start()
+        logger.info("Écoute des modifications de config démarrée (Redis)")
+        return True
+
+    def stop(self) -> None:
+        """Arrête l'écoute Redis."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            pubsub = None
+            try:
+                pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(_REDIS_CHANNEL)
+                # Modifications manquées pendant une déconnexion
+                self.invalidate()
+
+                while not self._stop_event.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message:
+                        self._handle_message(message.get("data"))
+            except Exception as e:
+                logger.warning(f"Écoute config Redis interrompue: {e}")
+                self._stop_event.wait(5)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    def _handle_message(self, data: Any) -> None:
+        try:
+            payload = json.loads(data)
+        except (TypeError, ValueError):
+            return
+        if payload.get("origin") == self._origin:
+            return
+
+        logger.info(f"Config modifiée par un autre processus: {payload.get('cle')}")
+        try:
+            self.refresh()
+        except Exception as e:
+            # Pas encore de copie locale : chargement à la prochaine lecture
+            logger.warning(f"Rechargement config impossible: {e}")
+
+
+@lru_cache()
+def get_config_store() -> ConfigStore:
+    """Retourne le store partagé du processus."""
+    settings = get_settings()
+    return ConfigStore(settings.CONFIG_CACHE_TTL, settings.CONFIG_CACHE_REDIS)
+
+
+def get_config(cle: str) -> Optional[Any]:
+    """
+    Récupère une valeur de configuration (via le cache).
+
+    Args:
+        cle: Clé de configuration.
+
+    Returns:
+        Valeur JSON de la configuration, ou None si non trouvée.
+    """
+    return get_config_store().get(cle)
+
+
+def set_config(cle: str, valeur: Any, description: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Définit ou met à jour une valeur de configuration (et le cache).
+
+    Args:
+        cle: Clé de configuration.
+        valeur: Valeur JSON à stocker.
+        description: Description de la configuration (optionnel).
+
+    Returns:
+        Dict contenant les données de configuration.
+    """
+    return get_config_store().set(cle, valeur, description)
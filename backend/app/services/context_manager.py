@@ -11,7 +11,7 @@ from datetime import datetime
 from typing import Dict, Optional
 
 from app.services.mistral import MistralService
-from app.utils.db import get_dossier_context, update_dossier_context, create_dossier_context
+from app.utils.db_async import get_dossier_context, update_dossier_context, create_dossier_context
 
 logger = logging.getLogger(__name__)
 
@@ -25,10 +25,10 @@ class ContextManager:
 
     async def get_or_init_context(self, client_id: str) -> Dict:
         """Récupère le contexte ou l'initialise s'il n'existe pas."""
-        context = get_dossier_context(client_id)
+        context = await get_dossier_context(client_id)
         if not context:
             logger.info(f"Création contexte initial pour client {client_id}")
-            context = create_dossier_context(client_id)
+            context = await create_dossier_context(client_id)
         return context
 
     async def update_context_with_email(
@@ -56,4 +56,4 @@ class ContextManager:
             "last_update": datetime.now().isoformat()
         }
         
-        return update_dossier_context(client_id, updates)
+        return await update_dossier_context(client_id, updates)
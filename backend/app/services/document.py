@@ -6,17 +6,22 @@ des fichiers PDF et images pour le projet Léonie.
 """
 
 import hashlib
+import io
 import logging
+import math
 import os
 import shutil
 import subprocess
 import tempfile
+import threading
 from pathlib import Path
 from typing import List, Optional, Tuple
 
-from PIL import Image
+from PIL import Image, ImageOps, ImageStat
 from pypdf import PdfReader, PdfWriter
 
+from app.services.office_server import convert_with_server
+
 try:
     from pillow_heif import register_heif_opener
     register_heif_opener()
@@ -26,6 +31,9 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Hauteur d'une page A4 (pouces)
+A4_LONG_SIDE_INCHES = 11.69
+
 
 class DocumentProcessor:
     """
@@ -35,6 +43,16 @@ class DocumentProcessor:
     des documents PDF et images.
     """
 
+    # Bornes de la compression adaptative
+    MIN_COMPRESSION_DPI = 100
+    MAX_COMPRESSION_DPI = 300
+    DEFAULT_JPEG_QUALITY = 75
+    MIN_JPEG_QUALITY = 40
+
+    # Normalisation des photos avant export PDF
+    IMAGE_PAGE_DPI = 150
+    IMAGE_JPEG_QUALITY = 80
+
     def __init__(self, temp_dir: Optional[str] = None, max_file_size_mb: int = 10, target_pdf_size_mb: float = 1.8):
         """
         Initialise le service de traitement de documents.
@@ -126,6 +144,10 @@ class DocumentProcessor:
         """
         Convertit une image en PDF.
 
+        L'image est normalisée avant l'export (voir _normalize_image) : le
+        PDF produit est déjà léger et n'a en général pas besoin d'un passage
+        Ghostscript.
+
         Args:
             image_path: Chemin de l'image.
 
@@ -133,24 +155,15 @@ class DocumentProcessor:
             Chemin du PDF généré.
         """
         try:
-            # Ouvrir l'image avec Pillow
-            img = Image.open(image_path)
-
-            # Convertir en RGB si nécessaire (pour PNG avec transparence, etc.)
-            if img.mode in ("RGBA", "LA", "P"):
-                background = Image.new("RGB", img.size, (255, 255, 255))
-                if img.mode == "P":
-                    img = img.convert("RGBA")
-                background.paste(img, mask=img.split()[-1] if img.mode in ("RGBA", "LA") else None)
-                img = background
-            elif img.mode != "RGB":
-                img = img.convert("RGB")
+            with Image.open(image_path) as source:
+                img, resolution = self._normalize_image(source)
 
             # Générer le nom du fichier PDF
             pdf_path = Path(self.temp_dir) / f"{image_path.stem}_converted.pdf"
 
-            # Sauvegarder en PDF
-            img.save(pdf_path, "PDF", resolution=100.0)
+            # Sauvegarder en PDF (image encodée en JPEG dans le PDF)
+            img.save(pdf_path, "PDF", resolution=resolution, quality=self.IMAGE_JPEG_QUALITY)
+            img.close()
 
             logger.info(
                 f"Image convertie en PDF",
@@ -170,6 +183,58 @@ class DocumentProcessor:
             )
             return None
 
+    def _normalize_image(self, img: Image.Image) -> Tuple[Image.Image, float]:
+        """
+        Prépare une photo pour l'export PDF.
+
+        - Décodage JPEG réduit (Image.draft) : une photo 12 MP n'est jamais
+          décodée en pleine résolution.
+        - Orientation EXIF appliquée.
+        - Réduction à IMAGE_PAGE_DPI sur une page A4.
+        - Passage en niveaux de gris des photos de documents sans couleur.
+
+        Args:
+            img: Image ouverte (non chargée).
+
+        Returns:
+            Tuple (image normalisée, résolution en DPI pour l'export PDF).
+        """
+        max_side = int(A4_LONG_SIDE_INCHES * self.IMAGE_PAGE_DPI)
+
+        # Décodage réduit (JPEG uniquement, sans effet sur les autres formats)
+        scale = max_side / max(img.size)
+        if scale < 1:
+            img.draft("RGB", (math.ceil(img.width * scale), math.ceil(img.height * scale)))
+
+        img = ImageOps.exif_transpose(img)
+
+        # Convertir en RGB si nécessaire (pour PNG avec transparence, etc.)
+        if img.mode in ("RGBA", "LA", "P"):
+            if img.mode == "P":
+                img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[-1])
+            img = background
+        elif img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+
+        if max(img.size) > max_side:
+            img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        if img.mode == "RGB" and self._is_grayscale(img):
+            img = img.convert("L")
+
+        resolution = max(max(img.size) / A4_LONG_SIDE_INCHES, 100.0)
+        return img, resolution
+
+    @staticmethod
+    def _is_grayscale(img: Image.Image, max_saturation: float = 20.0) -> bool:
+        """Détecte une image sans couleur significative (saturation moyenne faible)."""
+        sample = img.copy()
+        sample.thumbnail((64, 64))
+        saturation = sample.convert("HSV").getchannel("S")
+        return ImageStat.Stat(saturation).mean[0] < max_saturation
+
     def _convert_office_to_pdf(self, office_path: Path) -> str:
         """
         Convertit un document Office en PDF via LibreOffice.
@@ -183,6 +248,19 @@ class DocumentProcessor:
         Raises:
             RuntimeError: Si LibreOffice n'est pas installé ou la conversion échoue.
         """
+        # Instance LibreOffice chaude si le pool est démarré (< 1s au lieu de 2-5s)
+        server_pdf_path = Path(self.temp_dir) / f"{office_path.stem}.pdf"
+        if convert_with_server(office_path, server_pdf_path):
+            logger.info(
+                f"Document Office converti en PDF (serveur)",
+                extra={
+                    "input": office_path.name,
+                    "output": server_pdf_path.name,
+                    "size_kb": f"{server_pdf_path.stat().st_size / 1024:.2f}"
+                }
+            )
+            return str(server_pdf_path)
+
         try:
             # Vérifier que LibreOffice est installé
             libreoffice_cmd = self._get_libreoffice_command()
@@ -196,9 +274,17 @@ class DocumentProcessor:
             # Créer un répertoire temporaire pour la sortie
             output_dir = Path(self.temp_dir)
 
+            # Profil LibreOffice isolé par processus/thread : deux conversions
+            # simultanées sur le même profil échouent
+            profile_dir = (
+                Path(self.temp_dir) / "lo_profiles"
+                / f"profile_{os.getpid()}_{threading.get_ident()}"
+            )
+
             # Commande LibreOffice pour conversion
             cmd = [
                 libreoffice_cmd,
+                f"-env:UserInstallation={profile_dir.resolve().as_uri()}",
                 "--headless",
                 "--convert-to", "pdf",
                 "--outdir", str(output_dir),
@@ -274,16 +360,19 @@ class DocumentProcessor:
         """
         Compresse un fichier PDF pour réduire sa taille.
 
-        Utilise Ghostscript avec deux niveaux de compression:
-        1. /ebook (qualité moyenne, ~150 DPI)
-        2. /screen (basse qualité, ~72 DPI) si /ebook dépasse encore la cible
+        La résolution des images et la qualité JPEG sont estimées à partir
+        du contenu du PDF (images, pages) pour atteindre la taille cible en
+        un seul passage Ghostscript. Un second passage, recalibré sur le
+        résultat du premier, n'a lieu que si la cible est encore dépassée.
+        Les PDF sans images (texte seul) ne sont pas recompressés.
 
         Args:
             pdf_path: Chemin du PDF à compresser.
             target_size_mb: Taille cible en MB. Si None, utilise self.target_pdf_size_mb.
 
         Returns:
-            Chemin du PDF compressé.
+            Chemin du PDF compressé (ou du PDF original si la compression
+            ne le réduit pas).
 
         Raises:
             FileNotFoundError: Si le fichier n'existe pas.
@@ -313,6 +402,14 @@ class DocumentProcessor:
             logger.info(f"PDF déjà sous la taille cible ({current_size_mb:.2f} MB)")
             return str(pdf_path)
 
+        # PDF texte seul : Ghostscript ne gagnerait presque rien
+        image_stats = self._analyze_pdf_images(pdf_path)
+        if image_stats["image_bytes"] == 0:
+            logger.warning(
+                f"PDF sans images ({current_size_mb:.2f} MB), compression ignorée"
+            )
+            return str(pdf_path)
+
         # Vérifier que Ghostscript est installé
         gs_cmd = self._get_ghostscript_command()
         if not gs_cmd:
@@ -322,24 +419,34 @@ class DocumentProcessor:
                 "ou brew install ghostscript (macOS)"
             )
 
-        # Essayer compression /ebook d'abord
+        target_bytes = target_size_mb * 1024 * 1024
+        dpi, jpeg_quality = self._estimate_compression_settings(image_stats, target_bytes)
+
         compressed_path = self._compress_with_ghostscript(
-            pdf_path, gs_cmd, quality="ebook"
+            pdf_path, gs_cmd, dpi=dpi, jpeg_quality=jpeg_quality
         )
-
-        compressed_size_mb = Path(compressed_path).stat().st_size / (1024 * 1024)
-
-        # Si encore trop gros, essayer /screen
-        if compressed_size_mb > target_size_mb:
+        compressed_size = Path(compressed_path).stat().st_size
+
+        # Second passage borné : recalibrage sur la taille réellement obtenue
+        can_retry = dpi > self.MIN_COMPRESSION_DPI or jpeg_quality > self.MIN_JPEG_QUALITY
+        if compressed_size > target_bytes and can_retry:
+            ratio = (target_bytes * 0.9) / compressed_size
+            retry_dpi = max(self.MIN_COMPRESSION_DPI, int(dpi * ratio ** 0.5))
+            retry_quality = max(self.MIN_JPEG_QUALITY, jpeg_quality - 15)
             logger.warning(
-                f"Compression /ebook insuffisante ({compressed_size_mb:.2f} MB), "
-                f"tentative avec /screen"
+                f"Compression {dpi} DPI insuffisante ({compressed_size / (1024 * 1024):.2f} MB), "
+                f"second passage à {retry_dpi} DPI"
             )
             compressed_path = self._compress_with_ghostscript(
-                pdf_path, gs_cmd, quality="screen"
+                pdf_path, gs_cmd, dpi=retry_dpi, jpeg_quality=retry_quality
             )
-            compressed_size_mb = Path(compressed_path).stat().st_size / (1024 * 1024)
+            compressed_size = Path(compressed_path).stat().st_size
+
+        if compressed_size >= pdf_path.stat().st_size:
+            logger.info("Compression sans gain, PDF original conservé")
+            return str(pdf_path)
 
+        compressed_size_mb = compressed_size / (1024 * 1024)
         logger.info(
             f"PDF compressé",
             extra={
@@ -351,6 +458,136 @@ class DocumentProcessor:
 
         return compressed_path
 
+    def _analyze_pdf_images(self, pdf_path: Path) -> dict:
+        """
+        Mesure le poids et la résolution des images d'un PDF.
+
+        Args:
+            pdf_path: Chemin du PDF.
+
+        Returns:
+            Dict avec total_bytes, image_bytes (flux images encodés),
+            pages et max_dpi (résolution effective la plus haute).
+        """
+        total_bytes = pdf_path.stat().st_size
+        image_bytes = 0
+        max_dpi = 0.0
+        seen = set()
+
+        try:
+            reader = PdfReader(str(pdf_path))
+            pages = len(reader.pages)
+
+            for page in reader.pages:
+                page_width_in = float(page.mediabox.width) / 72 or 1
+                resources = page["/Resources"] if "/Resources" in page else {}
+
+                for ref, xobject in self._iter_pdf_images(resources, set()):
+                    max_dpi = max(max_dpi, float(xobject["/Width"]) / page_width_in)
+
+                    # Image partagée entre pages ou formulaires : comptée une seule fois
+                    key = getattr(ref, "idnum", None) or id(xobject)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    image_bytes += self._pdf_stream_size(xobject)
+
+        except Exception as e:
+            # Analyse impossible : on suppose un PDF entièrement composé d'images
+            logger.warning(f"Analyse des images du PDF impossible ({pdf_path.name}): {e}")
+            return {"total_bytes": total_bytes, "image_bytes": total_bytes, "pages": 1, "max_dpi": 300.0}
+
+        return {
+            "total_bytes": total_bytes,
+            "image_bytes": min(image_bytes, total_bytes),
+            "pages": pages,
+            "max_dpi": max_dpi,
+        }
+
+    def _iter_pdf_images(self, resources, visited: set):
+        """
+        Parcourt les images d'un dictionnaire /Resources.
+
+        Descend dans les XObjects /Form (logos, tampons, pages importées),
+        qui portent leurs propres /Resources.
+
+        Args:
+            resources: Dictionnaire /Resources (page ou formulaire).
+            visited: Formulaires déjà parcourus (références circulaires).
+
+        Yields:
+            Tuples (référence indirecte ou None, XObject image).
+        """
+        if "/XObject" not in resources:
+            return
+
+        xobjects = resources["/XObject"]
+        for name in xobjects:
+            ref = xobjects.raw_get(name)
+            xobject = xobjects[name]
+            subtype = xobject.get("/Subtype")
+
+            if subtype == "/Image":
+                yield ref, xobject
+            elif subtype == "/Form" and "/Resources" in xobject:
+                key = getattr(ref, "idnum", None) or id(xobject)
+                if key in visited:
+                    continue
+                visited.add(key)
+                yield from self._iter_pdf_images(xobject["/Resources"], visited)
+
+    @staticmethod
+    def _pdf_stream_size(stream) -> int:
+        """
+        Taille d'un flux PDF encodé, sans le décoder.
+
+        pypdf retire /Length au parsing : le flux est sérialisé tel qu'il
+        serait écrit dans le fichier (dictionnaire + données encodées, à
+        quelques dizaines d'octets près).
+        """
+        buffer = io.BytesIO()
+        stream.write_to_stream(buffer)
+        return buffer.tell()
+
+    def _estimate_compression_settings(self, image_stats: dict, target_bytes: float) -> Tuple[int, int]:
+        """
+        Estime la résolution et la qualité JPEG permettant d'atteindre la cible.
+
+        Le poids des images évolue à peu près comme le nombre de pixels,
+        donc comme le carré de la résolution.
+
+        Args:
+            image_stats: Résultat de _analyze_pdf_images.
+            target_bytes: Taille cible en octets.
+
+        Returns:
+            Tuple (DPI, qualité JPEG).
+        """
+        # Marge de 10% ; le reste du PDF (texte, polices) est conservé tel quel
+        other_bytes = image_stats["total_bytes"] - image_stats["image_bytes"]
+        image_budget = max(target_bytes * 0.9 - other_bytes, target_bytes * 0.1)
+
+        source_dpi = min(image_stats["max_dpi"] or 300.0, 600.0)
+        ratio = min(image_budget / image_stats["image_bytes"], 1.0)
+
+        # Le réencodage JPEG à qualité moyenne fait gagner environ un facteur 2
+        # à résolution égale, à compenser avant de réduire la résolution
+        jpeg_quality = self.DEFAULT_JPEG_QUALITY
+        dpi = source_dpi * min((ratio * 2) ** 0.5, 1.0)
+
+        if dpi < self.MIN_COMPRESSION_DPI:
+            # Résolution plancher atteinte : on dégrade plutôt la qualité JPEG
+            shortfall = (dpi / self.MIN_COMPRESSION_DPI) ** 2
+            jpeg_quality = max(self.MIN_JPEG_QUALITY, int(jpeg_quality * shortfall))
+            dpi = self.MIN_COMPRESSION_DPI
+
+        dpi = int(min(dpi, self.MAX_COMPRESSION_DPI))
+        logger.debug(
+            f"Compression estimée: {dpi} DPI, JPEG q{jpeg_quality} "
+            f"(images {image_stats['image_bytes'] / 1024:.0f} KB, {image_stats['pages']} page(s))"
+        )
+        return dpi, jpeg_quality
+
     def _get_ghostscript_command(self) -> Optional[str]:
         """
         Détecte la commande Ghostscript disponible sur le système.
@@ -367,34 +604,52 @@ class DocumentProcessor:
         return None
 
     def _compress_with_ghostscript(
-        self, pdf_path: Path, gs_cmd: str, quality: str = "ebook"
+        self, pdf_path: Path, gs_cmd: str, dpi: int = 150, jpeg_quality: int = 75
     ) -> str:
         """
-        Compresse un PDF avec Ghostscript.
+        Compresse un PDF avec Ghostscript en réduisant ses images.
 
         Args:
             pdf_path: Chemin du PDF.
             gs_cmd: Commande Ghostscript.
-            quality: Niveau de qualité ("ebook" ou "screen").
+            dpi: Résolution maximale des images couleur/niveaux de gris.
+            jpeg_quality: Qualité JPEG (0-100) des images réencodées.
 
         Returns:
             Chemin du PDF compressé.
         """
-        output_path = Path(self.temp_dir) / f"{pdf_path.stem}_compressed_{quality}.pdf"
+        output_path = Path(self.temp_dir) / f"{pdf_path.stem}_compressed_{dpi}dpi_q{jpeg_quality}.pdf"
 
         cmd = [
             gs_cmd,
             "-sDEVICE=pdfwrite",
-            f"-dPDFSETTINGS=/{quality}",
+            "-dPDFSETTINGS=/ebook",
             "-dNOPAUSE",
             "-dQUIET",
             "-dBATCH",
             "-dCompatibilityLevel=1.4",
+            # Réduction des images au-delà de la résolution cible
+            "-dDownsampleColorImages=true",
+            "-dDownsampleGrayImages=true",
+            "-dDownsampleMonoImages=true",
+            "-dColorImageDownsampleType=/Bicubic",
+            "-dGrayImageDownsampleType=/Bicubic",
+            "-dColorImageDownsampleThreshold=1.0",
+            "-dGrayImageDownsampleThreshold=1.0",
+            f"-dColorImageResolution={dpi}",
+            f"-dGrayImageResolution={dpi}",
+            f"-dMonoImageResolution={dpi * 2}",
+            # Réencodage JPEG à qualité fixée
+            "-dAutoFilterColorImages=false",
+            "-dAutoFilterGrayImages=false",
+            "-dColorImageFilter=/DCTEncode",
+            "-dGrayImageFilter=/DCTEncode",
+            f"-dJPEGQ={jpeg_quality}",
             f"-sOutputFile={output_path}",
             str(pdf_path)
         ]
 
-        logger.debug(f"Compression Ghostscript /{quality}: {' '.join(cmd)}")
+        logger.debug(f"Compression Ghostscript {dpi} DPI q{jpeg_quality}: {' '.join(cmd)}")
 
         try:
             result = subprocess.run(
@@ -512,6 +767,53 @@ class DocumentProcessor:
 
         return str(output_path)
 
+    def append_pdf(self, master_path: str, pdf_path: str, output_path: str) -> str:
+        """
+        Ajoute les pages d'un PDF à la fin d'un PDF maître.
+
+        Écrit une mise à jour incrémentale : le contenu du maître est recopié
+        tel quel et seules les nouvelles pages sont ajoutées (pas de
+        réécriture des objets existants, coût proportionnel au nouveau PDF).
+
+        Args:
+            master_path: PDF maître existant.
+            pdf_path: PDF à ajouter.
+            output_path: Chemin du PDF de sortie.
+
+        Returns:
+            Chemin du PDF de sortie.
+
+        Raises:
+            FileNotFoundError: Si un des PDF n'existe pas.
+        """
+        for path in (master_path, pdf_path):
+            if not Path(path).exists():
+                raise FileNotFoundError(f"PDF non trouvé: {path}")
+
+        try:
+            writer = PdfWriter(str(master_path), incremental=True)
+        except Exception as e:
+            # PDF maître non modifiable incrémentalement (chiffré, xref corrompue...)
+            logger.warning(f"Ajout incrémental impossible ({Path(master_path).name}): {e}, fusion complète")
+            return self.merge_pdfs([str(master_path), str(pdf_path)], str(output_path))
+
+        for page in PdfReader(str(pdf_path)).pages:
+            writer.add_page(page)
+
+        with open(output_path, "wb") as output_file:
+            writer.write(output_file)
+
+        logger.info(
+            f"PDF ajouté au maître (mise à jour incrémentale)",
+            extra={
+                "master": Path(master_path).name,
+                "added_kb": f"{Path(pdf_path).stat().st_size / 1024:.2f}",
+                "output_kb": f"{Path(output_path).stat().st_size / 1024:.2f}"
+            }
+        )
+
+        return str(output_path)
+
     def calculate_file_hash(self, file_path: str) -> str:
         """
         Calcule le hash SHA256 d'un fichier.
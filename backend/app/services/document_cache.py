@@ -0,0 +1,204 @@
+"""
+Cache des traitements documentaires, indexé par hash SHA-256.
+
+Un même fichier (ex: bulletin de salaire renvoyé trois fois) ne doit
+coûter qu'une seule conversion LibreOffice/Ghostscript, une seule
+classification Mistral et un seul upload Drive :
+
+- Disque local (LRU) : PDF convertis, nommés par hash du fichier source.
+- Supabase (table documents_cache) : nature Mistral, ID Drive, métadonnées.
+"""
+
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.config import get_settings
+from app.utils.db import get_document_cache_entry, upsert_document_cache_entry
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentCache:
+    """
+    Cache à deux niveaux des résultats de traitement des documents.
+
+    Les erreurs du cache ne sont jamais bloquantes : un échec de lecture
+    est traité comme une absence, un échec d'écriture est seulement loggé.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_size_mb: Optional[int] = None):
+        """
+        Initialise le cache.
+
+        Args:
+            cache_dir: Répertoire des PDF convertis. Si None, utilise DOCUMENT_CACHE_DIR.
+            max_size_mb: Taille max du cache disque (0 = désactivé, seul l'index
+                Supabase est utilisé). Si None, utilise DOCUMENT_CACHE_MAX_MB.
+        """
+        settings = get_settings()
+        self.cache_dir = Path(cache_dir or settings.DOCUMENT_CACHE_DIR)
+        if max_size_mb is None:
+            max_size_mb = settings.DOCUMENT_CACHE_MAX_MB
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        if self.max_size_bytes > 0:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        # Entrées Supabase déjà lues pendant la vie de l'instance
+        self._entries: Dict[str, Optional[Dict[str, Any]]] = {}
+
+    # =========================================================================
+    # INDEX SUPABASE
+    # =========================================================================
+
+    def get_entry(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Récupère l'entrée d'index d'un hash (nature, drive_file_id...).
+
+        Args:
+            file_hash: Hash SHA-256 du fichier source.
+
+        Returns:
+            Dict de l'entrée, ou None si le hash n'a jamais été traité.
+        """
+        if file_hash not in self._entries:
+            try:
+                self._entries[file_hash] = get_document_cache_entry(file_hash)
+            except Exception as e:
+                logger.warning(f"Cache documentaire indisponible ({file_hash[:12]}): {e}")
+                return None
+        return self._entries[file_hash]
+
+    def get_nature(self, file_hash: str) -> Optional[str]:
+        """Retourne la nature Mistral déjà connue pour ce hash."""
+        entry = self.get_entry(file_hash)
+        return entry.get("nature") if entry else None
+
+    def record(self, file_hash: str, **fields: Any) -> None:
+        """
+        Enregistre des résultats de traitement pour un hash.
+
+        Args:
+            file_hash: Hash SHA-256 du fichier source.
+            **fields: Colonnes de documents_cache (nature, drive_file_id,
+                pdf_size_bytes, metadata).
+        """
+        current = self._entries.get(file_hash) or {}
+        if all(current.get(key) == value for key, value in fields.items()):
+            return
+
+        try:
+            entry = upsert_document_cache_entry(file_hash, fields)
+            self._entries[file_hash] = entry or {**current, **fields}
+        except Exception as e:
+            logger.warning(f"Écriture cache documentaire échouée ({file_hash[:12]}): {e}")
+
+    # =========================================================================
+    # PDF CONVERTIS (DISQUE LOCAL, LRU)
+    # =========================================================================
+
+    def _pdf_path(self, file_hash: str) -> Path:
+        return self.cache_dir / f"{file_hash}.pdf"
+
+    def get_converted_pdf(self, file_hash: str, dest_path: Path) -> Optional[Path]:
+        """
+        Récupère le PDF converti en cache pour un fichier source.
+
+        Le PDF est lié (ou copié) vers dest_path : une éviction déclenchée
+        par un autre traitement en parallèle ne supprime pas le fichier
+        en cours d'utilisation.
+
+        Args:
+            file_hash: Hash SHA-256 du fichier source.
+            dest_path: Emplacement de travail du PDF (répertoire temporaire).
+
+        Returns:
+            dest_path, ou None si absent du cache.
+        """
+        if self.max_size_bytes <= 0:
+            return None
+
+        path = self._pdf_path(file_hash)
+        dest_path = Path(dest_path)
+        try:
+            dest_path.unlink(missing_ok=True)
+            try:
+                os.link(path, dest_path)
+            except OSError:
+                # Autre système de fichiers : copie
+                shutil.copyfile(path, dest_path)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Lecture du PDF en cache échouée ({file_hash[:12]}): {e}")
+            return None
+
+        # Date de modification = date de dernier accès pour l'éviction LRU
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        logger.info(f"PDF converti trouvé en cache ({file_hash[:12]})")
+        return dest_path
+
+    def put_converted_pdf(self, file_hash: str, pdf_path: str) -> Path:
+        """
+        Ajoute un PDF converti au cache et applique l'éviction LRU.
+
+        Args:
+            file_hash: Hash SHA-256 du fichier source.
+            pdf_path: PDF produit par la conversion.
+
+        Returns:
+            Chemin du PDF dans le cache (ou pdf_path en cas d'erreur ou si
+            le cache disque est désactivé). Peut être évincé à tout moment :
+            l'appelant continue de travailler sur pdf_path.
+        """
+        if self.max_size_bytes <= 0:
+            return Path(pdf_path)
+
+        target = self._pdf_path(file_hash)
+        try:
+            tmp_target = target.with_suffix(".tmp")
+            shutil.copyfile(pdf_path, tmp_target)
+            os.replace(tmp_target, target)
+            self._evict()
+        except OSError as e:
+            logger.warning(f"Mise en cache du PDF échouée ({file_hash[:12]}): {e}")
+            return Path(pdf_path)
+
+        if not target.is_file():
+            # PDF plus gros que le cache entier : évincé immédiatement
+            return Path(pdf_path)
+
+        self.record(file_hash, pdf_size_bytes=target.stat().st_size)
+        return target
+
+    def _evict(self) -> None:
+        """Supprime les PDF les moins récemment utilisés au-delà de la taille max."""
+        files = []
+        total = 0
+        for path in self.cache_dir.glob("*.pdf"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if total <= self.max_size_bytes:
+            return
+
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_size_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+                logger.debug(f"Cache documentaire: éviction de {path.name}")
+            except FileNotFoundError:
+                continue
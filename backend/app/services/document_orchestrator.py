@@ -9,19 +9,24 @@ Gère le cycle de vie avancé des documents :
 - Stockage structuré
 """
 
+import asyncio
 import logging
 import json
+import shutil
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
 
 from app.services.document import DocumentProcessor
+from app.services.document_cache import DocumentCache
+from app.services.document_pool import AsyncDocumentProcessor, is_task_cancelling
 from app.services.drive import DriveManager
 from app.models.email import EmailAttachment
 from app.utils.db import (
-    get_dossier_context, update_dossier_context, get_config,
-    get_db, create_piece_dossier, update_piece_dossier, get_pieces_by_client
+    get_dossier_context, update_dossier_context,
+    get_db, create_piece_dossier, update_piece_dossier, get_pieces_by_client,
+    check_duplicate_piece
 )
 
 logger = logging.getLogger(__name__)
@@ -35,7 +40,9 @@ class DocumentOrchestrator:
 
     def __init__(self):
         self.doc_processor = DocumentProcessor()
+        self.async_processor = AsyncDocumentProcessor(self.doc_processor)
         self.drive_manager = DriveManager()
+        self.doc_cache = DocumentCache()
         self.known_types = self._load_known_types() # { "NOM_CLEAN": "UUID" }
         self.legacy_mapping = {
              "CNI": "Pièce d'identité",
@@ -97,76 +104,150 @@ class DocumentOrchestrator:
         for att in attachments:
             # Sauvegarde temporaire
             temp_path = Path(self.doc_processor.temp_dir) / att.filename
-            with open(temp_path, "wb") as f:
-                if att.content: f.write(att.content)
-            
-            # Analyse type via Mistral
-            raw_type = await mistral_service.analyze_document_nature(att.filename, known_keys)
-            logger.info(f"Mistral a identifié '{att.filename}' comme : {raw_type}")
-            
+            if att.path and Path(att.path).is_file():
+                # Copie par blocs depuis le store (contenu jamais chargé en mémoire)
+                shutil.copyfile(att.path, temp_path)
+            else:
+                with open(temp_path, "wb") as f:
+                    if att.content: f.write(att.content)
+
+            file_hash = att.content_hash or self.doc_processor.calculate_file_hash(str(temp_path))
+
+            # Doublon : fichier déjà reçu pour ce client (aucun traitement)
+            try:
+                duplicate = check_duplicate_piece(file_hash, client_id)
+            except Exception as e:
+                logger.warning(f"Vérification doublon impossible pour '{att.filename}': {e}")
+                duplicate = None
+
+            if duplicate:
+                logger.info(
+                    f"Doublon ignoré: '{att.filename}' déjà présent "
+                    f"(pièce {duplicate.get('id')}, Drive {duplicate.get('fichier_drive_id')})"
+                )
+                continue
+
+            # Analyse type via Mistral (ou résultat déjà connu pour ce contenu)
+            raw_type = self.doc_cache.get_nature(file_hash)
+            if raw_type:
+                logger.info(f"Nature de '{att.filename}' trouvée en cache : {raw_type}")
+            else:
+                raw_type = await mistral_service.analyze_document_nature(att.filename, known_keys)
+                logger.info(f"Mistral a identifié '{att.filename}' comme : {raw_type}")
+                self.doc_cache.record(file_hash, nature=raw_type)
+
             master_type = self._get_master_type(raw_type)
             
             if master_type not in grouped:
                 grouped[master_type] = []
-            grouped[master_type].append(temp_path)
+            grouped[master_type].append((temp_path, file_hash))
 
         # 2. Traitement par Groupe
-        for master_type, paths in grouped.items():
+        # Noms Maîtres (sans date, uniques par type) et recherche Drive groupée
+        master_names = {
+            master_type: self._generate_master_name(master_type, client)
+            for master_type in grouped
+        }
+        existing_ids = self.drive_manager.find_files_by_name(
+            list(master_names.values()), folder_id
+        ) if grouped else {}
+
+        # Groupes traités en parallèle : uploads Drive bornés par DRIVE_UPLOAD_CONCURRENCY
+        upload_slots = asyncio.Semaphore(self.drive_manager.upload_concurrency)
+
+        async def process_group(master_type: str, files: List[Tuple[Path, str]]) -> Optional[Dict]:
+            hashes = [file_hash for _, file_hash in files]
             try:
                 # A. Consolidation Locale (ex: 3 relevés -> 1 PDF)
-                local_pdf = self._consolidate_local_files(paths, master_type, client_id)
-                if not local_pdf: continue
+                local_pdf = await self._consolidate_local_files(files, master_type, client_id)
+                if not local_pdf: return None
 
                 # B. Nommage Standard Maître (Sans date, unique par type)
-                final_name = self._generate_master_name(master_type, client)
+                final_name = master_names[master_type]
                 
                 # C. Vérification Drive (Append Logic)
-                existing_file_id = self.drive_manager.find_file_by_name(final_name, folder_id)
+                existing_file_id = existing_ids.get(final_name)
                 final_file_id = None
                 
                 if existing_file_id:
                     logger.info(f"Fichier Maître existant trouvé sur Drive ({final_name}). Mode: APPEND.")
                     
-                    # 1. Télécharger l'existant
+                    # 1. Récupérer l'existant (cache local si inchangé sur Drive)
                     download_path = Path(self.doc_processor.temp_dir) / f"drive_master_{client_id}_{master_type}.pdf"
-                    self.drive_manager.download_file(existing_file_id, download_path)
+                    await asyncio.to_thread(
+                        self.drive_manager.download_file, existing_file_id, download_path
+                    )
                     
-                    # 2. Fusionner (Existant + Nouveau)
+                    # 2. Ajout incrémental (Existant + Nouveau)
                     merged_output = Path(self.doc_processor.temp_dir) / f"updated_master_{client_id}_{master_type}.pdf"
-                    self.doc_processor.merge_pdfs([download_path, local_pdf], str(merged_output))
+                    await self.async_processor.append_pdf(download_path, local_pdf, str(merged_output))
                     
-                    # 3. Update sur Drive
-                    self.drive_manager.update_file(existing_file_id, merged_output)
+                    # 3. Update sur Drive (la nouvelle version est gardée en cache local)
+                    async with upload_slots:
+                        await asyncio.to_thread(
+                            self.drive_manager.update_file, existing_file_id, merged_output
+                        )
                     final_file_id = existing_file_id
                     
                 else:
                     logger.info(f"Création nouveau Fichier Maître sur Drive ({final_name}).")
-                    final_file_id = self.drive_manager.upload_file(local_pdf, folder_id, final_name)
+                    async with upload_slots:
+                        final_file_id = await asyncio.to_thread(
+                            self.drive_manager.upload_file, local_pdf, folder_id, final_name
+                        )
 
                 # D. Enregistrement en base de données
                 db_record = self._register_in_database(
                     client_id=client_id,
                     master_type=master_type,
                     final_name=final_name,
-                    file_id=final_file_id
+                    file_id=final_file_id,
+                    file_hashes=hashes
                 )
 
-                processed_docs.append({
-                    "original_name": f"{len(paths)} fichiers fusionnés",
+                for file_hash in hashes:
+                    self.doc_cache.record(file_hash, drive_file_id=final_file_id)
+
+                return {
+                    "original_name": f"{len(files)} fichiers fusionnés",
                     "final_name": final_name,
                     "type": master_type,
                     "file_id": final_file_id,
                     "status": "processed",
                     "db_id": db_record.get('id') if db_record else None
-                })
+                }
 
             except Exception as e:
                 logger.error(f"Erreur traitement groupe {master_type}: {e}", exc_info=True)
+                return None
+            except asyncio.CancelledError:
+                if is_task_cancelling():
+                    raise
+                logger.error(f"Traitement groupe {master_type} annulé (pool documentaire réinitialisé)")
+                return None
+
+        results = await asyncio.gather(
+            *(process_group(master_type, files) for master_type, files in grouped.items())
+        )
+        processed_docs.extend(doc for doc in results if doc)
 
         return processed_docs
 
-    def _register_in_database(self, client_id: str, master_type: str, final_name: str, file_id: str) -> Optional[Dict]:
-        """Enregistre ou met à jour la pièce dans la table pieces_dossier."""
+    def _register_in_database(
+        self,
+        client_id: str,
+        master_type: str,
+        final_name: str,
+        file_id: str,
+        file_hashes: Optional[List[str]] = None
+    ) -> Optional[Dict]:
+        """
+        Enregistre ou met à jour la pièce dans la table pieces_dossier.
+
+        Les hash des fichiers fusionnés sont conservés (fichier_hash et
+        metadata.fichiers_hashes) pour la détection des doublons.
+        """
+        file_hashes = file_hashes or []
         try:
             db = get_db()
             
@@ -221,13 +302,21 @@ class DocumentOrchestrator:
 
             data["metadata"] = metadata
 
+            if file_hashes:
+                data["fichier_hash"] = file_hashes[-1]
+
             if target_piece:
                 # Merge metadata existantes si besoin
                 current_meta = target_piece.get('metadata') or {}
+                known_hashes = current_meta.get('fichiers_hashes') or []
+                metadata["fichiers_hashes"] = known_hashes + [
+                    h for h in file_hashes if h not in known_hashes
+                ]
                 # On update
                 logger.info(f"Mise à jour pièce DB {target_piece['id']} ({master_type})")
                 return update_piece_dossier(target_piece['id'], data)
             else:
+                metadata["fichiers_hashes"] = file_hashes
                 logger.info(f"Création nouvelle pièce DB ({master_type})")
                 return create_piece_dossier(data)
 
@@ -271,15 +360,54 @@ class DocumentOrchestrator:
             return "CNI"
         return raw_type
 
-    def _consolidate_local_files(self, paths: List[Path], master_type: str, client_id: str) -> Optional[Path]:
-        """Fusionne une liste de fichiers locaux en un seul PDF."""
-        if not paths: return None
+    async def _consolidate_local_files(
+        self,
+        files: List[Tuple[Path, str]],
+        master_type: str,
+        client_id: str
+    ) -> Optional[Path]:
+        """
+        Fusionne une liste de fichiers locaux en un seul PDF.
+
+        Les conversions sont lancées en parallèle dans le pool de traitement
+        documentaire (hors event loop).
+
+        Args:
+            files: Tuples (chemin, hash SHA-256) ; le hash sert de clé au
+                cache des PDF convertis.
+        """
+        if not files: return None
         
-        # Conversion tous en PDF d'abord
-        pdf_paths = []
-        for p in paths:
-            pdf = self.doc_processor.convert_to_pdf(p)
-            if pdf: pdf_paths.append(pdf)
+        # Tri simple (pour CNI Recto/Verso ou Relevés chronologiques si nommés ainsi)
+        # Fait sur les noms d'origine : les PDF en cache sont nommés par hash
+        files = sorted(files, key=lambda f: Path(f[0]).stem)
+
+        # PDF déjà convertis en cache
+        pdf_by_index = {}
+        to_convert = []
+        for i, (p, file_hash) in enumerate(files):
+            cached = self.doc_cache.get_converted_pdf(
+                file_hash, Path(p).with_name(f"{Path(p).stem}_cache.pdf")
+            )
+            if cached:
+                pdf_by_index[i] = str(cached)
+            else:
+                to_convert.append(i)
+
+        # Conversion en parallèle des autres
+        converted = await self.async_processor.convert_many(
+            [str(files[i][0]) for i in to_convert]
+        )
+        for i, pdf in zip(to_convert, converted):
+            if not pdf:
+                continue
+            p, file_hash = files[i]
+            if Path(pdf) != Path(p):
+                # Copie en cache ; le PDF converti du répertoire temporaire reste utilisé
+                self.doc_cache.put_converted_pdf(file_hash, pdf)
+            pdf_by_index[i] = str(pdf)
+
+        pdf_paths = [pdf_by_index[i] for i in sorted(pdf_by_index)]
             
         if not pdf_paths: return None
         
@@ -290,13 +418,16 @@ class DocumentOrchestrator:
         # Fusion multiple
         output = Path(self.doc_processor.temp_dir) / f"consolidation_{master_type}_{client_id}.pdf"
         try:
-            # Tri simple (pour CNI Recto/Verso ou Relevés chronologiques si nommés ainsi)
-            pdf_paths.sort() 
-            self.doc_processor.merge_pdfs(pdf_paths, str(output))
+            await self.async_processor.merge_pdfs(pdf_paths, str(output))
             return output
         except Exception as e:
             logger.error(f"Erreur content consolidation locale: {e}")
             return pdf_paths[0] # Fallback sur le premier
+        except asyncio.CancelledError:
+            if is_task_cancelling():
+                raise
+            logger.error("Fusion locale annulée (pool documentaire réinitialisé)")
+            return pdf_paths[0] # Fallback sur le premier
 
     def _generate_master_name(self, master_type: str, client: Dict) -> str:
         """Génère le nom Maître (Sans date, unique par type)."""
@@ -0,0 +1,236 @@
+"""
+Exécution des traitements documentaires lourds hors de l'event loop.
+
+Les conversions (Pillow, LibreOffice), compressions (Ghostscript) et
+fusions (pypdf) sont exécutées dans un pool de processus borné, avec un
+timeout par tâche. AsyncDocumentProcessor expose les mêmes méthodes que
+DocumentProcessor sous forme de coroutines.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import get_settings
+from app.services.document import DocumentProcessor
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+# Instances DocumentProcessor réutilisées dans chaque processus du pool
+_worker_processors: Dict[Tuple, DocumentProcessor] = {}
+
+
+def _run_in_worker(processor_kwargs: Dict[str, Any], method: str, args: tuple, kwargs: dict) -> Any:
+    """Exécute une méthode de DocumentProcessor dans un processus du pool."""
+    key = tuple(sorted(processor_kwargs.items()))
+    processor = _worker_processors.get(key)
+    if processor is None:
+        processor = DocumentProcessor(**processor_kwargs)
+        _worker_processors[key] = processor
+    return getattr(processor, method)(*args, **kwargs)
+
+
+def get_document_executor() -> Optional[Executor]:
+    """
+    Retourne le pool de processus partagé (créé au premier appel).
+
+    Returns:
+        ProcessPoolExecutor, ou None si DOCUMENT_POOL_WORKERS vaut 0
+        (exécution dans un thread).
+    """
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            workers = get_settings().DOCUMENT_POOL_WORKERS
+            if workers <= 0:
+                return None
+
+            # spawn : pas de fork d'un processus contenant des threads (IDLE, scheduler)
+            # setsid : chaque processus mène son groupe (soffice, gs) pour pouvoir l'arrêter
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=os.setsid
+            )
+            logger.info(f"Pool de traitement documentaire démarré ({workers} processus)")
+
+        return _executor
+
+
+def _worker_pids(executor: Executor) -> List[int]:
+    """
+    Liste les PID des processus du pool.
+
+    ProcessPoolExecutor n'expose pas ses processus : _processes est lu
+    en l'absence d'API publique (absent : rien à tuer). À relever avant
+    shutdown(), qui vide _processes.
+    """
+    processes = getattr(executor, "_processes", None) or {}
+    return list(processes)
+
+
+def _kill_workers(pids: List[int]) -> None:
+    """Tue les processus du pool et leurs enfants (soffice, gs, unoconvert)."""
+    for pid in pids:
+        try:
+            # Groupe du processus (initializer=os.setsid) : enfants compris
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        except OSError as e:
+            logger.warning(f"Arrêt du processus de traitement {pid} impossible: {e}")
+
+
+def _reset_executor(broken: Executor) -> None:
+    """
+    Remplace le pool après un timeout ou un crash.
+
+    Les tâches en attente sont annulées et les processus tués avec leurs
+    enfants : un processus bloqué (soffice figé) ne survit pas au pool.
+    Les tâches en cours des autres appelants échouent (RuntimeError).
+    """
+    global _executor
+
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    pids = _worker_pids(broken)
+    broken.shutdown(wait=False, cancel_futures=True)
+    _kill_workers(pids)
+
+
+def shutdown_document_executor() -> None:
+    """Arrête le pool de processus (arrêt de l'application)."""
+    global _executor
+
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def is_task_cancelling() -> bool:
+    """
+    Indique si la tâche courante est elle-même annulée.
+
+    Distingue une annulation réelle (à propager) d'un CancelledError
+    provenant d'un future du pool annulé par _reset_executor.
+    """
+    task = asyncio.current_task()
+    return task is not None and task.cancelling() > 0
+
+
+class AsyncDocumentProcessor:
+    """
+    Façade asynchrone de DocumentProcessor.
+
+    Chaque appel est exécuté dans le pool de processus (ou un thread si le
+    pool est désactivé) et borné par DOCUMENT_TASK_TIMEOUT.
+    """
+
+    def __init__(self, processor: Optional[DocumentProcessor] = None, timeout: Optional[float] = None):
+        """
+        Initialise la façade.
+
+        Args:
+            processor: DocumentProcessor dont la configuration est reprise
+                dans les processus du pool. Si None, configuration par défaut.
+            timeout: Timeout par tâche en secondes. Si None, utilise
+                DOCUMENT_TASK_TIMEOUT.
+        """
+        self.processor = processor or DocumentProcessor()
+        self.timeout = timeout or get_settings().DOCUMENT_TASK_TIMEOUT
+        self._processor_kwargs = {
+            "temp_dir": self.processor.temp_dir,
+            "max_file_size_mb": self.processor.max_file_size_mb,
+            "target_pdf_size_mb": self.processor.target_pdf_size_mb,
+        }
+
+    async def _run(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        """
+        Exécute une méthode de DocumentProcessor hors de l'event loop.
+
+        Raises:
+            TimeoutError: Si la tâche dépasse le timeout.
+            RuntimeError: Si le processus du pool a planté ou si la tâche a
+                été annulée par le remplacement du pool.
+        """
+        loop = asyncio.get_running_loop()
+        executor = get_document_executor()
+
+        if executor is None:
+            call = partial(getattr(self.processor, method), *args, **kwargs)
+        else:
+            call = partial(_run_in_worker, self._processor_kwargs, method, args, kwargs)
+
+        future = loop.run_in_executor(executor, call)
+        try:
+            return await asyncio.wait_for(future, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Timeout traitement document ({method}, >{self.timeout}s)")
+            if executor is not None:
+                _reset_executor(executor)
+            raise TimeoutError(f"{method} timeout (>{self.timeout}s)")
+        except BrokenProcessPool as e:
+            logger.error(f"Processus de traitement document arrêté ({method}): {e}")
+            _reset_executor(executor)
+            raise RuntimeError(f"{method}: processus de traitement arrêté") from e
+        except asyncio.CancelledError:
+            if is_task_cancelling():
+                raise
+            # Tâche en attente annulée par _reset_executor (timeout d'une autre tâche)
+            logger.error(f"Traitement document annulé, pool réinitialisé ({method})")
+            raise RuntimeError(f"{method}: tâche annulée (pool réinitialisé)")
+
+    async def convert_to_pdf(self, file_path: str) -> Optional[str]:
+        """Version asynchrone de DocumentProcessor.convert_to_pdf."""
+        return await self._run("convert_to_pdf", str(file_path))
+
+    async def compress_pdf(self, pdf_path: str, target_size_mb: Optional[float] = None) -> str:
+        """Version asynchrone de DocumentProcessor.compress_pdf."""
+        return await self._run("compress_pdf", str(pdf_path), target_size_mb)
+
+    async def merge_pdfs(self, pdf_paths: List[str], output_path: str, **kwargs: Any) -> str:
+        """Version asynchrone de DocumentProcessor.merge_pdfs."""
+        return await self._run(
+            "merge_pdfs", [str(p) for p in pdf_paths], str(output_path), **kwargs
+        )
+
+    async def append_pdf(self, master_path: str, pdf_path: str, output_path: str) -> str:
+        """Version asynchrone de DocumentProcessor.append_pdf."""
+        return await self._run("append_pdf", str(master_path), str(pdf_path), str(output_path))
+
+    async def convert_many(self, file_paths: List[str]) -> List[Optional[str]]:
+        """
+        Convertit plusieurs fichiers en parallèle.
+
+        Args:
+            file_paths: Fichiers à convertir.
+
+        Returns:
+            Chemins des PDF, dans le même ordre (None pour un échec).
+        """
+        results = await asyncio.gather(
+            *(self.convert_to_pdf(path) for path in file_paths),
+            return_exceptions=True
+        )
+
+        pdf_paths = []
+        for path, result in zip(file_paths, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Erreur conversion PDF de {path}: {result}")
+                pdf_paths.append(None)
+            else:
+                pdf_paths.append(result)
+        return pdf_paths
@@ -12,17 +12,86 @@ Ce module gère l'organisation hiérarchique sur Google Drive:
 import io
 import json
 import logging
+import shutil
+import threading
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+import httplib2
 from google.oauth2 import service_account
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
+from googleapiclient.http import MediaIoBaseDownload
 
 from app.config import get_settings
+from app.services.drive_cache import DriveFileCache
+from app.services.drive_index import FOLDER_MIME_TYPE, get_drive_index
+from app.services.drive_lookup_cache import MISSING, get_drive_lookup_cache
+from app.services.drive_upload import (
+    UploadSessionStore,
+    build_media,
+    execute_upload,
+    get_upload_session_store,
+)
 
 logger = logging.getLogger(__name__)
 
+# Nombre max d'appels par requête batch (limite de l'API Drive)
+MAX_BATCH_SIZE = 100
+
+# Timeout des connexions HTTP Drive (secondes)
+HTTP_TIMEOUT = 120
+
+# Services Drive par thread (httplib2 n'est pas thread-safe)
+_thread_local = threading.local()
+
+
+@lru_cache()
+def _load_credentials(credentials_json: str) -> service_account.Credentials:
+    """
+    Charge les credentials du Service Account (une fois par processus).
+
+    Le token d'accès est partagé par tous les threads et rafraîchi
+    automatiquement à expiration.
+    """
+    creds_dict = json.loads(credentials_json)
+    return service_account.Credentials.from_service_account_info(
+        creds_dict,
+        scopes=['https://www.googleapis.com/auth/drive.file']
+    )
+
+
+def get_drive_service(credentials: service_account.Credentials):
+    """
+    Retourne le client Drive v3 du thread courant (créé au premier appel).
+
+    Chaque thread a sa propre connexion HTTP authentifiée, réutilisée
+    (keep-alive TLS) pour tous ses appels. Le document de découverte est
+    celui embarqué dans google-api-python-client (pas de requête réseau).
+
+    Args:
+        credentials: Credentials partagés (voir _load_credentials).
+
+    Returns:
+        Resource googleapiclient pour Drive v3.
+    """
+    services = getattr(_thread_local, "services", None)
+    if services is None:
+        services = _thread_local.services = {}
+
+    service = services.get(id(credentials))
+    if service is None:
+        http = AuthorizedHttp(credentials, http=httplib2.Http(timeout=HTTP_TIMEOUT))
+        service = build(
+            'drive', 'v3',
+            http=http,
+            cache_discovery=False,
+            static_discovery=True
+        )
+        services[id(credentials)] = service
+    return service
+
 
 class DriveManager:
     """
@@ -36,24 +105,48 @@ class DriveManager:
         """
         Initialise connexion Google Drive avec Service Account.
 
-        Le JSON credentials est stocké dans env var GOOGLE_CREDENTIALS_JSON
+        Le JSON credentials est stocké dans env var GOOGLE_CREDENTIALS_JSON.
+        Credentials et clients HTTP sont partagés au niveau du processus :
+        instancier un DriveManager ne coûte presque rien.
         """
         settings = get_settings()
 
         try:
-            # Charger credentials depuis env var
-            creds_dict = json.loads(settings.GOOGLE_CREDENTIALS_JSON)
-
-            credentials = service_account.Credentials.from_service_account_info(
-                creds_dict,
-                scopes=['https://www.googleapis.com/auth/drive.file']
-            )
-
-            self.service = build('drive', 'v3', credentials=credentials)
+            # Credentials depuis env var (parsés une seule fois par processus)
+            self.credentials = _load_credentials(settings.GOOGLE_CREDENTIALS_JSON)
+            self._service = None
 
             # ID du dossier maître (depuis config)
             self.master_folder_id = settings.GOOGLE_DRIVE_MASTER_FOLDER_ID
 
+            # Miroir local des fichiers uploadés/téléchargés (0 = désactivé)
+            self.file_cache = None
+            if settings.DRIVE_CACHE_MAX_MB > 0:
+                self.file_cache = DriveFileCache(
+                    settings.DRIVE_CACHE_DIR, settings.DRIVE_CACHE_MAX_MB
+                )
+
+            # Cache des recherches (dossiers, fichiers par nom, listings), 0 = désactivé
+            self.lookup_cache = None
+            if settings.DRIVE_LOOKUP_CACHE_TTL > 0:
+                self.lookup_cache = get_drive_lookup_cache(
+                    settings.DRIVE_LOOKUP_CACHE_TTL,
+                    settings.DRIVE_LOOKUP_CACHE_MAX_ENTRIES,
+                    settings.DRIVE_LOOKUP_CACHE_REDIS
+                )
+
+            # Index local de l'arborescence, tenu à jour par DriveChangesWatcher
+            # (utilisé seulement s'il a été synchronisé récemment)
+            self.index = None
+            if settings.DRIVE_CHANGES_POLL_SECONDS > 0:
+                self.index = get_drive_index(settings.DRIVE_INDEX_PATH)
+                self.index_max_age = 3 * settings.DRIVE_CHANGES_POLL_SECONDS + 60
+
+            # Uploads : multipart sous le seuil, résumable avec reprise au-delà
+            self.multipart_max_bytes = int(settings.DRIVE_MULTIPART_MAX_MB * 1024 * 1024)
+            self.upload_concurrency = max(1, settings.DRIVE_UPLOAD_CONCURRENCY)
+            self.upload_sessions = get_upload_session_store(settings.DRIVE_UPLOAD_SESSION_DIR)
+
             logger.info(
                 "DriveManager initialisé",
                 extra={
@@ -76,6 +169,76 @@ class DriveManager:
             )
             raise
 
+    @property
+    def service(self):
+        """Client Drive v3 du thread courant."""
+        if self._service is not None:
+            return self._service
+        return get_drive_service(self.credentials)
+
+    @service.setter
+    def service(self, service) -> None:
+        # Client imposé (tests, client spécifique)
+        self._service = service
+
+    # =========================================================================
+    # CACHE DES RECHERCHES
+    # =========================================================================
+
+    def _cache_get(self, parent_id: str, key: str):
+        if self.lookup_cache is None:
+            return MISSING
+        return self.lookup_cache.get(parent_id, key)
+
+    def _cache_set(self, parent_id: str, key: str, value) -> None:
+        if self.lookup_cache is not None:
+            self.lookup_cache.set(parent_id, key, value)
+
+    def _cache_invalidate(self, parent_id: Optional[str] = None) -> None:
+        """Invalide les recherches d'un dossier (tout le cache si None)."""
+        if self.lookup_cache is None:
+            return
+        if parent_id is None:
+            self.lookup_cache.clear()
+        else:
+            self.lookup_cache.invalidate(parent_id)
+
+    # =========================================================================
+    # INDEX LOCAL (flux changes.list)
+    # =========================================================================
+
+    def _index_lookup(self, parent_id: str, name: str, folders_only: bool = False):
+        """Recherche dans l'index local (MISSING si indisponible ou périmé)."""
+        if self.index is None:
+            return MISSING
+        try:
+            if not self.index.is_fresh(self.index_max_age):
+                return MISSING
+            return self.index.lookup(parent_id, name, folders_only)
+        except Exception as e:
+            logger.debug(f"Index Drive indisponible: {e}")
+            return MISSING
+
+    def _index_update(self, file: Dict[str, Any], created: bool = False) -> None:
+        """Reporte nos propres écritures dans l'index (sans attendre le flux)."""
+        if self.index is None:
+            return
+        try:
+            self.index.upsert(file, created=created)
+        except Exception as e:
+            logger.debug(f"Index Drive indisponible: {e}")
+
+    def _index_remove(self, file_id: str) -> Optional[str]:
+        """Retire un fichier de l'index ; retourne son dossier parent s'il était connu."""
+        if self.index is None:
+            return None
+        try:
+            parents = self.index.remove(file_id)
+        except Exception as e:
+            logger.debug(f"Index Drive indisponible: {e}")
+            return None
+        return next(iter(parents), None)
+
     def create_folder(
         self,
         folder_name: str,
@@ -109,6 +272,15 @@ class DriveManager:
 
             folder_id = folder.get('id')
 
+            self._cache_invalidate(parent_folder_id)
+            self._cache_set(parent_folder_id, f"folder:{folder_name}", folder_id)
+            self._index_update({
+                'id': folder_id,
+                'name': folder_name,
+                'mimeType': FOLDER_MIME_TYPE,
+                'parents': [parent_folder_id]
+            }, created=True)
+
             logger.info(
                 "Dossier créé sur Drive",
                 extra={
@@ -201,22 +373,33 @@ class DriveManager:
                 'parents': [folder_id]
             }
 
-            media = MediaFileUpload(
-                str(file_path),
-                mimetype='application/pdf',
-                resumable=True
-            )
+            media = build_media(file_path, 'application/pdf', self.multipart_max_bytes)
 
-            file = self.service.files().create(
+            request = self.service.files().create(
                 body=file_metadata,
                 media_body=media,
                 fields='id, name, webViewLink, size',
                 supportsAllDrives=True
-            ).execute()
+            )
+            # Clé de reprise (hash du contenu) : uploads résumables seulement
+            session_key = UploadSessionStore.key_for(
+                "create", folder_id, file_path, filename
+            ) if media.resumable() else None
+            file = execute_upload(request, media, self.upload_sessions, session_key)
 
             file_id = file.get('id')
             file_size = file.get('size')
 
+            if self.file_cache:
+                self.file_cache.put(file_id, file_path)
+            self._cache_invalidate(folder_id)
+            self._index_update({
+                'id': file_id,
+                'name': filename,
+                'mimeType': 'application/pdf',
+                'parents': [folder_id]
+            })
+
             logger.info(
                 "Fichier uploadé sur Drive",
                 extra={
@@ -250,6 +433,9 @@ class DriveManager:
         Utile pour récupérer un fichier existant (ex: recto carte ID)
         avant de le fusionner avec un nouveau (verso).
 
+        Si le fichier est dans le cache local avec le même md5Checksum
+        que sur Drive, il est copié depuis le cache sans téléchargement.
+
         Args:
             file_id: ID du fichier sur Drive
             output_path: Chemin local destination
@@ -260,6 +446,20 @@ class DriveManager:
         Raises:
             RuntimeError: Si téléchargement échoue
         """
+        md5_checksum = self.get_file_checksum(file_id) if self.file_cache else None
+        if md5_checksum:
+            cached_path = self.file_cache.get(file_id, md5_checksum)
+            if cached_path:
+                shutil.copyfile(cached_path, output_path)
+                logger.info(
+                    "Fichier Drive servi depuis le cache local",
+                    extra={
+                        "file_id": file_id,
+                        "output_path": str(output_path)
+                    }
+                )
+                return output_path
+
         try:
             request = self.service.files().get_media(
                 fileId=file_id,
@@ -277,6 +477,9 @@ class DriveManager:
                             f"Download progress: {int(status.progress() * 100)}%"
                         )
 
+            if self.file_cache:
+                self.file_cache.put(file_id, output_path)
+
             logger.info(
                 "Fichier téléchargé depuis Drive",
                 extra={
@@ -297,6 +500,35 @@ class DriveManager:
             )
             raise RuntimeError(f"Échec téléchargement: {e}")
 
+    def get_file_checksum(self, file_id: str) -> Optional[str]:
+        """
+        Récupère le MD5 du contenu d'un fichier Drive.
+
+        Permet de vérifier qu'une copie locale est à jour sans
+        télécharger le fichier.
+
+        Args:
+            file_id: ID du fichier sur Drive
+
+        Returns:
+            md5Checksum du fichier, ou None si indisponible
+        """
+        try:
+            file = self.service.files().get(
+                fileId=file_id,
+                fields='md5Checksum',
+                supportsAllDrives=True
+            ).execute()
+
+            return file.get('md5Checksum')
+
+        except Exception as e:
+            logger.error(
+                f"Erreur lecture checksum Drive: {e}",
+                extra={"file_id": file_id}
+            )
+            return None
+
     def delete_file(self, file_id: str) -> bool:
         """
         Supprime un fichier de Drive.
@@ -315,6 +547,11 @@ class DriveManager:
                 supportsAllDrives=True
             ).execute()
 
+            if self.file_cache:
+                self.file_cache.invalidate(file_id)
+            # Dossier parent connu par l'index, sinon toutes les recherches sont invalidées
+            self._cache_invalidate(self._index_remove(file_id))
+
             logger.info(
                 "Fichier supprimé de Drive",
                 extra={"file_id": file_id}
@@ -341,27 +578,97 @@ class DriveManager:
         Returns:
             URL de partage
         """
-        try:
-            # Créer permission "anyone with link can view"
-            permission = {
-                'type': 'anyone',
-                'role': 'reader'
-            }
+        return self.get_shareable_links([file_id])[file_id]
+
+    # =========================================================================
+    # OPÉRATIONS GROUPÉES (BATCH)
+    # =========================================================================
+
+    def _execute_batch(self, requests: List[Tuple[str, Any]]) -> Dict[str, Any]:
+        """
+        Exécute des appels Drive par requêtes batch (MAX_BATCH_SIZE appels par aller-retour HTTP).
+
+        Args:
+            requests: Liste de tuples (identifiant unique, requête non exécutée).
+
+        Returns:
+            Dict identifiant -> réponse, ou exception si l'appel a échoué.
+        """
+        results: Dict[str, Any] = {}
+
+        def callback(request_id, response, exception):
+            results[request_id] = exception if exception is not None else response
 
-            self.service.permissions().create(
+        for start in range(0, len(requests), MAX_BATCH_SIZE):
+            chunk = requests[start:start + MAX_BATCH_SIZE]
+            batch = self.service.new_batch_http_request(callback=callback)
+            for request_id, request in chunk:
+                batch.add(request, request_id=request_id)
+
+            try:
+                batch.execute()
+            except Exception as e:
+                logger.error(f"Erreur requête batch Drive ({len(chunk)} appels): {e}")
+                for request_id, _ in chunk:
+                    results.setdefault(request_id, e)
+
+        return results
+
+    def get_shareable_links(self, file_ids: List[str]) -> Dict[str, str]:
+        """
+        Génère les liens de partage de plusieurs fichiers.
+
+        Création des permissions et lecture des liens sont envoyées
+        ensemble par requêtes batch.
+
+        Args:
+            file_ids: IDs des fichiers
+
+        Returns:
+            Dict file_id -> URL de partage (lien de repli en cas d'erreur)
+        """
+        links: Dict[str, str] = {}
+        requests = []
+
+        for file_id in dict.fromkeys(file_ids):
+            cached_link = self._cache_get(file_id, "link")
+            if cached_link is not MISSING:
+                links[file_id] = cached_link
+                continue
+
+            # Permission "anyone with link can view"
+            requests.append((f"permission:{file_id}", self.service.permissions().create(
                 fileId=file_id,
-                body=permission,
+                body={'type': 'anyone', 'role': 'reader'},
                 supportsAllDrives=True
-            ).execute()
-
-            # Récupérer le lien
-            file = self.service.files().get(
+            )))
+            requests.append((f"link:{file_id}", self.service.files().get(
                 fileId=file_id,
                 fields='webViewLink',
                 supportsAllDrives=True
-            ).execute()
+            )))
+
+        results = self._execute_batch(requests) if requests else {}
+
+        for file_id in dict.fromkeys(file_ids):
+            if file_id in links:
+                continue
+
+            permission = results.get(f"permission:{file_id}")
+            file = results.get(f"link:{file_id}")
+
+            if not isinstance(permission, dict) or not isinstance(file, dict):
+                error = permission if not isinstance(permission, dict) else file
+                logger.error(
+                    f"Erreur génération lien: {error}",
+                    extra={"file_id": file_id}
+                )
+                links[file_id] = f"https://drive.google.com/file/d/{file_id}/view"
+                continue
 
             link = file.get('webViewLink')
+            self._cache_set(file_id, "link", link)
+            links[file_id] = link
 
             logger.info(
                 "Lien partageable généré",
@@ -371,15 +678,60 @@ class DriveManager:
                 }
             )
 
-            return link
+        return links
 
-        except Exception as e:
-            logger.error(
-                f"Erreur génération lien: {e}",
-                extra={"file_id": file_id},
-                exc_info=True
-            )
-            return f"https://drive.google.com/file/d/{file_id}/view"
+    def find_files_by_name(
+        self,
+        filenames: List[str],
+        folder_id: str
+    ) -> Dict[str, Optional[str]]:
+        """
+        Cherche plusieurs fichiers par nom dans un dossier (requêtes batch).
+
+        Args:
+            filenames: Noms exacts des fichiers
+            folder_id: ID du dossier où chercher
+
+        Returns:
+            Dict nom -> ID du fichier (None si non trouvé)
+        """
+        found: Dict[str, Optional[str]] = {}
+        requests = []
+
+        for index, filename in enumerate(dict.fromkeys(filenames)):
+            cached_id = self._index_lookup(folder_id, filename)
+            if cached_id is MISSING:
+                cached_id = self._cache_get(folder_id, f"name:{filename}")
+            if cached_id is not MISSING:
+                found[filename] = cached_id
+                continue
+
+            query = f"name='{filename}' and '{folder_id}' in parents and trashed=false"
+            requests.append((str(index), filename, self.service.files().list(
+                q=query,
+                fields="files(id, name)",
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True
+            )))
+
+        results = self._execute_batch([(rid, req) for rid, _, req in requests]) if requests else {}
+
+        for request_id, filename, _ in requests:
+            result = results.get(request_id)
+            if not isinstance(result, dict):
+                # Erreur : non mis en cache
+                logger.error(
+                    f"Erreur recherche fichier: {result}",
+                    extra={"file_name": filename}
+                )
+                found[filename] = None
+                continue
+
+            files = result.get('files', [])
+            found[filename] = files[0]['id'] if files else None
+            self._cache_set(folder_id, f"name:{filename}", found[filename])
+
+        return found
 
     def list_files_in_folder(
         self,
@@ -396,6 +748,11 @@ class DriveManager:
         Returns:
             Liste de dicts avec id, name, mimeType
         """
+        cache_key = f"list:{mime_type or '*'}"
+        cached_files = self._cache_get(folder_id, cache_key)
+        if cached_files is not MISSING:
+            return [dict(f) for f in cached_files]
+
         try:
             query = f"'{folder_id}' in parents and trashed=false"
 
@@ -410,6 +767,7 @@ class DriveManager:
             ).execute()
 
             files = results.get('files', [])
+            self._cache_set(folder_id, cache_key, files)
 
             logger.info(
                 "Fichiers listés",
@@ -447,6 +805,12 @@ class DriveManager:
         Returns:
             ID du fichier si trouvé, None sinon
         """
+        cached_id = self._index_lookup(folder_id, filename)
+        if cached_id is MISSING:
+            cached_id = self._cache_get(folder_id, f"name:{filename}")
+        if cached_id is not MISSING:
+            return cached_id
+
         try:
             query = f"name='{filename}' and '{folder_id}' in parents and trashed=false"
 
@@ -458,9 +822,10 @@ class DriveManager:
             ).execute()
 
             files = results.get('files', [])
+            file_id = files[0]['id'] if files else None
+            self._cache_set(folder_id, f"name:{filename}", file_id)
 
             if files:
-                file_id = files[0]['id']
                 logger.info(
                     "Fichier trouvé",
                     extra={
@@ -495,6 +860,12 @@ class DriveManager:
         Returns:
             ID du dossier si trouvé, None sinon
         """
+        cached_id = self._index_lookup(parent_folder_id, folder_name, folders_only=True)
+        if cached_id is MISSING:
+            cached_id = self._cache_get(parent_folder_id, f"folder:{folder_name}")
+        if cached_id is not MISSING:
+            return cached_id
+
         try:
             query = (
                 f"name='{folder_name}' and "
@@ -511,9 +882,10 @@ class DriveManager:
             ).execute()
 
             files = results.get('files', [])
+            folder_id = files[0]['id'] if files else None
+            self._cache_set(parent_folder_id, f"folder:{folder_name}", folder_id)
 
             if files:
-                folder_id = files[0]['id']
                 logger.info(
                     "Dossier déjà existant",
                     extra={
@@ -579,18 +951,27 @@ class DriveManager:
             RuntimeError: Si mise à jour échoue
         """
         try:
-            # Créer media upload
-            media = MediaFileUpload(
-                str(new_file_path),
-                resumable=True
-            )
+            # Créer media upload (multipart ou résumable selon la taille)
+            media = build_media(new_file_path, multipart_max_bytes=self.multipart_max_bytes)
 
             # Mettre à jour le fichier
-            updated_file = self.service.files().update(
+            request = self.service.files().update(
                 fileId=file_id,
                 media_body=media,
+                fields='id, name, parents',
                 supportsAllDrives=True
-            ).execute()
+            )
+            session_key = UploadSessionStore.key_for(
+                "update", file_id, new_file_path
+            ) if media.resumable() else None
+            updated_file = execute_upload(request, media, self.upload_sessions, session_key)
+
+            # Taille modifiée : listings des dossiers parents invalidés
+            for parent_id in updated_file.get('parents', []):
+                self._cache_invalidate(parent_id)
+
+            if self.file_cache:
+                self.file_cache.put(file_id, new_file_path)
 
             logger.info(
                 "Fichier mis à jour sur Drive",
@@ -0,0 +1,139 @@
+"""
+Cache disque des fichiers Google Drive (miroir local).
+
+Un fichier que l'on vient d'uploader ou de télécharger (ex: fichier maître
+Releves_Bancaires.pdf d'un client actif) n'est plus retéléchargé : la copie
+locale est servie tant que son MD5 correspond au md5Checksum du fichier
+Drive. Une modification externe change le md5Checksum et déclenche un
+nouveau téléchargement.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DriveFileCache:
+    """
+    Copies locales de fichiers Drive, indexées par ID Drive, éviction LRU.
+
+    Pour chaque fichier : <file_id> (contenu) et <file_id>.md5 (MD5 du
+    contenu, évite de relire le fichier à chaque validation).
+    """
+
+    def __init__(self, cache_dir: str, max_size_mb: int):
+        """
+        Initialise le cache.
+
+        Args:
+            cache_dir: Répertoire du cache.
+            max_size_mb: Taille max du cache (MB).
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _data_path(self, file_id: str) -> Path:
+        return self.cache_dir / file_id
+
+    def _md5_path(self, file_id: str) -> Path:
+        return self.cache_dir / f"{file_id}.md5"
+
+    @staticmethod
+    def _md5(path: Path) -> str:
+        md5 = hashlib.md5()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                md5.update(chunk)
+        return md5.hexdigest()
+
+    def get(self, file_id: str, md5_checksum: str) -> Optional[Path]:
+        """
+        Retourne la copie locale d'un fichier si elle correspond à la version Drive.
+
+        Args:
+            file_id: ID du fichier sur Drive.
+            md5_checksum: md5Checksum actuel du fichier sur Drive.
+
+        Returns:
+            Chemin de la copie locale (ne pas modifier sur place), ou None.
+        """
+        data_path = self._data_path(file_id)
+        try:
+            cached_md5 = self._md5_path(file_id).read_text().strip()
+        except FileNotFoundError:
+            return None
+
+        if cached_md5 != md5_checksum or not data_path.is_file():
+            return None
+
+        # Date de modification = date de dernier accès pour l'éviction LRU
+        try:
+            os.utime(data_path)
+        except OSError:
+            pass
+        return data_path
+
+    def put(self, file_id: str, source_path: Path) -> None:
+        """
+        Enregistre le contenu d'un fichier Drive (après upload ou téléchargement).
+
+        Args:
+            file_id: ID du fichier sur Drive.
+            source_path: Contenu local identique au fichier Drive.
+        """
+        try:
+            fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, prefix=".put_")
+            os.close(fd)
+            try:
+                shutil.copyfile(source_path, tmp_name)
+                md5 = self._md5(Path(tmp_name))
+
+                # MD5 retiré d'abord : une copie sans MD5 n'est jamais servie
+                self._md5_path(file_id).unlink(missing_ok=True)
+                os.replace(tmp_name, self._data_path(file_id))
+                self._md5_path(file_id).write_text(md5)
+            finally:
+                if os.path.exists(tmp_name):
+                    os.unlink(tmp_name)
+
+            self._evict()
+
+        except OSError as e:
+            logger.warning(f"Mise en cache du fichier Drive {file_id} échouée: {e}")
+
+    def invalidate(self, file_id: str) -> None:
+        """Supprime la copie locale d'un fichier (ex: fichier supprimé sur Drive)."""
+        self._md5_path(file_id).unlink(missing_ok=True)
+        self._data_path(file_id).unlink(missing_ok=True)
+
+    def _evict(self) -> None:
+        """Supprime les fichiers les moins récemment utilisés au-delà de la taille max."""
+        files = []
+        total = 0
+        for path in self.cache_dir.iterdir():
+            if path.suffix == ".md5" or path.name.startswith("."):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path.name))
+            total += stat.st_size
+
+        if total <= self.max_size_bytes:
+            return
+
+        files.sort()
+        for _, size, file_id in files:
+            if total <= self.max_size_bytes:
+                break
+            self.invalidate(file_id)
+            total -= size
+            logger.debug(f"Cache Drive: éviction de {file_id}")
@@ -0,0 +1,407 @@
+"""
+Index local de l'arborescence Drive (DOSSIERS_PRETS), tenu à jour par le
+flux de modifications Drive (changes.list).
+
+Les courtiers modifient aussi les dossiers clients à la main (renommage,
+déplacement, suppression) : plutôt que de relister les dossiers à chaque
+recherche, DriveChangesWatcher applique en continu les modifications
+Drive à un index SQLite. find_file_by_name / folder_exists y répondent
+localement tant que l'index est à jour.
+
+L'index est un fichier SQLite (mode WAL) : il est alimenté par le
+processus API et lu par tous les processus de la machine (API, polling,
+workers RQ, pool documentaire).
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Set
+
+from app.config import get_settings
+from app.services.drive_lookup_cache import MISSING
+
+logger = logging.getLogger(__name__)
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
+_FILE_FIELDS = "id, name, mimeType, parents, trashed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    parent_id TEXT,
+    mime_type TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_files_parent_name ON files (parent_id, name);
+CREATE TABLE IF NOT EXISTS indexed_folders (
+    id TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class DriveIndex:
+    """
+    Index SQLite des fichiers et dossiers de l'arborescence DOSSIERS_PRETS.
+
+    Seuls les dossiers dont le contenu complet est connu (indexed_folders)
+    répondent aux recherches : pour un dossier hors arborescence,
+    lookup() retourne MISSING et l'appelant interroge Drive.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Initialise l'index.
+
+        Args:
+            db_path: Chemin du fichier SQLite.
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Connexion SQLite du thread courant (réutilisée)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # =========================================================================
+    # ÉTAT
+    # =========================================================================
+
+    def get_state(self, key: str) -> Optional[str]:
+        row = self._connect().execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key: str, value: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value)
+            )
+
+    def is_fresh(self, max_age_seconds: float) -> bool:
+        """Indique si l'index a été synchronisé il y a moins de max_age_seconds."""
+        synced_at = self.get_state("synced_at")
+        return synced_at is not None and time.time() - float(synced_at) < max_age_seconds
+
+    def mark_synced(self) -> None:
+        self.set_state("synced_at", str(time.time()))
+
+    # =========================================================================
+    # RECHERCHES
+    # =========================================================================
+
+    def lookup(self, parent_id: str, name: str, folders_only: bool = False) -> Any:
+        """
+        Cherche un fichier (ou dossier) par nom dans un dossier.
+
+        Args:
+            parent_id: Dossier où chercher.
+            name: Nom exact.
+            folders_only: Ne retourner que des dossiers.
+
+        Returns:
+            ID trouvé, None si absent du dossier, MISSING si le dossier
+            n'est pas indexé.
+        """
+        conn = self._connect()
+        if not self._is_indexed(conn, parent_id):
+            return MISSING
+
+        query = "SELECT id FROM files WHERE parent_id = ? AND name = ?"
+        params = [parent_id, name]
+        if folders_only:
+            query += " AND mime_type = ?"
+            params.append(FOLDER_MIME_TYPE)
+
+        row = conn.execute(query + " ORDER BY rowid LIMIT 1", params).fetchone()
+        return row[0] if row else None
+
+    # =========================================================================
+    # MISES À JOUR
+    # =========================================================================
+
+    def upsert(self, file: Dict[str, Any], created: bool = False) -> Set[str]:
+        """
+        Enregistre un fichier (création, renommage, déplacement).
+
+        Les fichiers hors arborescence indexée sont ignorés. Un dossier
+        n'est indexé que si son contenu est connu : déjà indexé (renommage,
+        déplacement interne) ou créé vide par DriveManager (created=True).
+        Un dossier apparu par le flux (créé à la main, déplacé depuis
+        l'extérieur) reste interrogé sur Drive.
+
+        Args:
+            file: Métadonnées Drive (id, name, mimeType, parents).
+            created: Fichier créé par nous (dossier vide).
+
+        Returns:
+            Dossiers parents affectés (ancien et nouveau).
+        """
+        parents = file.get("parents") or []
+        parent_id = parents[0] if parents else None
+        is_folder = file.get("mimeType") == FOLDER_MIME_TYPE
+
+        with self._connect() as conn:
+            was_indexed = self._is_indexed(conn, file["id"])
+            affected = self._remove(conn, file["id"])
+
+            if parent_id is None or not self._is_indexed(conn, parent_id):
+                return affected
+
+            conn.execute(
+                "INSERT INTO files (id, name, parent_id, mime_type) VALUES (?, ?, ?, ?)",
+                (file["id"], file.get("name", ""), parent_id, file.get("mimeType"))
+            )
+            if is_folder and (was_indexed or created):
+                conn.execute("INSERT OR IGNORE INTO indexed_folders (id) VALUES (?)", (file["id"],))
+            affected.add(parent_id)
+
+        return affected
+
+    def remove(self, file_id: str) -> Set[str]:
+        """
+        Retire un fichier (suppression, corbeille).
+
+        Returns:
+            Dossier parent affecté (vide si le fichier n'était pas indexé).
+        """
+        with self._connect() as conn:
+            return self._remove(conn, file_id)
+
+    @staticmethod
+    def _is_indexed(conn: sqlite3.Connection, folder_id: str) -> bool:
+        return conn.execute(
+            "SELECT 1 FROM indexed_folders WHERE id = ?", (folder_id,)
+        ).fetchone() is not None
+
+    @staticmethod
+    def _remove(conn: sqlite3.Connection, file_id: str) -> Set[str]:
+        conn.execute("DELETE FROM indexed_folders WHERE id = ?", (file_id,))
+        row = conn.execute("SELECT parent_id FROM files WHERE id = ?", (file_id,)).fetchone()
+        if row is None:
+            return set()
+        conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+        return {row[0]}
+
+    def rebuild(self, root_id: str, files: Iterable[Dict[str, Any]]) -> None:
+        """
+        Reconstruit l'index complet à partir d'un listing Drive.
+
+        Args:
+            root_id: Dossier racine (DOSSIERS_PRETS).
+            files: Tous les fichiers non supprimés visibles par le Service Account.
+        """
+        children: Dict[str, list] = {}
+        for file in files:
+            for parent_id in file.get("parents") or []:
+                children.setdefault(parent_id, []).append(file)
+
+        rows = []
+        folders = [root_id]
+        pending = [root_id]
+        while pending:
+            folder_id = pending.pop()
+            for file in children.get(folder_id, []):
+                rows.append((file["id"], file.get("name", ""), folder_id, file.get("mimeType")))
+                if file.get("mimeType") == FOLDER_MIME_TYPE:
+                    folders.append(file["id"])
+                    pending.append(file["id"])
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM files")
+            conn.execute("DELETE FROM indexed_folders")
+            conn.executemany(
+                "INSERT OR REPLACE INTO files (id, name, parent_id, mime_type) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO indexed_folders (id) VALUES (?)",
+                [(folder_id,) for folder_id in folders]
+            )
+
+        logger.info(f"Index Drive reconstruit ({len(rows)} fichiers, {len(folders)} dossiers)")
+
+
+_indexes: Dict[str, DriveIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_drive_index(db_path: str) -> DriveIndex:
+    """Retourne l'index partagé du processus pour ce fichier SQLite."""
+    with _indexes_lock:
+        index = _indexes.get(db_path)
+        if index is None:
+            index = _indexes[db_path] = DriveIndex(db_path)
+        return index
+
+
+class DriveChangesWatcher:
+    """
+    Synchronise l'index avec le flux changes.list de Drive (thread de fond).
+
+    Au premier démarrage (ou si le jeton de page est invalide), l'index est
+    reconstruit par un listing complet ; ensuite, seules les modifications
+    sont lues toutes les DRIVE_CHANGES_POLL_SECONDS secondes. Les
+    recherches en cache des dossiers modifiés sont invalidées.
+    """
+
+    def __init__(self, drive_manager=None, poll_seconds: Optional[int] = None):
+        """
+        Initialise le watcher.
+
+        Args:
+            drive_manager: DriveManager à utiliser. Si None, créé au démarrage.
+            poll_seconds: Intervalle de lecture. Si None, utilise DRIVE_CHANGES_POLL_SECONDS.
+        """
+        settings = get_settings()
+        self.poll_seconds = settings.DRIVE_CHANGES_POLL_SECONDS if poll_seconds is None else poll_seconds
+        self.drive_manager = drive_manager
+
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        """
+        Lance le thread de synchronisation.
+
+        Returns:
+            False si la synchronisation est désactivée.
+        """
+        if self.poll_seconds <= 0:
+            return False
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="drive-changes", daemon=True)
+        self._thread.start()
+        logger.info(f"Synchronisation Drive démarrée (toutes les {self.poll_seconds}s)")
+        return True
+
+    def stop(self) -> None:
+        """Arrête le thread de synchronisation."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def _run(self) -> None:
+        if self.drive_manager is None:
+            from app.services.drive import DriveManager
+
+            try:
+                self.drive_manager = DriveManager()
+            except Exception as e:
+                logger.error(f"Synchronisation Drive impossible: {e}")
+                return
+
+        if self.drive_manager.index is None:
+            return
+
+        while not self._stop_event.is_set():
+            try:
+                self.sync()
+            except Exception as e:
+                logger.warning(f"Erreur synchronisation Drive: {e}")
+            self._stop_event.wait(self.poll_seconds)
+
+    def sync(self) -> int:
+        """
+        Applique les modifications Drive depuis la dernière synchronisation.
+
+        Returns:
+            Nombre de modifications appliquées.
+        """
+        index = self.drive_manager.index
+        service = self.drive_manager.service
+        page_token = index.get_state("page_token")
+
+        if page_token is None:
+            self._rebuild()
+            return 0
+
+        applied = 0
+        affected: Set[str] = set()
+
+        while page_token:
+            try:
+                response = service.changes().list(
+                    pageToken=page_token,
+                    pageSize=1000,
+                    fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({_FILE_FIELDS}))",
+                    includeItemsFromAllDrives=True,
+                    supportsAllDrives=True
+                ).execute()
+            except Exception as e:
+                if getattr(getattr(e, "resp", None), "status", None) in (400, 404, 410):
+                    # Jeton expiré ou invalide : reconstruction complète
+                    logger.warning(f"Jeton de modifications Drive invalide, reconstruction: {e}")
+                    self._rebuild()
+                    return 0
+                raise
+
+            for change in response.get("changes", []):
+                file = change.get("file")
+                if change.get("removed") or not file or file.get("trashed"):
+                    affected |= index.remove(change["fileId"])
+                else:
+                    affected |= index.upsert(file)
+                applied += 1
+
+            if "newStartPageToken" in response:
+                index.set_state("page_token", response["newStartPageToken"])
+                page_token = None
+            else:
+                page_token = response.get("nextPageToken")
+                index.set_state("page_token", page_token)
+
+        for parent_id in affected:
+            self.drive_manager._cache_invalidate(parent_id)
+
+        index.mark_synced()
+        if applied:
+            logger.info(f"Index Drive: {applied} modification(s) appliquée(s)")
+        return applied
+
+    def _rebuild(self) -> None:
+        """Listing complet puis reprise du flux à partir du jeton courant."""
+        index = self.drive_manager.index
+        service = self.drive_manager.service
+
+        # Jeton lu avant le listing : aucune modification concurrente n'est perdue
+        start_token = service.changes().getStartPageToken(supportsAllDrives=True).execute()
+
+        files = []
+        page_token = None
+        while True:
+            response = service.files().list(
+                q="trashed=false",
+                pageSize=1000,
+                pageToken=page_token,
+                fields=f"nextPageToken, files({_FILE_FIELDS})",
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True
+            ).execute()
+            files.extend(response.get("files", []))
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                break
+
+        index.rebuild(self.drive_manager.master_folder_id, files)
+        index.set_state("page_token", start_token["startPageToken"])
+        index.mark_synced()
+        self.drive_manager._cache_invalidate()
@@ -0,0 +1,207 @@
+"""
+Cache des recherches Google Drive (dossiers, fichiers par nom, listings).
+
+Les recherches `files().list` (folder_exists, find_file_by_name,
+list_files_in_folder) et les liens de partage sont mis en cache avec une
+durée de vie (TTL) et une taille bornée (LRU). Les entrées sont groupées
+par dossier parent : toute écriture de DriveManager dans un dossier
+(création, upload, mise à jour) invalide les recherches de ce dossier.
+
+Avec Redis activé, le cache est partagé entre l'API, le polling et les
+workers RQ ; en cas d'indisponibilité de Redis, seul le cache local est
+utilisé. Les résultats négatifs ("introuvable") ne sont gardés en mémoire
+locale que quelques secondes (NEGATIVE_TTL_SECONDS).
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Set, Tuple
+
+from app.utils.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Valeur retournée par get() en l'absence d'entrée (None est une valeur valide :
+# "fichier introuvable" est aussi mis en cache)
+MISSING = object()
+
+_REDIS_PREFIX = "leonie:drive:"
+
+# Durée de vie locale max d'un résultat "introuvable" (None) : un autre
+# processus peut créer le dossier ou le fichier sans invalider le cache
+# mémoire de celui-ci (doublons de dossiers). Via Redis, l'invalidation est
+# partagée et la durée de vie normale s'applique.
+NEGATIVE_TTL_SECONDS = 10
+
+
+class DriveLookupCache:
+    """
+    Cache TTL/LRU en mémoire, optionnellement adossé à Redis.
+
+    Thread-safe : une instance est partagée par tous les DriveManager du
+    processus.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int = 2048, use_redis: bool = False):
+        """
+        Initialise le cache.
+
+        Args:
+            ttl_seconds: Durée de vie d'une entrée.
+            max_entries: Nombre max d'entrées en mémoire (éviction LRU).
+            use_redis: Partager le cache via Redis.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.use_redis = use_redis
+
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._keys_by_parent: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _full_key(parent_id: str, key: str) -> str:
+        return f"{parent_id}:{key}"
+
+    # =========================================================================
+    # API
+    # =========================================================================
+
+    def get(self, parent_id: str, key: str) -> Any:
+        """
+        Lit une entrée.
+
+        Args:
+            parent_id: Dossier (ou fichier) auquel l'entrée est rattachée.
+            key: Clé de la recherche (ex: "name:_RAPPORT_SUIVI.docx").
+
+        Returns:
+            Valeur en cache, ou MISSING.
+        """
+        full_key = self._full_key(parent_id, key)
+
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(full_key)
+                    return value
+                self._remove(full_key)
+
+        if not self.use_redis:
+            return MISSING
+
+        try:
+            raw = get_redis().get(_REDIS_PREFIX + full_key)
+        except Exception as e:
+            logger.debug(f"Cache Drive Redis indisponible: {e}")
+            return MISSING
+        if raw is None:
+            return MISSING
+
+        value = json.loads(raw)
+        self._set_local(parent_id, full_key, value)
+        return value
+
+    def set(self, parent_id: str, key: str, value: Any) -> None:
+        """
+        Enregistre le résultat d'une recherche.
+
+        Args:
+            parent_id: Dossier (ou fichier) auquel l'entrée est rattachée.
+            key: Clé de la recherche.
+            value: Résultat (sérialisable en JSON).
+        """
+        full_key = self._full_key(parent_id, key)
+        self._set_local(parent_id, full_key, value)
+
+        if not self.use_redis:
+            return
+
+        try:
+            redis_client = get_redis()
+            pipe = redis_client.pipeline()
+            pipe.setex(_REDIS_PREFIX + full_key, self.ttl_seconds, json.dumps(value))
+            pipe.sadd(f"{_REDIS_PREFIX}parent:{parent_id}", full_key)
+            pipe.expire(f"{_REDIS_PREFIX}parent:{parent_id}", self.ttl_seconds)
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"Cache Drive Redis indisponible: {e}")
+
+    def invalidate(self, parent_id: str) -> None:
+        """
+        Invalide toutes les recherches d'un dossier (après une écriture).
+
+        Args:
+            parent_id: Dossier modifié.
+        """
+        with self._lock:
+            for full_key in list(self._keys_by_parent.get(parent_id, ())):
+                self._remove(full_key)
+
+        if not self.use_redis:
+            return
+
+        try:
+            redis_client = get_redis()
+            parent_key = f"{_REDIS_PREFIX}parent:{parent_id}"
+            keys = [_REDIS_PREFIX + k for k in redis_client.smembers(parent_key)]
+            redis_client.delete(parent_key, *keys)
+        except Exception as e:
+            logger.debug(f"Cache Drive Redis indisponible: {e}")
+
+    def clear(self) -> None:
+        """Vide le cache (ex: suppression d'un fichier dont le dossier est inconnu)."""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_parent.clear()
+
+        if not self.use_redis:
+            return
+
+        try:
+            redis_client = get_redis()
+            keys = list(redis_client.scan_iter(match=f"{_REDIS_PREFIX}*"))
+            if keys:
+                redis_client.delete(*keys)
+        except Exception as e:
+            logger.debug(f"Cache Drive Redis indisponible: {e}")
+
+    # =========================================================================
+    # STOCKAGE LOCAL
+    # =========================================================================
+
+    def _set_local(self, parent_id: str, full_key: str, value: Any) -> None:
+        ttl_seconds = self.ttl_seconds
+        if value is None:
+            ttl_seconds = min(ttl_seconds, NEGATIVE_TTL_SECONDS)
+
+        with self._lock:
+            self._entries[full_key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(full_key)
+            self._keys_by_parent.setdefault(parent_id, set()).add(full_key)
+
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+
+    def _remove(self, full_key: str) -> None:
+        """Supprime une entrée locale (verrou déjà acquis)."""
+        self._entries.pop(full_key, None)
+        parent_id = full_key.split(":", 1)[0]
+        keys = self._keys_by_parent.get(parent_id)
+        if keys is not None:
+            keys.discard(full_key)
+            if not keys:
+                del self._keys_by_parent[parent_id]
+
+
+@lru_cache()
+def get_drive_lookup_cache(ttl_seconds: int, max_entries: int, use_redis: bool) -> DriveLookupCache:
+    """Retourne le cache partagé du processus pour une configuration donnée."""
+    return DriveLookupCache(ttl_seconds, max_entries, use_redis)
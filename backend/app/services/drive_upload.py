@@ -0,0 +1,287 @@
+"""
+Uploads Google Drive : multipart ou résumable par morceaux, avec reprise.
+
+- Petits fichiers (≤ DRIVE_MULTIPART_MAX_MB) : upload multipart en une
+  seule requête (pas d'ouverture de session résumable).
+- Fichiers plus gros : upload résumable, taille des morceaux choisie selon
+  la taille du fichier (multiple de 256 KB imposé par l'API).
+- L'URI de session résumable est persisté sur disque : un upload
+  interrompu (crash, redémarrage du worker, timeout) reprend là où il
+  s'était arrêté au lieu de tout renvoyer, y compris si le fichier local
+  a été régénéré à l'identique (clé par contenu).
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload
+
+logger = logging.getLogger(__name__)
+
+
+# Taille des morceaux par taille de fichier : (taille max du fichier, morceau)
+# (multiples de 256 KB, granularité imposée par l'API Drive)
+CHUNK_SIZES = [
+    (50 * 1024 * 1024, 8 * 1024 * 1024),
+    (200 * 1024 * 1024, 16 * 1024 * 1024),
+]
+MAX_CHUNK_SIZE = 32 * 1024 * 1024
+
+# Tentatives par morceau (backoff exponentiel de googleapiclient)
+CHUNK_RETRIES = 3
+
+# Durée de vie d'une session résumable côté Drive (une semaine)
+SESSION_MAX_AGE = 7 * 24 * 3600
+
+
+def chunk_size_for(file_size: int) -> int:
+    """
+    Choisit la taille des morceaux d'un upload résumable.
+
+    Args:
+        file_size: Taille du fichier (octets).
+
+    Returns:
+        Taille de morceau, multiple de 256 KB.
+    """
+    for max_file_size, chunk_size in CHUNK_SIZES:
+        if file_size <= max_file_size:
+            return chunk_size
+    return MAX_CHUNK_SIZE
+
+
+def build_media(
+    file_path: Path,
+    mimetype: Optional[str] = None,
+    multipart_max_bytes: int = 5 * 1024 * 1024
+) -> MediaFileUpload:
+    """
+    Construit le média d'upload adapté à la taille du fichier.
+
+    Args:
+        file_path: Fichier local.
+        mimetype: Type MIME (deviné depuis l'extension si None).
+        multipart_max_bytes: Taille max d'un upload multipart.
+
+    Returns:
+        MediaFileUpload multipart (petit fichier) ou résumable par morceaux.
+    """
+    file_size = Path(file_path).stat().st_size
+
+    if file_size <= multipart_max_bytes:
+        return MediaFileUpload(str(file_path), mimetype=mimetype, resumable=False)
+
+    return MediaFileUpload(
+        str(file_path),
+        mimetype=mimetype,
+        chunksize=chunk_size_for(file_size),
+        resumable=True
+    )
+
+
+class UploadSessionStore:
+    """
+    URIs de sessions résumables persistés sur disque (un fichier JSON par upload).
+
+    La clé d'un upload dépend de l'opération (création dans un dossier ou
+    mise à jour d'un fichier), de la cible et du contenu du fichier local
+    (SHA-256) : un PDF régénéré à l'identique reprend la session, un
+    contenu différent repart de zéro. Les sessions plus anciennes que
+    SESSION_MAX_AGE (expirées côté Drive) sont supprimées par purge().
+    """
+
+    def __init__(self, session_dir: Path):
+        """
+        Initialise le stockage.
+
+        Args:
+            session_dir: Répertoire des fichiers de session.
+        """
+        self.session_dir = Path(session_dir)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_for(operation: str, target_id: str, file_path: Path, filename: str = "") -> str:
+        """
+        Calcule la clé d'un upload.
+
+        Args:
+            operation: "create" ou "update".
+            target_id: Dossier de destination (create) ou fichier (update).
+            file_path: Fichier local uploadé.
+            filename: Nom du fichier sur Drive.
+
+        Returns:
+            Clé hexadécimale.
+        """
+        content_hash = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                content_hash.update(block)
+        raw = f"{operation}|{target_id}|{filename}|{content_hash.hexdigest()}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.session_dir / f"{key}.json"
+
+    def load(self, key: str) -> Optional[str]:
+        """Retourne l'URI de session enregistré, ou None."""
+        try:
+            data = json.loads(self._path(key).read_text())
+        except (OSError, ValueError):
+            return None
+        return data.get("resumable_uri")
+
+    def save(self, key: str, resumable_uri: str) -> None:
+        """Enregistre l'URI de session (écriture atomique)."""
+        with self._lock:
+            self.session_dir.mkdir(parents=True, exist_ok=True)
+            path = self._path(key)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps({"resumable_uri": resumable_uri}))
+            tmp_path.replace(path)
+
+    def delete(self, key: str) -> None:
+        """Supprime la session (upload terminé ou session expirée)."""
+        self._path(key).unlink(missing_ok=True)
+
+    def purge(self, max_age: float = SESSION_MAX_AGE) -> int:
+        """
+        Supprime les sessions trop anciennes pour être reprises.
+
+        Args:
+            max_age: Âge maximal (secondes) depuis la dernière sauvegarde.
+
+        Returns:
+            Nombre de sessions supprimées.
+        """
+        cutoff = time.time() - max_age
+        removed = 0
+        for path in self.session_dir.glob("*.json"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                continue
+        if removed:
+            logger.info(f"Sessions d'upload Drive expirées supprimées: {removed}")
+        return removed
+
+
+_session_stores: Dict[str, UploadSessionStore] = {}
+_session_stores_lock = threading.Lock()
+
+
+def get_upload_session_store(session_dir: str) -> UploadSessionStore:
+    """
+    Retourne le stockage de sessions partagé du processus pour ce répertoire.
+
+    Les sessions expirées sont purgées à la première demande seulement :
+    un DriveManager est instancié par requête, le répertoire n'est pas
+    parcouru à chaque fois.
+    """
+    with _session_stores_lock:
+        store = _session_stores.get(session_dir)
+        if store is None:
+            store = _session_stores[session_dir] = UploadSessionStore(Path(session_dir))
+            store.purge()
+        return store
+
+
+def execute_upload(
+    request: Any,
+    media: MediaFileUpload,
+    sessions: Optional[UploadSessionStore] = None,
+    key: Optional[str] = None
+) -> dict:
+    """
+    Exécute une requête d'upload Drive (create/update avec media_body).
+
+    Les uploads multipart sont envoyés en une requête. Les uploads
+    résumables sont envoyés morceau par morceau ; l'URI de session est
+    enregistré dès son ouverture et réutilisé si une session précédente
+    a été interrompue.
+
+    Args:
+        request: HttpRequest googleapiclient.
+        media: Média de la requête (voir build_media).
+        sessions: Stockage des sessions (None = pas de reprise).
+        key: Clé de l'upload (voir UploadSessionStore.key_for).
+
+    Returns:
+        Réponse Drive (métadonnées du fichier).
+    """
+    if not media.resumable():
+        return request.execute(num_retries=CHUNK_RETRIES)
+
+    if sessions is None or key is None:
+        return _upload_chunks(request)
+
+    saved_uri = sessions.load(key)
+    response = None
+    if saved_uri:
+        try:
+            progress, response = _query_session(request, media, saved_uri)
+        except HttpError as e:
+            if e.resp.status not in (404, 410):
+                raise
+            # Session expirée (une semaine) ou inconnue : nouvel upload complet
+            logger.info(f"Session d'upload Drive expirée, nouvel upload ({key[:12]})")
+            sessions.delete(key)
+            saved_uri = None
+        else:
+            logger.info(f"Reprise d'un upload Drive interrompu ({key[:12]}, octet {progress})")
+            request.resumable_uri = saved_uri
+            request.resumable_progress = progress
+
+    if response is None:
+        response = _upload_chunks(request, sessions, key, saved_uri)
+
+    sessions.delete(key)
+    return response
+
+
+def _query_session(request: Any, media: MediaFileUpload, resumable_uri: str) -> Tuple[int, Optional[dict]]:
+    """
+    Interroge une session résumable (PUT vide, Content-Range: bytes */taille).
+
+    Returns:
+        (octet de reprise, None), ou (taille, réponse finale) si l'upload
+        était déjà terminé.
+
+    Raises:
+        HttpError: Session inconnue ou expirée (404/410), autre erreur.
+    """
+    headers = {"Content-Length": "0", "Content-Range": f"bytes */{media.size()}"}
+    resp, content = request.http.request(resumable_uri, "PUT", headers=headers)
+
+    if resp.status in (200, 201):
+        return media.size(), json.loads(content)
+    if resp.status == 308:
+        # Range: bytes=0-N (absent si aucun octet reçu)
+        received = resp.get("range")
+        return (int(received.rsplit("-", 1)[1]) + 1 if received else 0), None
+    raise HttpError(resp, content, uri=resumable_uri)
+
+
+def _upload_chunks(
+    request: Any,
+    sessions: Optional[UploadSessionStore] = None,
+    key: Optional[str] = None,
+    saved_uri: Optional[str] = None
+) -> dict:
+    """Envoie les morceaux d'un upload résumable jusqu'à la réponse finale."""
+    response = None
+    while response is None:
+        _, response = request.next_chunk(num_retries=CHUNK_RETRIES)
+        if sessions is not None and request.resumable_uri and request.resumable_uri != saved_uri:
+            saved_uri = request.resumable_uri
+            sessions.save(key, saved_uri)
+    return response
@@ -7,7 +7,7 @@ Réception -> Analyse -> Documents -> Contexte -> Réponse (Shadow/Whisper).
 
 import logging
 import asyncio
-from typing import Optional
+from typing import Awaitable, Callable, Optional
 
 from app.models.email import EmailData, EmailClassification, EmailAction
 from app.services.mistral import MistralService
@@ -17,10 +17,10 @@ from app.services.response_generator import ResponseGenerator
 from app.services.smtp import SmtpService
 from app.services.client_identifier import ClientIdentifier
 from app.services.drive import DriveManager
-from app.utils.db import (
-    get_client_by_email, 
-    get_courtier_by_email, 
-    get_courtier_by_id, 
+from app.utils.db_async import (
+    resolve_client_by_email,
+    resolve_courtier_by_email,
+    resolve_courtier_by_id,
     create_dossier_context,
     log_activity
 )
@@ -40,21 +40,34 @@ class EmailAgent:
         self.smtp = SmtpService()
         self.drive_manager = DriveManager() 
 
-    async def process_incoming_email(self, email: EmailData) -> bool:
+    async def process_incoming_email(
+        self,
+        email: EmailData,
+        attachment_loader: Optional[Callable[[EmailData], Awaitable[None]]] = None
+    ) -> bool:
         """
         Traite un email entrant de A à Z.
+
+        Args:
+            email: Email à traiter.
+            attachment_loader: Chargement différé du contenu des pièces jointes
+                (EmailFetcher.load_attachments). Appelé seulement une fois le
+                courtier/client identifié : un email orphelin ne télécharge
+                jamais ses pièces jointes.
         """
         logger.info(f"🤖 Agent: Traitement email {email.subject} de {email.from_address}")
 
         # 1. Identification (Courtier ou Client ?)
-        client = get_client_by_email(email.from_address)
+        # Résolution via le cache d'identité : pas d'appel réseau une fois chaud
+        client = await resolve_client_by_email(email.from_address)
         courtier = None
+        sender_courtier = None
         is_new_client = False
 
         if client:
             # Client existant
             courtier_id = client['courtier_id']
-            courtier = get_courtier_by_id(courtier_id)
+            courtier = await resolve_courtier_by_id(courtier_id)
             logger.info(f"✅ Client existant identifié: {client.get('prenom')} {client.get('nom')}")
         else:
 
@@ -62,7 +75,7 @@ class EmailAgent:
             logger.info("Email d'un expéditeur inconnu (non-client). Vérification si c'est un courtier...")
 
             # Scenario A: Le sender EST le courtier (Forward)
-            sender_courtier = get_courtier_by_email(email.from_address)
+            sender_courtier = await resolve_courtier_by_email(email.from_address)
             if sender_courtier:
                 courtier = sender_courtier
                 logger.info(f"✅ Sender identifié comme Courtier: {courtier.get('nom')}. Mode 'Forward/Instruction'.")
@@ -74,7 +87,7 @@ class EmailAgent:
                 # Scenario B: Le sender est un prospect inconnu
                 # Recherche du courtier via les destinataires de l'email (ex: leonie@voxperience.com)
                 for recipient in email.to_addresses + email.cc_addresses:
-                    possible_courtier = get_courtier_by_email(recipient)
+                    possible_courtier = await resolve_courtier_by_email(recipient)
                     if possible_courtier:
                         courtier = possible_courtier
                         logger.info(f"✅ Courtier identifié via destinataire {recipient}: {courtier.get('nom')}")
@@ -102,11 +115,7 @@ class EmailAgent:
             try:
                 # Si le sender a été identifié comme courtier (Scenario A), on doit l'exclure
                 # pour éviter qu'il soit détecté comme client.
-                sender_is_broker = False
-                if email.from_address:
-                     sender_courtier_check = get_courtier_by_email(email.from_address)
-                     if sender_courtier_check:
-                         sender_is_broker = True
+                sender_is_broker = sender_courtier is not None
 
                 logger.info(f"🆕 Création d'un nouveau client... (Exclude Sender Mode: {sender_is_broker})")
                 
@@ -120,7 +129,7 @@ class EmailAgent:
                 logger.info(f"🎉 Nouveau client créé : {client.get('id')}")
                 
                 # Initialisation contexte
-                create_dossier_context(client['id'])
+                await create_dossier_context(client['id'])
 
             except Exception as e:
                 logger.error(f"❌ Erreur création client: {e}", exc_info=True)
@@ -132,6 +141,9 @@ class EmailAgent:
 
         # 3. Traitement Documents (Si pièces jointes)
         processed_docs = []
+        if email.attachments and attachment_loader:
+            await attachment_loader(email)
+
         if email.attachments:
             processed_docs = await self.doc_orchestrator.process_attachments(
                 email.attachments, 
@@ -174,11 +186,12 @@ class EmailAgent:
             )
             
             if success:
-                log_activity(
+                await log_activity(
                     "agent_whisper", 
                     {"draft_subject": email.subject}, 
                     client_id=client_id, 
-                    courtier_id=courtier_id
+                    courtier_id=courtier_id,
+                    buffered=True
                 )
         
         return True
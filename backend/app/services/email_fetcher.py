@@ -9,17 +9,27 @@ import base64
 import email
 import imaplib
 import logging
+import quopri
+import re
+import select
+import ssl
+import threading
 from datetime import datetime, timedelta, timezone
 from email.header import decode_header
 from email.message import Message
-from typing import List, Optional
+from typing import Collection, Iterator, List, Optional, Tuple
 
 from app.config import get_settings
 from app.models.email import EmailAttachment, EmailData
-from app.utils.db import get_config, set_config
+from app.services.attachment_store import AttachmentStore
+from app.services.imap_parser import flatten_bodystructure, parse_fetch_response
+from app.services.config_store import get_config, set_config
 
 logger = logging.getLogger(__name__)
 
+# Extraction de l'UID dans l'en-tête d'une réponse FETCH
+_UID_RE = re.compile(rb"UID (\d+)")
+
 
 class EmailFetcher:
     """
@@ -34,6 +44,13 @@ class EmailFetcher:
         self.settings = get_settings()
         self.imap: Optional[imaplib.IMAP4_SSL] = None
         self.connected = False
+        self._uid_cursor: Optional[dict] = None
+        # Résultat de la dernière recherche, pour l'avancement du curseur
+        # par l'appelant : {"uidvalidity", "uids", "ceiling"}
+        self.last_fetch: Optional[dict] = None
+        # Numéro des commandes IDLE émises hors imaplib (voir idle())
+        self._idle_count = 0
+        self.attachment_store = AttachmentStore(self.settings.ATTACHMENT_STORE_DIR)
 
     def connect(self) -> bool:
         """
@@ -103,12 +120,25 @@ class EmailFetcher:
 
         return False
 
-    def fetch_new_emails(self) -> List[EmailData]:
+    def fetch_new_emails(self, exclude: Collection[int] = ()) -> List[EmailData]:
         """
-        Récupère les nouveaux emails (UNSEEN) depuis la dernière vérification.
+        Récupère les nouveaux emails depuis la dernière vérification.
+
+        Utilise un curseur UID (UIDVALIDITY + dernier UID traité) sauvegardé
+        dans Supabase config : chaque vérification ne lit que les messages
+        non lus au-delà du curseur (UID SEARCH UID n:* UNSEEN).
+
+        Lors de la première exécution (ou si UIDVALIDITY a changé), la
+        recherche historique UNSEEN SINCE <date> est utilisée pour amorcer
+        le curseur.
 
-        Utilise un timestamp sauvegardé dans Supabase config pour éviter
-        de retraiter les mêmes emails, ET filtre sur UNSEEN pour éviter les boucles.
+        Le curseur n'est pas avancé ici : l'appelant le fait, email par
+        email, après traitement réussi (commit_uid_cursor, mark_uid_as_read)
+        à partir de last_fetch. Un email non récupéré, non parsé ou en
+        échec de traitement reste ainsi au-delà du curseur et non lu.
+
+        Args:
+            exclude: UIDs à ignorer (en cours de traitement ailleurs).
 
         Returns:
             Liste des emails récupérés et parsés.
@@ -119,6 +149,8 @@ class EmailFetcher:
         if not self.connected or not self.imap:
             raise Exception("Connexion IMAP non établie. Appelez connect() d'abord.")
 
+        self.last_fetch = None
+
         try:
             # Sélection du label Gmail
             label = self.settings.IMAP_LABEL
@@ -129,105 +161,544 @@ class EmailFetcher:
                 logger.error(f"Impossible de sélectionner le label {label}")
                 return []
 
-            # Récupération du timestamp de la dernière vérification
-            last_check_config = get_config("last_email_check")
+            uidvalidity = self._get_select_response_int("UIDVALIDITY")
+            uidnext = self._get_select_response_int("UIDNEXT")
 
-            if last_check_config and "timestamp" in last_check_config:
-                # Timestamp existant : récupérer depuis cette date
-                last_timestamp = datetime.fromisoformat(last_check_config["timestamp"])
-                logger.info(f"Dernière vérification: {last_timestamp.isoformat()}")
-            else:
-                # Première exécution : récupérer les 7 derniers jours
-                last_timestamp = datetime.now(timezone.utc) - timedelta(days=7)
-                logger.info(
-                    f"Première exécution détectée. "
-                    f"Récupération des emails depuis: {last_timestamp.isoformat()}"
-                )
-                # Créer la config
-                set_config(
-                    "last_email_check",
-                    {"timestamp": last_timestamp.isoformat()},
-                    "Dernière vérification emails IMAP"
-                )
+            cursor = self._load_uid_cursor()
 
-            # Formater la date pour IMAP (format: DD-Mon-YYYY, ex: 15-Jan-2024)
-            date_str = last_timestamp.strftime("%d-%b-%Y")
-            
-            # CRITICAL FIX: Utiliser UNSEEN + SINCE pour éviter les boucles infinies
-            logger.info(f"Recherche des emails UNSEEN SINCE: {date_str}")
-            status, message_numbers = self.imap.search(None, f'(UNSEEN SINCE "{date_str}")')
-            
-            if status != "OK":
-                logger.error("Erreur lors de la recherche des emails")
-                return []
+            if cursor and uidvalidity is not None and cursor.get("uidvalidity") == uidvalidity:
+                last_uid = int(cursor.get("last_uid", 0))
+
+                # UIDNEXT inchangé : aucun nouveau message, inutile de chercher
+                if uidnext is not None and uidnext <= last_uid + 1:
+                    logger.info(f"Aucun nouvel email (dernier UID traité: {last_uid})")
+                    return []
 
-            email_ids = message_numbers[0].split()
-            logger.info(f"Nombre d'emails trouvés (UNSEEN) depuis {date_str}: {len(email_ids)}")
+                logger.info(f"Recherche des emails non lus UID {last_uid + 1}:*")
+                status, data = self.imap.uid("SEARCH", None, f"UID {last_uid + 1}:* UNSEEN")
+                if status != "OK":
+                    logger.error("Erreur lors de la recherche des emails")
+                    return []
+
+                # "n:*" renvoie toujours le dernier message, même si son UID < n
+                uids = [uid for uid in self._parse_uid_list(data) if uid > last_uid]
+            else:
+                if cursor:
+                    logger.warning(
+                        f"UIDVALIDITY modifié ({cursor.get('uidvalidity')} -> {uidvalidity}), "
+                        f"réinitialisation du curseur UID"
+                    )
+                last_uid = 0
+                uids = self._search_uids_since_last_check()
+                if uids is None:
+                    return []
+
+            # Le curseur peut avancer jusqu'au dernier UID couvert par la recherche
+            ceiling = max([last_uid, *uids] + ([uidnext - 1] if uidnext is not None else []))
+            uids = [uid for uid in uids if uid not in exclude]
+            if uidvalidity is not None:
+                self.last_fetch = {"uidvalidity": uidvalidity, "uids": uids, "ceiling": ceiling}
+
+            logger.info(f"Nombre de nouveaux emails trouvés: {len(uids)}")
+
+            # Récupération et parsing des emails, par lots
+            if self.settings.IMAP_LAZY_ATTACHMENTS:
+                # En-têtes + BODYSTRUCTURE, pièces jointes chargées à la demande
+                fetched, parse = self._fetch_structures(uids), self._parse_structure
+            else:
+                fetched, parse = self._fetch_messages(uids), self._parse_email
 
-            # Récupération et parsing des emails
             emails = []
-            for email_id in email_ids:
+            for uid, message in fetched:
                 try:
-                    email_data = self._fetch_and_parse_email(email_id)
-                    if email_data:
-                        emails.append(email_data)
-                        logger.info(
-                            f"Email parsé: {email_data.subject} "
-                            f"de {email_data.from_address}"
-                        )
+                    email_data = parse(message)
+                    email_data.uid = uid
+                    emails.append(email_data)
+                    logger.info(
+                        f"Email parsé: {email_data.subject} "
+                        f"de {email_data.from_address}"
+                    )
                 except Exception as e:
                     logger.error(
-                        f"Erreur lors du parsing de l'email {email_id}: {e}",
+                        f"Erreur lors du parsing de l'email UID {uid}: {e}",
                         exc_info=True
                     )
                     continue
 
             logger.info(f"Total d'emails récupérés avec succès: {len(emails)}")
-
-            # Mise à jour du timestamp après récupération réussie
-            now = datetime.now(timezone.utc)
-            set_config(
-                "last_email_check",
-                {"timestamp": now.isoformat()},
-                "Dernière vérification emails IMAP"
-            )
-            logger.info(f"Timestamp mis à jour: {now.isoformat()}")
-
             return emails
 
         except Exception as e:
             logger.error(f"Erreur lors de la récupération des emails: {e}")
             raise
 
-    def _fetch_and_parse_email(self, email_id: bytes) -> Optional[EmailData]:
+    def _search_uids_since_last_check(self) -> Optional[List[int]]:
         """
-        Récupère et parse un email spécifique.
+        Recherche historique UNSEEN SINCE <date>, utilisée pour amorcer le curseur UID.
+
+        Returns:
+            Liste des UIDs trouvés, ou None en cas d'erreur de recherche.
+        """
+        # Récupération du timestamp de la dernière vérification
+        last_check_config = get_config("last_email_check")
+
+        if last_check_config and "timestamp" in last_check_config:
+            # Timestamp existant : récupérer depuis cette date
+            last_timestamp = datetime.fromisoformat(last_check_config["timestamp"])
+            logger.info(f"Dernière vérification: {last_timestamp.isoformat()}")
+        else:
+            # Première exécution : récupérer les 7 derniers jours
+            last_timestamp = datetime.now(timezone.utc) - timedelta(days=7)
+            logger.info(
+                f"Première exécution détectée. "
+                f"Récupération des emails depuis: {last_timestamp.isoformat()}"
+            )
+
+        # Formater la date pour IMAP (format: DD-Mon-YYYY, ex: 15-Jan-2024)
+        date_str = last_timestamp.strftime("%d-%b-%Y")
+
+        # UNSEEN + SINCE pour éviter de retraiter les emails déjà lus
+        logger.info(f"Recherche des emails UNSEEN SINCE: {date_str}")
+        status, data = self.imap.uid("SEARCH", None, f'(UNSEEN SINCE "{date_str}")')
+
+        if status != "OK":
+            logger.error("Erreur lors de la recherche des emails")
+            return None
+
+        set_config(
+            "last_email_check",
+            {"timestamp": datetime.now(timezone.utc).isoformat()},
+            "Dernière vérification emails IMAP"
+        )
+
+        return self._parse_uid_list(data)
+
+    def _load_uid_cursor(self) -> Optional[dict]:
+        """
+        Charge le curseur UID depuis Supabase config (table config en cache).
+
+        Relu à chaque appel : le curseur peut être avancé par une autre
+        instance (polling, listener IDLE).
+
+        Returns:
+            Dict {"uidvalidity": int, "last_uid": int} ou None si absent.
+        """
+        cursor = get_config("imap_uid_cursor")
+        if cursor and "uidvalidity" in cursor and "last_uid" in cursor:
+            self._uid_cursor = {
+                "uidvalidity": int(cursor["uidvalidity"]),
+                "last_uid": int(cursor["last_uid"]),
+            }
+        return self._uid_cursor
+
+    def commit_uid_cursor(self, uidvalidity: int, last_uid: int) -> None:
+        """
+        Avance le curseur UID après traitement (jamais en arrière).
 
         Args:
-            email_id: ID de l'email à récupérer.
+            uidvalidity: UIDVALIDITY de la recherche (last_fetch).
+            last_uid: Dernier UID dont tous les prédécesseurs sont traités.
+        """
+        cursor = self._load_uid_cursor()
+        if cursor and cursor["uidvalidity"] == uidvalidity and cursor["last_uid"] >= last_uid:
+            return
+        self._save_uid_cursor(uidvalidity, last_uid)
+
+    def _save_uid_cursor(self, uidvalidity: int, last_uid: int) -> None:
+        """
+        Sauvegarde le curseur UID s'il a changé.
+
+        Args:
+            uidvalidity: UIDVALIDITY du label sélectionné.
+            last_uid: Dernier UID traité.
+        """
+        cursor = {"uidvalidity": uidvalidity, "last_uid": last_uid}
+        if cursor == self._uid_cursor:
+            return
+
+        set_config(
+            "imap_uid_cursor",
+            cursor,
+            f"Curseur UID IMAP du label {self.settings.IMAP_LABEL}"
+        )
+        self._uid_cursor = cursor
+        logger.info(f"Curseur UID mis à jour: {cursor}")
+
+    def _get_select_response_int(self, code: str) -> Optional[int]:
+        """
+        Lit une valeur numérique renvoyée par SELECT (UIDVALIDITY, UIDNEXT).
+
+        Args:
+            code: Code de réponse IMAP.
 
         Returns:
-            EmailData parsé ou None en cas d'erreur.
+            Valeur entière, ou None si le serveur ne l'a pas fournie.
         """
         try:
-            # Récupération de l'email brut (Body PEAK pour ne pas marquer comme lu tout de suite si voulu)
-            # Mais ici on utilise (RFC822) qui marque généralement comme lu implicitement selon le serveur.
-            # Cependant, Gmail IMAP est particulier. La bonne pratique est de marquer EXPLICITEMENT comme lu après traitement.
-            
-            status, msg_data = self.imap.fetch(email_id, "(RFC822)")
+            _, data = self.imap.response(code)
+            if data and data[-1] is not None:
+                return int(data[-1])
+        except (TypeError, ValueError):
+            pass
+        return None
+
+    @staticmethod
+    def _parse_uid_list(data: list) -> List[int]:
+        """
+        Convertit une réponse UID SEARCH en liste d'UIDs triés.
+
+        Args:
+            data: Données brutes renvoyées par imaplib.
+
+        Returns:
+            Liste d'UIDs (entiers) triés par ordre croissant.
+        """
+        if not data or not data[0]:
+            return []
+        return sorted(int(uid) for uid in data[0].split())
+
+    def _fetch_messages(self, uids: List[int]) -> Iterator[Tuple[int, Message]]:
+        """
+        Récupère les messages par lots (une commande UID FETCH par lot).
+
+        La taille des lots est définie par IMAP_FETCH_BATCH_SIZE. Les messages
+        d'un lot sont parsés et rendus au fil de l'eau. Au premier lot en
+        erreur, la récupération s'arrête : les UIDs suivants ne sont pas
+        rendus et restent au-delà du curseur pour la prochaine vérification.
+
+        Args:
+            uids: UIDs des emails à récupérer (triés).
+
+        Yields:
+            Tuples (uid, message) dans l'ordre des UIDs.
+        """
+        batch_size = max(1, int(self.settings.IMAP_FETCH_BATCH_SIZE))
+
+        for i in range(0, len(uids), batch_size):
+            batch = uids[i:i + batch_size]
+            uid_set = self._format_uid_set(batch)
+
+            try:
+                # BODY.PEEK[] ne positionne pas le flag \Seen : l'appelant marque
+                # l'email comme lu (mark_uid_as_read) après traitement réussi.
+                status, msg_data = self.imap.uid("FETCH", uid_set, "(UID BODY.PEEK[])")
+            except Exception as e:
+                logger.error(f"Erreur lors du fetch des emails UID {uid_set}, arrêt: {e}")
+                return
+
+            if status != "OK" or not msg_data:
+                logger.error(f"Impossible de récupérer les emails UID {uid_set}, arrêt")
+                return
+
+            messages = {}
+            for part in msg_data:
+                # Chaque message est un tuple (b'n (UID x BODY[] {taille}', contenu),
+                # suivi d'un séparateur b')'
+                if not isinstance(part, tuple):
+                    continue
+                match = _UID_RE.search(part[0])
+                if not match:
+                    continue
+                messages[int(match.group(1))] = email.message_from_bytes(part[1])
+
+            missing = [uid for uid in batch if uid not in messages]
+            if missing:
+                logger.warning(f"Emails absents de la réponse FETCH: {missing}")
+
+            for uid in batch:
+                if uid in messages:
+                    yield uid, messages[uid]
+
+    def _fetch_structures(self, uids: List[int]) -> Iterator[Tuple[int, dict]]:
+        """
+        Récupère en-têtes, BODYSTRUCTURE et corps texte, sans les pièces jointes.
+
+        Par lot : un UID FETCH (BODYSTRUCTURE BODY.PEEK[HEADER]), puis un
+        UID FETCH des sections texte par groupe de messages de même
+        structure. Les messages dont la structure n'a pas pu être lue sont
+        récupérés entièrement (_fetch_messages).
+
+        Args:
+            uids: UIDs des emails à récupérer (triés).
+
+        Yields:
+            Tuples (uid, structure) où structure contient "header" (Message),
+            "parts", "bodies" et "multipart" ; ou "message" en repli.
+        """
+        batch_size = max(1, int(self.settings.IMAP_FETCH_BATCH_SIZE))
+
+        for i in range(0, len(uids), batch_size):
+            batch = uids[i:i + batch_size]
+            uid_set = self._format_uid_set(batch)
+
+            try:
+                status, msg_data = self.imap.uid(
+                    "FETCH", uid_set, "(UID BODYSTRUCTURE BODY.PEEK[HEADER])"
+                )
+            except Exception as e:
+                logger.error(f"Erreur lors du fetch des structures UID {uid_set}, arrêt: {e}")
+                return
+
+            if status != "OK" or not msg_data:
+                logger.error(f"Impossible de récupérer les structures UID {uid_set}, arrêt")
+                return
+
+            responses = parse_fetch_response(msg_data)
+
+            structures = {}
+            fallback = []
+            for uid in batch:
+                response = responses.get(uid, {})
+                header = response.get("BODY[HEADER]")
+                bodystructure = response.get("BODYSTRUCTURE")
+                parts = flatten_bodystructure(bodystructure)
+
+                if not isinstance(header, bytes) or not parts:
+                    fallback.append(uid)
+                    continue
+
+                structures[uid] = {
+                    "header": email.message_from_bytes(header),
+                    "parts": parts,
+                    "bodies": {},
+                    "multipart": isinstance(bodystructure[0], list),
+                }
+
+            # Corps texte : un FETCH par groupe de messages ayant les mêmes sections
+            groups: dict = {}
+            for uid, structure in structures.items():
+                sections = tuple(
+                    part["section"] for part in self._select_body_parts(structure)
+                )
+                if sections:
+                    groups.setdefault(sections, []).append(uid)
+
+            for sections, group_uids in groups.items():
+                items = " ".join(f"BODY.PEEK[{section}]" for section in sections)
+                try:
+                    status, msg_data = self.imap.uid(
+                        "FETCH", self._format_uid_set(group_uids), f"(UID {items})"
+                    )
+                except Exception as e:
+                    logger.error(f"Erreur lors du fetch des corps UID {group_uids}: {e}")
+                    continue
+
+                if status != "OK":
+                    logger.error(f"Impossible de récupérer les corps UID {group_uids}")
+                    continue
+
+                for uid, response in parse_fetch_response(msg_data).items():
+                    if uid not in structures:
+                        continue
+                    for section in sections:
+                        payload = response.get(f"BODY[{section}]")
+                        if isinstance(payload, bytes):
+                            structures[uid]["bodies"][section] = payload
+
+            if fallback:
+                logger.warning(f"BODYSTRUCTURE illisible, récupération complète: {fallback}")
+                full_messages = dict(self._fetch_messages(fallback))
+            else:
+                full_messages = {}
+
+            for uid in batch:
+                if uid in structures:
+                    yield uid, structures[uid]
+                elif uid in full_messages:
+                    yield uid, {"message": full_messages[uid]}
+
+    @staticmethod
+    def _select_body_parts(structure: dict) -> List[dict]:
+        """
+        Sélectionne les sections texte/html constituant le corps de l'email.
+
+        Même règle que _extract_body : premier text/plain et premier
+        text/html hors pièces jointes ; pour un email non multipart,
+        l'unique section est le corps.
+
+        Args:
+            structure: Structure renvoyée par _fetch_structures.
+
+        Returns:
+            Liste des parties (au plus une text/plain et une text/html).
+        """
+        parts = structure["parts"]
+        if not structure["multipart"]:
+            return parts[:1]
+
+        selected = {}
+        for part in parts:
+            if part["disposition"] == "attachment":
+                continue
+            if part["content_type"] in ("text/plain", "text/html"):
+                selected.setdefault(part["content_type"], part)
+        return list(selected.values())
+
+    @staticmethod
+    def _decode_section(payload: bytes, transfer_encoding: Optional[str]) -> bytes:
+        """
+        Décode le Content-Transfer-Encoding d'une section IMAP.
+
+        Args:
+            payload: Contenu brut de BODY[section].
+            transfer_encoding: Encodage déclaré dans le BODYSTRUCTURE.
+
+        Returns:
+            Contenu décodé.
+        """
+        encoding = (transfer_encoding or "").lower()
+        if encoding == "base64":
+            return base64.b64decode(payload)
+        if encoding == "quoted-printable":
+            return quopri.decodestring(payload)
+        return payload
+
+    def _parse_structure(self, structure: dict) -> EmailData:
+        """
+        Construit un EmailData à partir des en-têtes et du BODYSTRUCTURE.
+
+        Les pièces jointes sont décrites (nom, type, taille estimée, section)
+        mais leur contenu n'est pas téléchargé : voir load_attachments().
+
+        Args:
+            structure: Structure renvoyée par _fetch_structures.
+
+        Returns:
+            EmailData sans contenu de pièces jointes.
+        """
+        if "message" in structure:
+            return self._parse_email(structure["message"])
+
+        body_text = None
+        body_html = None
+        for part in self._select_body_parts(structure):
+            payload = structure["bodies"].get(part["section"])
+            if not payload:
+                continue
+            try:
+                body = self._decode_section(payload, part["encoding"])
+                try:
+                    body = body.decode(part["charset"] or "utf-8", errors="replace")
+                except LookupError:
+                    body = body.decode("utf-8", errors="replace")
+            except Exception as e:
+                logger.warning(f"Erreur lors du décodage du corps: {e}")
+                continue
+
+            if part["content_type"] == "text/html":
+                body_html = body
+            else:
+                body_text = body
+
+        attachments = []
+        if structure["multipart"]:
+            for part in structure["parts"]:
+                if part["disposition"] not in ("attachment", "inline") or not part["filename"]:
+                    continue
+
+                # Taille encodée : estimation de la taille réelle pour le base64
+                size_bytes = part["size"]
+                if part["encoding"] == "base64":
+                    size_bytes = size_bytes * 3 // 4
+
+                attachments.append(EmailAttachment(
+                    filename=self._decode_header(part["filename"]),
+                    content_type=part["content_type"],
+                    size_bytes=size_bytes,
+                    content=None,
+                    imap_section=part["section"],
+                    transfer_encoding=part["encoding"]
+                ))
+
+        return self._build_email_data(
+            structure["header"], body_text, body_html, attachments
+        )
+
+    def load_attachments(self, email_data: EmailData) -> List[EmailAttachment]:
+        """
+        Télécharge les pièces jointes non encore chargées vers le store local.
+
+        À appeler après identification du courtier/client, sur la même
+        connexion que fetch_new_emails (label toujours sélectionné). Une
+        commande UID FETCH par section : seule la pièce jointe en cours
+        est en mémoire (sous forme encodée), le contenu décodé est écrit
+        directement dans le store.
+
+        Args:
+            email_data: Email récupéré en mode IMAP_LAZY_ATTACHMENTS.
+
+        Returns:
+            Liste des pièces jointes chargées (les pièces vides sont retirées).
+        """
+        pending = [
+            att for att in email_data.attachments
+            if not att.is_loaded and att.imap_section
+        ]
+        if not pending:
+            return email_data.attachments
+
+        if not self.connected or not self.imap:
+            raise Exception("Connexion IMAP non établie. Appelez connect() d'abord.")
+        if email_data.uid is None:
+            raise ValueError(f"UID inconnu pour l'email {email_data.message_id}")
+
+        for att in pending:
+            status, msg_data = self.imap.uid(
+                "FETCH", str(email_data.uid), f"(UID BODY.PEEK[{att.imap_section}])"
+            )
             if status != "OK":
-                logger.error(f"Impossible de récupérer l'email {email_id}")
-                return None
+                logger.warning(f"Impossible de récupérer {att.filename} (UID {email_data.uid})")
+                continue
 
-            # Parsing du message email
-            raw_email = msg_data[0][1]
-            email_message = email.message_from_bytes(raw_email)
+            response = parse_fetch_response(msg_data).get(email_data.uid, {})
+            payload = response.get(f"BODY[{att.imap_section}]")
+            del msg_data, response
 
-            return self._parse_email(email_message)
+            if not isinstance(payload, bytes):
+                logger.warning(f"Section {att.imap_section} absente pour {att.filename}")
+                continue
 
-        except Exception as e:
-            logger.error(f"Erreur lors du fetch de l'email {email_id}: {e}")
-            return None
+            try:
+                content_hash, path, size_bytes = self.attachment_store.write_encoded(
+                    payload, att.transfer_encoding
+                )
+                att.content_hash = content_hash
+                att.path = str(path)
+                att.size_bytes = size_bytes
+                logger.debug(
+                    f"Pièce jointe chargée: {att.filename} "
+                    f"({size_bytes} bytes, {att.content_type})"
+                )
+            except Exception as e:
+                logger.warning(f"Erreur lors du décodage de {att.filename}: {e}")
+
+        email_data.attachments = [
+            att for att in email_data.attachments
+            if att.is_loaded and att.size_bytes > 0
+        ]
+        return email_data.attachments
+
+    @staticmethod
+    def _format_uid_set(uids: List[int]) -> str:
+        """
+        Formate une liste d'UIDs en ensemble IMAP compact (ex: "1:3,7,9:10").
+
+        Args:
+            uids: UIDs triés.
+
+        Returns:
+            Ensemble de séquence IMAP.
+        """
+        ranges = []
+        start = prev = uids[0]
+        for uid in uids[1:]:
+            if uid == prev + 1:
+                prev = uid
+                continue
+            ranges.append(f"{start}:{prev}" if start != prev else str(start))
+            start = prev = uid
+        ranges.append(f"{start}:{prev}" if start != prev else str(start))
+        return ",".join(ranges)
 
     def _parse_email(self, email_message: Message) -> EmailData:
         """
@@ -236,6 +707,33 @@ class EmailFetcher:
         Args:
             email_message: Message email à parser.
 
+        Returns:
+            EmailData avec toutes les informations extraites.
+        """
+        # Extraction du corps (text et html)
+        body_text, body_html = self._extract_body(email_message)
+
+        # Extraction des pièces jointes
+        attachments = self._extract_attachments(email_message)
+
+        return self._build_email_data(email_message, body_text, body_html, attachments)
+
+    def _build_email_data(
+        self,
+        email_message: Message,
+        body_text: Optional[str],
+        body_html: Optional[str],
+        attachments: List[EmailAttachment]
+    ) -> EmailData:
+        """
+        Construit l'EmailData à partir des en-têtes du message.
+
+        Args:
+            email_message: Message (ou en-têtes seuls) à parser.
+            body_text: Corps texte déjà extrait.
+            body_html: Corps HTML déjà extrait.
+            attachments: Pièces jointes déjà extraites.
+
         Returns:
             EmailData avec toutes les informations extraites.
         """
@@ -257,12 +755,6 @@ class EmailFetcher:
         # Extraction du message-id
         message_id = email_message.get("Message-ID", "")
 
-        # Extraction du corps (text et html)
-        body_text, body_html = self._extract_body(email_message)
-
-        # Extraction des pièces jointes
-        attachments = self._extract_attachments(email_message)
-
         return EmailData(
             message_id=message_id,
             from_address=from_address,
@@ -439,15 +931,17 @@ class EmailFetcher:
                 # Récupération du type MIME
                 content_type = part.get_content_type()
 
-                # Calcul de la taille
-                size_bytes = len(content)
+                # Écriture dans le store local : l'attachment ne garde que le hash
+                content_hash, path, size_bytes = self.attachment_store.write_bytes(content)
+                del content
 
                 # Création de l'objet attachment
                 attachment = EmailAttachment(
                     filename=filename,
                     content_type=content_type,
                     size_bytes=size_bytes,
-                    content=content
+                    content_hash=content_hash,
+                    path=str(path)
                 )
 
                 attachments.append(attachment)
@@ -499,6 +993,175 @@ class EmailFetcher:
             logger.error(f"Erreur lors du marquage comme lu: {e}")
             return False
 
+    def mark_uid_as_read(self, uid: int) -> bool:
+        """
+        Marque un email comme lu via son UID (label sélectionné).
+
+        Args:
+            uid: UID du message.
+
+        Returns:
+            bool: True si succès.
+        """
+        if not self.connected or not self.imap:
+            logger.error("Connexion IMAP non établie")
+            return False
+
+        try:
+            status, _ = self.imap.uid("STORE", str(uid), "+FLAGS", "(\\Seen)")
+            if status != "OK":
+                logger.warning(f"Email UID {uid} non marqué comme lu: {status}")
+                return False
+            return True
+
+        except Exception as e:
+            logger.error(f"Erreur lors du marquage comme lu (UID {uid}): {e}")
+            return False
+
+    def supports_idle(self) -> bool:
+        """
+        Indique si le serveur IMAP supporte l'extension IDLE (RFC 2177).
+
+        Returns:
+            bool: True si IDLE est annoncé dans les capabilities.
+        """
+        if not self.connected or not self.imap:
+            return False
+        return "IDLE" in getattr(self.imap, "capabilities", ())
+
+    def idle(
+        self,
+        timeout: float,
+        stop_event: Optional[threading.Event] = None
+    ) -> bool:
+        """
+        Attend une notification du serveur via la commande IMAP IDLE.
+
+        Le label doit avoir été sélectionné au préalable. La méthode bloque
+        jusqu'à la première réponse non sollicitée du serveur, l'expiration
+        du timeout ou le positionnement de stop_event, puis termine
+        proprement la commande (DONE) afin que la connexion puisse être
+        réutilisée pour un fetch.
+
+        Args:
+            timeout: Durée max d'attente en secondes (Gmail coupe les IDLE
+                au-delà de 29 minutes, il faut donc ré-émettre régulièrement).
+            stop_event: Event optionnel permettant d'interrompre l'attente.
+
+        Returns:
+            bool: True si le serveur a signalé un nouveau message (EXISTS).
+
+        Raises:
+            Exception: Si la connexion n'est pas établie.
+            imaplib.IMAP4.error: Si le serveur refuse la commande IDLE.
+            imaplib.IMAP4.abort: Si la connexion est coupée pendant l'attente.
+        """
+        if not self.connected or not self.imap:
+            raise Exception("Connexion IMAP non établie. Appelez connect() d'abord.")
+
+        # imaplib (< 3.14) ne gère pas IDLE : on pilote la commande à la main
+        # via send()/readline(). Le tag est le nôtre, en minuscules : il ne
+        # peut pas entrer en collision avec ceux d'imaplib (lettres A-P) et
+        # la commande n'est pas enregistrée dans son état interne.
+        self._idle_count += 1
+        tag = b"idle%d" % self._idle_count
+        self.imap.send(tag + b" IDLE\r\n")
+
+        line = self.imap.readline()
+        if not line.startswith(b"+"):
+            raise imaplib.IMAP4.error(f"Commande IDLE refusée: {line!r}")
+
+        new_mail = False
+        try:
+            if self._wait_for_server_data(timeout, stop_event):
+                line = self.imap.readline()
+                if not line:
+                    raise imaplib.IMAP4.abort("Connexion IMAP fermée pendant IDLE")
+                new_mail = b"EXISTS" in line.upper()
+                logger.debug(f"Notification IDLE reçue: {line!r}")
+        finally:
+            # Fin de l'IDLE : on consomme tout jusqu'à la réponse taguée
+            self.imap.send(b"DONE\r\n")
+            while True:
+                line = self.imap.readline()
+                if not line:
+                    raise imaplib.IMAP4.abort("Connexion IMAP fermée pendant IDLE")
+                if line.startswith(tag + b" "):
+                    break
+                if b"EXISTS" in line.upper():
+                    new_mail = True
+
+        return new_mail
+
+    def _wait_for_server_data(
+        self,
+        timeout: float,
+        stop_event: Optional[threading.Event] = None
+    ) -> bool:
+        """
+        Attend que des données soient lisibles sur la socket IMAP.
+
+        Args:
+            timeout: Durée max d'attente en secondes.
+            stop_event: Event optionnel permettant d'interrompre l'attente.
+
+        Returns:
+            bool: True si des données sont disponibles, False sinon.
+        """
+        sock = self.imap.socket()
+
+        # Données déjà lues par imaplib (buffer du fichier) ou déchiffrées en
+        # attente dans le buffer SSL : select() ne les verrait pas
+        if self._has_buffered_data(sock):
+            return True
+
+        remaining = timeout
+        while remaining > 0:
+            if stop_event and stop_event.is_set():
+                return False
+
+            # Tranches courtes pour rester réactif à stop_event
+            wait = min(1.0, remaining)
+            readable, _, _ = select.select([sock], [], [], wait)
+            if readable:
+                return True
+            remaining -= wait
+
+        return False
+
+    def _has_buffered_data(self, sock) -> bool:
+        """
+        Indique, sans bloquer, si une réponse est déjà lisible par readline().
+
+        imaplib lit la socket via un BufferedReader : une notification
+        arrivée avec la réponse "+ idling" peut y être déjà stockée. Un
+        peek() sur la socket passée en non bloquant renvoie ce buffer (ou les
+        données lisibles immédiatement) sans attendre le réseau.
+
+        Args:
+            sock: Socket de la connexion IMAP.
+
+        Returns:
+            bool: True si des données sont disponibles.
+        """
+        pending = getattr(sock, "pending", None)
+        if pending and pending():
+            return True
+
+        reader = getattr(self.imap, "file", None)
+        peek = getattr(reader, "peek", None)
+        if peek is None:
+            return False
+
+        previous_timeout = sock.gettimeout()
+        sock.setblocking(False)
+        try:
+            return bool(peek(1))
+        except (BlockingIOError, ssl.SSLWantReadError):
+            return False
+        finally:
+            sock.settimeout(previous_timeout)
+
     def disconnect(self):
         """Ferme proprement la connexion IMAP."""
         if self.imap and self.connected:
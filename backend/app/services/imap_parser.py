@@ -0,0 +1,232 @@
+"""
+Parsing des réponses IMAP FETCH et des BODYSTRUCTURE.
+
+imaplib renvoie les réponses FETCH sous forme brute (bytes et tuples
+pour les littéraux). Ce module les convertit en structures Python et
+aplatit les BODYSTRUCTURE en liste de parties adressables via
+BODY.PEEK[section].
+"""
+
+import re
+from email.utils import collapse_rfc2231_value, decode_rfc2231
+from typing import Any, Dict, List, Optional
+
+_TOKEN_RE = re.compile(rb'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|\{(\d+)\}|([^\s()"{]+))')
+_QUOTED_ESCAPE_RE = re.compile(rb'\\(.)')
+
+_LPAREN = object()
+_RPAREN = object()
+
+
+def _tokenize(data: bytes) -> List[Any]:
+    """
+    Découpe une ligne de réponse IMAP en tokens.
+
+    Les atomes et chaînes sont renvoyés en str, NIL en None. Les marqueurs
+    de littéraux {n} sont ignorés : le contenu du littéral est fourni
+    séparément par imaplib.
+    """
+    tokens = []
+    pos = 0
+    length = len(data)
+
+    while pos < length:
+        match = _TOKEN_RE.match(data, pos)
+        if not match or match.end() == pos:
+            break
+        pos = match.end()
+
+        lparen, rparen, quoted, literal, atom = match.groups()
+        if lparen:
+            tokens.append(_LPAREN)
+        elif rparen:
+            tokens.append(_RPAREN)
+        elif quoted is not None:
+            tokens.append(_QUOTED_ESCAPE_RE.sub(rb"\1", quoted).decode("utf-8", errors="replace"))
+        elif literal is not None:
+            continue
+        elif atom is not None:
+            value = atom.decode("utf-8", errors="replace")
+            tokens.append(None if value.upper() == "NIL" else value)
+
+    return tokens
+
+
+def _build_lists(tokens: List[Any]) -> List[Any]:
+    """Transforme une suite de tokens en listes imbriquées."""
+    stack: List[List[Any]] = [[]]
+
+    for token in tokens:
+        if token is _LPAREN:
+            stack.append([])
+        elif token is _RPAREN:
+            if len(stack) > 1:
+                closed = stack.pop()
+                stack[-1].append(closed)
+        else:
+            stack[-1].append(token)
+
+    # Parenthèses non fermées (réponse tronquée)
+    while len(stack) > 1:
+        closed = stack.pop()
+        stack[-1].append(closed)
+
+    return stack[0]
+
+
+def parse_fetch_response(msg_data: list) -> Dict[int, Dict[str, Any]]:
+    """
+    Parse la réponse d'une commande UID FETCH.
+
+    Args:
+        msg_data: Données renvoyées par imaplib (bytes et tuples
+            (en-tête, littéral)).
+
+    Returns:
+        Dict {uid: {élément: valeur}} ; les clés sont en majuscules
+        (ex: "BODYSTRUCTURE", "BODY[HEADER]", "BODY[2]") et les
+        littéraux restent en bytes.
+    """
+    tokens: List[Any] = []
+    for part in msg_data or []:
+        if isinstance(part, tuple):
+            tokens.extend(_tokenize(part[0]))
+            tokens.append(part[1])
+        elif isinstance(part, bytes):
+            tokens.extend(_tokenize(part))
+
+    items = _build_lists(tokens)
+
+    messages: Dict[int, Dict[str, Any]] = {}
+    for item in items:
+        if not isinstance(item, list):
+            # Numéro de séquence ou mot-clé FETCH
+            continue
+
+        attributes = {}
+        for i in range(0, len(item) - 1, 2):
+            key = item[i]
+            if isinstance(key, str):
+                # BODY.PEEK[x] est renvoyé sous la forme BODY[x]
+                attributes[key.upper()] = item[i + 1]
+
+        uid = attributes.get("UID")
+        if uid is not None:
+            try:
+                uid = int(uid)
+            except (TypeError, ValueError):
+                continue
+            messages.setdefault(uid, {}).update(attributes)
+
+    return messages
+
+
+def _params_to_dict(params: Any) -> Dict[str, str]:
+    """Convertit une liste de paramètres (clé valeur ...) en dict."""
+    if not isinstance(params, list):
+        return {}
+
+    result = {}
+    for i in range(0, len(params) - 1, 2):
+        key, value = params[i], params[i + 1]
+        if isinstance(value, bytes):
+            value = value.decode("utf-8", errors="replace")
+        if isinstance(key, str) and isinstance(value, str):
+            result[key.lower()] = value
+    return result
+
+
+def _param_filename(params: Dict[str, str]) -> Optional[str]:
+    """Récupère un nom de fichier (filename/name, y compris RFC 2231)."""
+    for key in ("filename", "name"):
+        if key in params:
+            return params[key]
+        encoded = params.get(f"{key}*")
+        if encoded:
+            return collapse_rfc2231_value(decode_rfc2231(encoded))
+    return None
+
+
+def _parse_leaf(structure: List[Any], section: str) -> Dict[str, Any]:
+    """Parse une partie non multipart d'un BODYSTRUCTURE."""
+    main_type = (structure[0] or "").lower() if len(structure) > 0 else ""
+    sub_type = (structure[1] or "").lower() if len(structure) > 1 else ""
+    params = _params_to_dict(structure[2] if len(structure) > 2 else None)
+    encoding = (structure[5] or "7bit").lower() if len(structure) > 5 else "7bit"
+
+    try:
+        size = int(structure[6]) if len(structure) > 6 else 0
+    except (TypeError, ValueError):
+        size = 0
+
+    # Position de la disposition selon le type (champs spécifiques text et message)
+    if main_type == "text":
+        disposition_index = 9
+    elif main_type == "message" and sub_type == "rfc822":
+        disposition_index = 11
+    else:
+        disposition_index = 8
+
+    disposition = None
+    disposition_params: Dict[str, str] = {}
+    if len(structure) > disposition_index and isinstance(structure[disposition_index], list):
+        raw_disposition = structure[disposition_index]
+        if raw_disposition and isinstance(raw_disposition[0], str):
+            disposition = raw_disposition[0].lower()
+        if len(raw_disposition) > 1:
+            disposition_params = _params_to_dict(raw_disposition[1])
+
+    filename = _param_filename(disposition_params) or _param_filename(params)
+
+    return {
+        "section": section,
+        "content_type": f"{main_type}/{sub_type}",
+        "charset": params.get("charset"),
+        "encoding": encoding,
+        "size": size,
+        "disposition": disposition,
+        "filename": filename,
+    }
+
+
+def flatten_bodystructure(structure: Any, section: str = "") -> List[Dict[str, Any]]:
+    """
+    Aplatit un BODYSTRUCTURE en liste de parties feuilles.
+
+    Args:
+        structure: BODYSTRUCTURE parsé (listes imbriquées).
+        section: Préfixe de section (usage récursif).
+
+    Returns:
+        Liste de dicts (section, content_type, charset, encoding, size,
+        disposition, filename). Pour un message non multipart, l'unique
+        partie a la section "1". Un message/rfc822 (email transféré en
+        pièce jointe) est remplacé par les parties du message encapsulé,
+        numérotées sous sa section (ex: "2.1", "2.2").
+    """
+    if not isinstance(structure, list) or not structure:
+        return []
+
+    # Multipart : une ou plusieurs sous-parties (listes) suivies du sous-type
+    if isinstance(structure[0], list):
+        parts = []
+        index = 0
+        for child in structure:
+            if not isinstance(child, list):
+                break
+            index += 1
+            child_section = f"{section}.{index}" if section else str(index)
+            parts.extend(flatten_bodystructure(child, child_section))
+        return parts
+
+    leaf = _parse_leaf(structure, section or "1")
+
+    # message/rfc822 : le BODYSTRUCTURE du message encapsulé est le 9e champ
+    body = structure[8] if len(structure) > 8 else None
+    if leaf["content_type"] == "message/rfc822" and isinstance(body, list) and body:
+        if isinstance(body[0], list):
+            return flatten_bodystructure(body, leaf["section"])
+        # Corps non multipart : partie unique "<section>.1"
+        return flatten_bodystructure(body, f"{leaf['section']}.1")
+
+    return [leaf]
@@ -0,0 +1,341 @@
+"""
+Pool de serveurs LibreOffice « chauds » pour la conversion Office en PDF.
+
+Lancer `soffice --convert-to pdf` pour chaque fichier coûte 2 à 5 secondes
+de démarrage de LibreOffice. OfficeServerPool maintient N instances
+headless permanentes (via unoserver, chacune avec son propre profil) ;
+convert_with_server() envoie la conversion à une instance libre avec
+unoconvert, en moins d'une seconde.
+
+Les conversions sont exécutées dans les processus du pool documentaire :
+l'attribution d'une instance passe par un verrou fichier (flock) par port,
+partagé entre tous les processus de la machine.
+"""
+
+import fcntl
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Délai max d'attente d'une instance libre avant repli sur soffice
+_ACQUIRE_TIMEOUT = 10
+
+# Délai de démarrage d'une instance (premier lancement : création du profil)
+_STARTUP_TIMEOUT = 60
+
+# Relance d'une instance en échec : attente exponentielle (secondes)
+_RESTART_BACKOFF_BASE = 5
+_RESTART_BACKOFF_MAX = 300
+
+# Échecs consécutifs (arrêt ou démarrage sans écoute) avant abandon de l'instance
+_MAX_CONSECUTIVE_FAILURES = 5
+
+
+def _server_ports() -> List[int]:
+    """Ports XML-RPC des instances configurées (vide si le pool est désactivé)."""
+    try:
+        settings = get_settings()
+    except Exception:
+        return []
+
+    base_port = settings.LIBREOFFICE_SERVER_BASE_PORT
+    # Deux ports par instance : XML-RPC (unoserver) et UNO (LibreOffice)
+    return [base_port + 2 * i for i in range(settings.LIBREOFFICE_SERVER_POOL_SIZE)]
+
+
+def _lock_path(port: int) -> Path:
+    return Path(tempfile.gettempdir()) / f"leonie_office_server_{port}.lock"
+
+
+def _is_listening(port: int) -> bool:
+    """Indique si une instance accepte les connexions sur ce port."""
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+
+@contextmanager
+def _acquire_server(timeout: float = _ACQUIRE_TIMEOUT) -> Iterator[Optional[int]]:
+    """
+    Réserve une instance libre pour la durée d'une conversion.
+
+    Yields:
+        Port de l'instance réservée, ou None si aucune n'est disponible.
+    """
+    ports = [port for port in _server_ports() if _is_listening(port)]
+    if not ports:
+        yield None
+        return
+
+    deadline = time.monotonic() + timeout
+    while True:
+        for port in ports:
+            fd = os.open(_lock_path(port), os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+
+            try:
+                yield port
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+            return
+
+        if time.monotonic() >= deadline:
+            logger.warning("Aucun serveur LibreOffice libre, repli sur soffice")
+            yield None
+            return
+        time.sleep(0.1)
+
+
+def convert_with_server(office_path: Path, pdf_path: Path, timeout: int = 60) -> bool:
+    """
+    Convertit un document Office en PDF via une instance LibreOffice chaude.
+
+    Args:
+        office_path: Document Office à convertir.
+        pdf_path: Chemin du PDF à produire.
+        timeout: Timeout de la conversion (secondes).
+
+    Returns:
+        True si le PDF a été produit, False si aucune instance n'est
+        disponible ou si la conversion a échoué (l'appelant se replie
+        alors sur soffice).
+    """
+    unoconvert_cmd = shutil.which("unoconvert")
+    if not unoconvert_cmd:
+        return False
+
+    with _acquire_server() as port:
+        if port is None:
+            return False
+
+        cmd = [
+            unoconvert_cmd,
+            "--host", "127.0.0.1",
+            "--port", str(port),
+            "--convert-to", "pdf",
+            str(office_path),
+            str(pdf_path)
+        ]
+        logger.info(f"Conversion Office en PDF (serveur :{port}): {office_path.name}")
+
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            logger.error(f"Timeout serveur LibreOffice :{port} ({office_path.name})")
+            return False
+
+    if result.returncode != 0 or not pdf_path.exists():
+        logger.warning(
+            f"Échec conversion serveur LibreOffice ({office_path.name}): {result.stderr.strip()}"
+        )
+        return False
+
+    return True
+
+
+class OfficeServerPool:
+    """
+    Instances unoserver permanentes, relancées automatiquement en cas d'arrêt.
+
+    Une instance n'est considérée prête qu'une fois son port à l'écoute.
+    Une instance qui s'arrête ou n'écoute pas dans _STARTUP_TIMEOUT est
+    relancée avec une attente exponentielle, puis abandonnée après
+    _MAX_CONSECUTIVE_FAILURES échecs consécutifs (module uno absent,
+    profil corrompu...) : sans port à l'écoute, convert_with_server()
+    renvoie False et les conversions passent par soffice.
+
+    Démarré au lancement de l'application (lifespan) ; les conversions y
+    accèdent par convert_with_server() depuis n'importe quel processus.
+    """
+
+    def __init__(self, pool_size: Optional[int] = None, base_port: Optional[int] = None):
+        """
+        Initialise le pool.
+
+        Args:
+            pool_size: Nombre d'instances. Si None, utilise LIBREOFFICE_SERVER_POOL_SIZE.
+            base_port: Premier port. Si None, utilise LIBREOFFICE_SERVER_BASE_PORT.
+        """
+        settings = get_settings()
+        self.pool_size = settings.LIBREOFFICE_SERVER_POOL_SIZE if pool_size is None else pool_size
+        self.base_port = base_port or settings.LIBREOFFICE_SERVER_BASE_PORT
+        self.profiles_dir = Path(settings.DOCUMENT_TEMP_DIR) / "lo_server_profiles"
+
+        self._processes: List[Optional[subprocess.Popen]] = [None] * self.pool_size
+        self._started_at = [0.0] * self.pool_size
+        self._ready = [False] * self.pool_size
+        self._failures = [0] * self.pool_size
+        self._next_start = [0.0] * self.pool_size
+        self._disabled = [False] * self.pool_size
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _command(self, index: int) -> List[str]:
+        """Commande de lancement de l'instance n°index."""
+        port = self.base_port + 2 * index
+        profile_dir = self.profiles_dir / f"server_{index}"
+        return [
+            "unoserver",
+            "--interface", "127.0.0.1",
+            "--port", str(port),
+            "--uno-port", str(port + 1),
+            "--user-installation", profile_dir.resolve().as_uri()
+        ]
+
+    @property
+    def enabled(self) -> bool:
+        """Indique si au moins une instance n'a pas été abandonnée."""
+        return not all(self._disabled)
+
+    def _spawn(self, index: int) -> None:
+        cmd = self._command(index)
+        logger.info(f"Démarrage serveur LibreOffice: {' '.join(cmd)}")
+        self._started_at[index] = time.monotonic()
+        self._ready[index] = False
+        try:
+            self._processes[index] = subprocess.Popen(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True
+            )
+        except OSError as e:
+            self._processes[index] = None
+            self._on_failure(index, f"lancement impossible: {e}")
+
+    def _terminate(self, index: int) -> None:
+        process = self._processes[index]
+        self._processes[index] = None
+        if process is None or process.poll() is not None:
+            return
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    def _on_failure(self, index: int, reason: str) -> None:
+        """Planifie la relance d'une instance en échec, ou l'abandonne."""
+        self._terminate(index)
+        self._ready[index] = False
+        self._failures[index] += 1
+
+        if self._failures[index] >= _MAX_CONSECUTIVE_FAILURES:
+            self._disabled[index] = True
+            logger.error(
+                f"Serveur LibreOffice n°{index} abandonné après {self._failures[index]} "
+                f"échecs ({reason}) : conversions via soffice"
+            )
+            return
+
+        delay = min(_RESTART_BACKOFF_MAX, _RESTART_BACKOFF_BASE * 2 ** (self._failures[index] - 1))
+        self._next_start[index] = time.monotonic() + delay
+        logger.warning(f"Serveur LibreOffice n°{index} en échec ({reason}), relance dans {delay}s")
+
+    def _check_instance(self, index: int) -> None:
+        """Surveille une instance : démarrage, disponibilité, arrêt."""
+        if self._disabled[index]:
+            return
+
+        process = self._processes[index]
+        if process is None:
+            if time.monotonic() >= self._next_start[index]:
+                self._spawn(index)
+            return
+
+        if process.poll() is not None:
+            self._on_failure(index, f"arrêté, code {process.returncode}")
+            return
+
+        if not self._ready[index]:
+            if _is_listening(self.base_port + 2 * index):
+                self._ready[index] = True
+                self._failures[index] = 0
+                logger.info(f"Serveur LibreOffice n°{index} prêt (port {self.base_port + 2 * index})")
+            elif time.monotonic() - self._started_at[index] > _STARTUP_TIMEOUT:
+                self._on_failure(index, f"aucune écoute après {_STARTUP_TIMEOUT}s")
+
+    def start(self) -> bool:
+        """
+        Lance les instances et le thread de surveillance.
+
+        Returns:
+            False si unoserver n'est pas installé (conversions via soffice).
+        """
+        if self.pool_size <= 0:
+            return False
+        if not shutil.which("unoserver"):
+            logger.warning("unoserver non installé : conversions Office via soffice (démarrage à froid)")
+            return False
+
+        self.profiles_dir.mkdir(parents=True, exist_ok=True)
+        self._failures = [0] * self.pool_size
+        self._disabled = [False] * self.pool_size
+        for index in range(self.pool_size):
+            self._spawn(index)
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._monitor, name="office-server-pool", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Pool LibreOffice démarré ({self.pool_size} instance(s), port {self.base_port})")
+        return True
+
+    def _monitor(self) -> None:
+        """Vérifie la disponibilité et relance les instances arrêtées (crash LibreOffice, OOM...)."""
+        while not self._stop_event.wait(1):
+            for index in range(self.pool_size):
+                self._check_instance(index)
+            if not self.enabled:
+                logger.error("Pool LibreOffice désactivé : conversions Office via soffice")
+                return
+
+    def wait_ready(self, timeout: float = _STARTUP_TIMEOUT) -> bool:
+        """
+        Attend que toutes les instances non abandonnées acceptent les connexions.
+
+        Returns:
+            True si ces instances sont prêtes avant le timeout.
+        """
+        deadline = time.monotonic() + timeout
+        ports = [
+            self.base_port + 2 * i for i in range(self.pool_size) if not self._disabled[i]
+        ]
+        if not ports:
+            return False
+        while time.monotonic() < deadline:
+            if all(_is_listening(port) for port in ports):
+                return True
+            time.sleep(0.5)
+        return False
+
+    def stop(self) -> None:
+        """Arrête le thread de surveillance puis les instances."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+        for index in range(self.pool_size):
+            self._terminate(index)
+        logger.info("Pool LibreOffice arrêté")
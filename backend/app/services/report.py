@@ -22,6 +22,7 @@ from docx.enum.text import WD_ALIGN_PARAGRAPH
 from app.utils.db import (
     get_client_by_id,
     get_pieces_dossier,
+    get_piece_counters,
     get_courtier_by_id
 )
 from app.services.drive import DriveManager
@@ -83,8 +84,8 @@ class ReportGenerator:
         # 3. En-tête du rapport
         self._add_header(doc, client, courtier)
 
-        # 4. Statistiques
-        stats = self._calculate_statistics(pieces_dossier)
+        # 4. Statistiques (compteurs tenus à jour par trigger sur pieces_dossier)
+        stats = get_piece_counters(client)
         self._add_statistics(doc, stats)
 
         # 5. Table des pièces
@@ -193,41 +194,6 @@ class ReportGenerator:
 
         doc.add_paragraph()  # Espacement
 
-    def _calculate_statistics(self, pieces_dossier: List[Dict]) -> Dict:
-        """
-        Calcule les statistiques du dossier.
-
-        Args:
-            pieces_dossier: Liste des pièces du dossier
-
-        Returns:
-            Dict avec statistiques
-        """
-        total = len(pieces_dossier)
-
-        if total == 0:
-            return {
-                'total': 0,
-                'recues': 0,
-                'manquantes': 0,
-                'non_conformes': 0,
-                'pourcentage_completion': 0
-            }
-
-        recues = sum(1 for p in pieces_dossier if p.get('statut') == 'recue')
-        manquantes = sum(1 for p in pieces_dossier if p.get('statut') == 'manquante')
-        non_conformes = sum(1 for p in pieces_dossier if p.get('statut') == 'non_conforme')
-
-        pourcentage = round((recues / total) * 100, 1) if total > 0 else 0
-
-        return {
-            'total': total,
-            'recues': recues,
-            'manquantes': manquantes,
-            'non_conformes': non_conformes,
-            'pourcentage_completion': pourcentage
-        }
-
     def _add_statistics(self, doc: Document, stats: Dict) -> None:
         """
         Ajoute les statistiques au rapport.
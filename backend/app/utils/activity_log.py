@@ -0,0 +1,121 @@
+"""
+Tampon d'écriture du journal d'activité (logs_activite).
+
+Les activités journalisées avec log_activity(..., buffered=True) sont
+accumulées en mémoire puis insérées en une seule requête multi-lignes :
+dès que ACTIVITY_LOG_BATCH_SIZE lignes sont en attente, ou au plus tard
+ACTIVITY_LOG_FLUSH_SECONDS secondes après la première. Le tampon est vidé
+à l'arrêt du processus (lifespan FastAPI, atexit pour les workers RQ).
+
+Réservé aux activités dont la ligne créée n'est pas relue : une ligne
+tamponnée n'a pas encore d'id.
+"""
+
+import atexit
+import logging
+import threading
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Lots conservés au maximum quand les envois échouent
+MAX_PENDING_BATCHES = 20
+
+FlushFunc = Callable[[List[Dict[str, Any]]], Any]
+
+
+class ActivityLogBuffer:
+    """Tampon thread-safe de lignes logs_activite, vidé par lots."""
+
+    def __init__(self, flush_func: FlushFunc, batch_size: int = 50, flush_seconds: float = 5.0):
+        """
+        Initialise le tampon.
+
+        Args:
+            flush_func: Insertion multi-lignes (ex: create_logs_bulk).
+            batch_size: Nombre de lignes déclenchant un envoi immédiat.
+            flush_seconds: Délai max avant envoi des lignes en attente.
+        """
+        self.flush_func = flush_func
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+
+        self._rows: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        # Sérialise les envois (thread du minuteur, appelants, arrêt)
+        self._flush_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def add(self, row: Dict[str, Any], flush_when_full: bool = True) -> bool:
+        """
+        Ajoute une ligne au tampon.
+
+        Args:
+            row: Ligne logs_activite (action, details, client_id, courtier_id).
+            flush_when_full: Envoyer le lot dans le thread appelant s'il est
+                plein. False depuis une boucle asyncio : l'appelant envoie
+                alors le lot hors de la boucle (asyncio.to_thread(flush)).
+
+        Returns:
+            True si le lot était plein.
+        """
+        with self._lock:
+            self._rows.append(row)
+            full = len(self._rows) >= self.batch_size
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.flush_seconds, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if full and flush_when_full:
+            self.flush()
+        return full
+
+    def flush(self) -> int:
+        """
+        Insère les lignes en attente en une requête.
+
+        En cas d'échec, les lignes sont conservées pour le prochain envoi.
+
+        Returns:
+            Nombre de lignes insérées.
+        """
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+
+            if not rows:
+                return 0
+
+            try:
+                self.flush_func(rows)
+            except Exception as e:
+                logger.warning(f"Envoi du journal d'activité impossible ({len(rows)} lignes): {e}")
+                with self._lock:
+                    # Borne la mémoire si la base reste indisponible (plus anciennes perdues)
+                    self._rows[:0] = rows
+                    del self._rows[:-self.batch_size * MAX_PENDING_BATCHES]
+                    if self._timer is None:
+                        self._timer = threading.Timer(self.flush_seconds, self.flush)
+                        self._timer.daemon = True
+                        self._timer.start()
+                return 0
+
+            return len(rows)
+
+    def pending(self) -> int:
+        """Nombre de lignes en attente."""
+        with self._lock:
+            return len(self._rows)
+
+
+@lru_cache()
+def get_activity_log_buffer(flush_func: FlushFunc, batch_size: int, flush_seconds: float) -> ActivityLogBuffer:
+    """Retourne le tampon partagé du processus (vidé à la sortie)."""
+    buffer = ActivityLogBuffer(flush_func, batch_size, flush_seconds)
+    atexit.register(buffer.flush)
+    return buffer
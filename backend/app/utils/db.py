@@ -5,12 +5,16 @@ Ce module fournit un client Supabase singleton et des méthodes
 helper pour les opérations courantes sur la base de données.
 """
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from uuid import UUID
 
 from supabase import Client, create_client
 
+from postgrest.types import ReturnMethod
+
 from app.config import get_settings
+from app.utils.activity_log import ActivityLogBuffer, get_activity_log_buffer
+from app.utils.identity_cache import MISSING, IdentityCache, get_identity_cache
 
 
 class SupabaseClient:
@@ -62,6 +66,11 @@ def get_db() -> Client:
     return SupabaseClient.get_client()
 
 
+def _identity_cache() -> IdentityCache:
+    """Cache d'identification courtiers/clients du processus."""
+    return get_identity_cache(get_settings().IDENTITY_CACHE_TTL)
+
+
 # =============================================================================
 # HELPERS COURTIERS
 # =============================================================================
@@ -118,6 +127,7 @@ def create_courtier(data: Dict[str, Any]) -> Dict[str, Any]:
     """
     db = get_db()
     response = db.table("courtiers").insert(data).execute()
+    _identity_cache().invalidate_courtiers()
     return response.data[0]
 
 
@@ -163,9 +173,60 @@ def update_courtier(courtier_id: UUID, data: Dict[str, Any]) -> Dict[str, Any]:
     """
     db = get_db()
     response = db.table("courtiers").update(data).eq("id", str(courtier_id)).execute()
+    _identity_cache().invalidate_courtiers()
     return response.data[0] if response.data else None
 
 
+def _load_courtiers_actifs(cache: IdentityCache) -> bool:
+    """
+    Charge l'instantané des courtiers actifs si nécessaire.
+
+    Returns:
+        True si l'instantané est utilisable, False si le cache est désactivé.
+    """
+    if not cache.enabled:
+        return False
+    if not cache.courtiers_loaded():
+        cache.set_courtiers(get_all_courtiers_actifs())
+    return True
+
+
+def resolve_courtier_by_email(email: str) -> Optional[Dict[str, Any]]:
+    """
+    Version en cache de get_courtier_by_email (courtiers actifs uniquement).
+
+    Args:
+        email: Email du courtier.
+
+    Returns:
+        Dict contenant les données du courtier, ou None si non trouvé.
+    """
+    cache = _identity_cache()
+    if not _load_courtiers_actifs(cache):
+        return get_courtier_by_email(email)
+    return cache.get_courtier_by_email(email)
+
+
+def resolve_courtier_by_id(courtier_id: UUID) -> Optional[Dict[str, Any]]:
+    """
+    Version en cache de get_courtier_by_id.
+
+    Un courtier inactif n'est pas dans l'instantané : lecture directe.
+
+    Args:
+        courtier_id: ID unique du courtier.
+
+    Returns:
+        Dict contenant les données du courtier, ou None si non trouvé.
+    """
+    cache = _identity_cache()
+    if _load_courtiers_actifs(cache):
+        courtier = cache.get_courtier_by_id(courtier_id)
+        if courtier:
+            return courtier
+    return get_courtier_by_id(courtier_id)
+
+
 # =============================================================================
 # HELPERS CLIENTS
 # =============================================================================
@@ -214,34 +275,87 @@ def get_client_by_email(email: str, courtier_id: Optional[UUID] = None) -> Optio
     return None
 
 
+def resolve_client_by_email(email: str) -> Optional[Dict[str, Any]]:
+    """
+    Identifie le client d'une adresse email (tous courtiers confondus), en cache.
+
+    Recherche exacte sur l'index client_emails (adresse normalisée,
+    principale ou secondaire). Une adresse qui n'appartient à aucun client
+    est aussi mise en cache.
+
+    Args:
+        email: Email du client.
+
+    Returns:
+        Dict contenant les données du client, ou None si non trouvé.
+    """
+    cache = _identity_cache()
+    client = cache.get_client(email)
+    if client is MISSING:
+        client = None
+        candidates = _normalize_emails([email])
+        if candidates:
+            response = _client_emails_query(get_db(), candidates).execute()
+            client = _best_email_match(response.data, candidates)
+        cache.set_client(email, client)
+    return client
+
+
 def find_client_by_email_list(emails: List[str], courtier_id: UUID) -> Optional[Dict[str, Any]]:
     """
     Recherche un client par une liste d'emails (principal ou secondaires).
 
+    Une seule requête sur l'index client_emails (emails normalisés,
+    maintenus par trigger) : email IN (...) pour le courtier.
+
     Args:
         emails: Liste d'emails à rechercher.
         courtier_id: ID du courtier.
 
     Returns:
         Dict contenant les données du client, ou None si non trouvé.
+        Un email principal est prioritaire sur un email secondaire, puis
+        l'ordre de la liste est respecté.
     """
+    candidates = _normalize_emails(emails)
+    if not candidates:
+        return None
+
     db = get_db()
+    response = _client_emails_query(db, candidates, courtier_id).execute()
+    return _best_email_match(response.data, candidates)
 
-    # Recherche par email principal
-    for email in emails:
-        client = get_client_by_email(email, courtier_id)
-        if client:
-            return client
 
-    # Recherche par emails secondaires
-    response = db.table("clients").select("*").eq("courtier_id", str(courtier_id)).execute()
+def _normalize_emails(emails: List[str]) -> List[str]:
+    """Emails en minuscules, sans doublons ni valeurs vides (ordre conservé)."""
+    return list(dict.fromkeys(
+        email.strip().lower() for email in emails if email and email.strip()
+    ))
 
-    for client in response.data:
-        emails_secondaires = client.get("emails_secondaires", [])
-        if any(email in emails_secondaires for email in emails):
-            return client
 
-    return None
+def _client_emails_query(db: Any, candidates: List[str], courtier_id: Optional[UUID] = None) -> Any:
+    """Construit la requête de find_client_by_email_list (courtier_id None : tous courtiers)."""
+    query = (
+        db.table("client_emails")
+        .select("email, est_principal, clients(*)")
+        .in_("email", candidates)
+    )
+    if courtier_id:
+        query = query.eq("courtier_id", str(courtier_id))
+    return query
+
+
+def _best_email_match(rows: List[Dict[str, Any]], candidates: List[str]) -> Optional[Dict[str, Any]]:
+    """Client du meilleur match : email principal d'abord, puis ordre des candidats."""
+    matches = [row for row in rows if row.get("clients")]
+    if not matches:
+        return None
+
+    best = min(
+        matches,
+        key=lambda row: (not row.get("est_principal"), candidates.index(row["email"]))
+    )
+    return best["clients"]
 
 
 def get_clients_by_courtier(courtier_id: UUID, statut: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -265,6 +379,124 @@ def get_clients_by_courtier(courtier_id: UUID, statut: Optional[str] = None) ->
     return response.data
 
 
+# Clés de tri de la liste des dossiers (chacune indexée avec id en départage)
+DOSSIER_SORT_KEYS = ("created_at", "updated_at", "nom", "pourcentage_completion")
+
+
+def _postgrest_quote(value: Any) -> str:
+    """Encadre une valeur pour un filtre PostgREST (virgules, parenthèses...)."""
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def get_dossiers_with_stats(
+    courtier_id: Optional[UUID] = None,
+    statut: Optional[str] = None,
+    search: Optional[str] = None,
+    sort: str = "-created_at",
+    limit: Optional[int] = None,
+    after: Optional[Tuple[Any, str]] = None,
+    columns: str = "*"
+) -> List[Dict[str, Any]]:
+    """
+    Récupère une page de clients avec leurs compteurs de pièces.
+
+    Les compteurs (nb_pieces_total, nb_pieces_recues, nb_pieces_manquantes,
+    nb_pieces_non_conformes, pourcentage_completion) sont des colonnes de
+    clients tenues à jour par trigger à chaque écriture de pièce.
+
+    Pagination par curseur (keyset) : la page suivante commence après le
+    couple (valeur de tri, id) du dernier élément, sans OFFSET.
+
+    Args:
+        courtier_id: ID du courtier. Si None, clients de tous les courtiers (admin).
+        statut: Filtrer par statut (optionnel).
+        search: Texte recherché dans nom, prénom et email (optionnel).
+        sort: Clé de tri (DOSSIER_SORT_KEYS), préfixe "-" pour l'ordre décroissant.
+        limit: Nombre max de clients (None = tous).
+        after: (valeur de tri, id) du dernier client de la page précédente.
+        columns: Colonnes à retourner (doivent inclure id et la clé de tri
+            pour paginer).
+
+    Returns:
+        Liste des clients avec compteurs.
+
+    Raises:
+        ValueError: Si la clé de tri est inconnue.
+    """
+    query = _dossiers_with_stats_query(
+        get_db(), courtier_id, statut, search, sort, limit, after, columns
+    )
+    response = query.execute()
+    return response.data
+
+
+def _dossiers_with_stats_query(
+    db: Any,
+    courtier_id: Optional[UUID],
+    statut: Optional[str],
+    search: Optional[str],
+    sort: str,
+    limit: Optional[int],
+    after: Optional[Tuple[Any, str]],
+    columns: str
+) -> Any:
+    """
+    Construit la requête de get_dossiers_with_stats.
+
+    Partagée avec db_async : le client (synchrone ou asynchrone) expose le
+    même constructeur de requêtes, seul execute() diffère.
+    """
+    descending = sort.startswith("-")
+    sort_key = sort.lstrip("-")
+    if sort_key not in DOSSIER_SORT_KEYS:
+        raise ValueError(f"Clé de tri inconnue: {sort_key}")
+
+    query = db.table("clients").select(columns)
+
+    if courtier_id:
+        query = query.eq("courtier_id", str(courtier_id))
+    if statut:
+        query = query.eq("statut", statut)
+    if search:
+        # Colonne recherche (minuscules, index trigramme) ; jokers PostgREST
+        # retirés, caractères spéciaux ILIKE (\ et _) échappés
+        pattern = search.lower().replace("*", "").replace("%", "")
+        pattern = pattern.replace("\\", "\\\\").replace("_", "\\_")
+        query = query.ilike("recherche", f"*{pattern}*")
+    if after:
+        value, last_id = after
+        op = "lt" if descending else "gt"
+        quoted = _postgrest_quote(value)
+        query = query.or_(
+            f"{sort_key}.{op}.{quoted},and({sort_key}.eq.{quoted},id.{op}.{last_id})"
+        )
+
+    query = query.order(sort_key, desc=descending).order("id", desc=descending)
+    if limit:
+        query = query.limit(limit)
+    return query
+
+
+def get_piece_counters(client: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extrait les compteurs de complétion d'un client.
+
+    Args:
+        client: Enregistrement de la table clients.
+
+    Returns:
+        Dict total, recues, manquantes, non_conformes, pourcentage_completion.
+    """
+    return {
+        'total': client.get('nb_pieces_total') or 0,
+        'recues': client.get('nb_pieces_recues') or 0,
+        'manquantes': client.get('nb_pieces_manquantes') or 0,
+        'non_conformes': client.get('nb_pieces_non_conformes') or 0,
+        'pourcentage_completion': float(client.get('pourcentage_completion') or 0)
+    }
+
+
 def create_client_record(data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Crée un nouveau client (enregistrement dans la table clients).
@@ -280,6 +512,8 @@ def create_client_record(data: Dict[str, Any]) -> Dict[str, Any]:
     """
     db = get_db()
     response = db.table("clients").insert(data).execute()
+    # Adresses du nouveau client : efface les résultats « aucun client »
+    _identity_cache().invalidate_client(emails=_client_data_emails(data))
     return response.data[0]
 
 
@@ -299,9 +533,15 @@ def update_client(client_id: UUID, data: Dict[str, Any]) -> Dict[str, Any]:
     """
     db = get_db()
     response = db.table("clients").update(data).eq("id", str(client_id)).execute()
+    _identity_cache().invalidate_client(client_id, emails=_client_data_emails(data))
     return response.data[0]
 
 
+def _client_data_emails(data: Dict[str, Any]) -> List[str]:
+    """Adresses présentes dans des données client écrites (invalidation du cache)."""
+    return [data.get("email_principal"), *(data.get("emails_secondaires") or [])]
+
+
 def find_client_by_name(
     courtier_id: UUID,
     nom: str,
@@ -485,6 +725,40 @@ def create_piece_dossier(data: Dict[str, Any]) -> Dict[str, Any]:
     return response.data[0]
 
 
+def create_pieces_dossier_bulk(
+    pieces: List[Dict[str, Any]],
+    upsert: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Crée (ou met à jour) plusieurs pièces en une seule requête multi-lignes.
+
+    Ex: les 25 pièces attendues d'un nouveau dossier en un appel au lieu
+    de 25. Les colonnes absentes d'une ligne prennent leur valeur par
+    défaut (statut 'manquante'...).
+
+    Args:
+        pieces: Données des pièces à créer.
+        upsert: Mettre à jour les pièces existantes (chaque ligne doit
+            alors contenir son id).
+
+    Returns:
+        Liste des pièces créées ou mises à jour.
+
+    Raises:
+        Exception: Si l'écriture échoue (aucune ligne n'est écrite).
+    """
+    if not pieces:
+        return []
+
+    db = get_db()
+    if upsert:
+        query = db.table("pieces_dossier").upsert(pieces, on_conflict="id", default_to_null=False)
+    else:
+        query = db.table("pieces_dossier").insert(pieces, default_to_null=False)
+    response = query.execute()
+    return response.data
+
+
 def update_piece_dossier(piece_id: UUID, data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Met à jour une pièce existante.
@@ -508,6 +782,9 @@ def check_duplicate_piece(fichier_hash: str, client_id: UUID) -> Optional[Dict[s
     """
     Vérifie si une pièce avec le même hash existe déjà pour un client.
 
+    Un fichier Maître pouvant regrouper plusieurs fichiers reçus, les hash
+    des fichiers fusionnés sont aussi recherchés dans metadata.fichiers_hashes.
+
     Args:
         fichier_hash: Hash SHA256 du fichier.
         client_id: ID du client.
@@ -524,11 +801,70 @@ def check_duplicate_piece(fichier_hash: str, client_id: UUID) -> Optional[Dict[s
         .execute()
     )
 
+    if response.data and len(response.data) > 0:
+        return response.data[0]
+
+    response = (
+        db.table("pieces_dossier")
+        .select("*")
+        .eq("client_id", str(client_id))
+        .contains("metadata", {"fichiers_hashes": [fichier_hash]})
+        .execute()
+    )
+
     if response.data and len(response.data) > 0:
         return response.data[0]
     return None
 
 
+# =============================================================================
+# HELPERS CACHE DOCUMENTS
+# =============================================================================
+
+
+def get_document_cache_entry(fichier_hash: str) -> Optional[Dict[str, Any]]:
+    """
+    Récupère l'entrée du cache documentaire pour un hash de fichier.
+
+    Args:
+        fichier_hash: Hash SHA256 du fichier source.
+
+    Returns:
+        Dict (nature, drive_file_id, pdf_size_bytes, metadata...) ou None.
+    """
+    db = get_db()
+    response = (
+        db.table("documents_cache")
+        .select("*")
+        .eq("fichier_hash", fichier_hash)
+        .execute()
+    )
+
+    if response.data and len(response.data) > 0:
+        return response.data[0]
+    return None
+
+
+def upsert_document_cache_entry(fichier_hash: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Crée ou met à jour l'entrée du cache documentaire d'un hash.
+
+    Args:
+        fichier_hash: Hash SHA256 du fichier source.
+        data: Champs à enregistrer (nature, drive_file_id, pdf_size_bytes...).
+
+    Returns:
+        Dict contenant l'entrée enregistrée.
+    """
+    db = get_db()
+    response = (
+        db.table("documents_cache")
+        .upsert({"fichier_hash": fichier_hash, **data})
+        .execute()
+    )
+    return response.data[0] if response.data else None
+
+
 # =============================================================================
 # HELPERS LOGS
 # =============================================================================
@@ -539,6 +875,7 @@ def log_activity(
     details: Optional[Dict[str, Any]] = None,
     client_id: Optional[UUID] = None,
     courtier_id: Optional[UUID] = None,
+    buffered: bool = False,
 ) -> Dict[str, Any]:
     """
     Enregistre une activité dans les logs.
@@ -548,11 +885,67 @@ def log_activity(
         details: Détails JSON de l'action.
         client_id: ID du client concerné (optionnel).
         courtier_id: ID du courtier concerné (optionnel).
+        buffered: Mettre la ligne en tampon, insérée plus tard par lot
+            (pas d'appel réseau ; la ligne retournée n'a pas d'id).
 
     Returns:
-        Dict contenant les données du log créé.
+        Dict contenant les données du log créé (ou mis en tampon).
     """
+    log_data = _log_data(action, details, client_id, courtier_id)
+    if buffered:
+        _activity_log_buffer().add(log_data)
+        return log_data
+
     db = get_db()
+    response = db.table("logs_activite").insert(log_data).execute()
+    return response.data[0]
+
+
+def create_logs_bulk(rows: List[Dict[str, Any]]) -> None:
+    """
+    Insère plusieurs lignes de logs en une seule requête.
+
+    Args:
+        rows: Lignes logs_activite (voir _log_data).
+    """
+    if not rows:
+        return
+
+    db = get_db()
+    (
+        db.table("logs_activite")
+        .insert(rows, returning=ReturnMethod.minimal, default_to_null=False)
+        .execute()
+    )
+
+
+def _activity_log_buffer() -> ActivityLogBuffer:
+    """Tampon du journal d'activité du processus."""
+    settings = get_settings()
+    return get_activity_log_buffer(
+        create_logs_bulk,
+        settings.ACTIVITY_LOG_BATCH_SIZE,
+        settings.ACTIVITY_LOG_FLUSH_SECONDS
+    )
+
+
+def flush_activity_log() -> int:
+    """
+    Insère immédiatement les logs en tampon (arrêt de l'application).
+
+    Returns:
+        Nombre de lignes insérées.
+    """
+    return _activity_log_buffer().flush()
+
+
+def _log_data(
+    action: str,
+    details: Optional[Dict[str, Any]],
+    client_id: Optional[UUID],
+    courtier_id: Optional[UUID],
+) -> Dict[str, Any]:
+    """Ligne logs_activite d'une activité."""
     log_data = {
         "action": action,
         "details": details or {},
@@ -562,9 +955,7 @@ def log_activity(
         log_data["client_id"] = str(client_id)
     if courtier_id:
         log_data["courtier_id"] = str(courtier_id)
-
-    response = db.table("logs_activite").insert(log_data).execute()
-    return response.data[0]
+    return log_data
 
 
 def create_log(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -608,6 +999,18 @@ def get_config(cle: str) -> Optional[Any]:
     return None
 
 
+def get_all_config() -> Dict[str, Any]:
+    """
+    Récupère toute la table de configuration (chargement du cache).
+
+    Returns:
+        Dict cle -> valeur JSON.
+    """
+    db = get_db()
+    response = db.table("config").select("cle, valeur").execute()
+    return {row["cle"]: row["valeur"] for row in response.data}
+
+
 def set_config(cle: str, valeur: Any, description: Optional[str] = None) -> Dict[str, Any]:
     """
     Définit ou met à jour une valeur de configuration.
@@ -659,13 +1062,16 @@ def create_dossier_context(client_id: str) -> Dict[str, Any]:
         return existing
 
     db = get_db()
-    data = {
+    response = db.table("dossier_context").insert(_initial_dossier_context(client_id)).execute()
+    return response.data[0]
+
+def _initial_dossier_context(client_id: str) -> Dict[str, Any]:
+    """Contexte initial d'un nouveau dossier."""
+    return {
         "client_id": str(client_id),
         "summary": "Dossier initié.",
         "current_status": "waiting_docs"
     }
-    response = db.table("dossier_context").insert(data).execute()
-    return response.data[0]
 
 def update_dossier_context(client_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -0,0 +1,462 @@
+"""
+Accès Supabase asynchrone pour les endpoints FastAPI et l'EmailAgent.
+
+Même surface que app.utils.db (mêmes noms, mêmes arguments, mêmes
+retours), en coroutines : les requêtes PostgREST passent par un client
+httpx asynchrone dont le pool de connexions keep-alive est partagé. Les
+endpoints du dashboard et le traitement des emails ne bloquent plus la
+boucle d'événements pendant les requêtes.
+
+app.utils.db reste utilisé par le code synchrone (workers RQ, services
+exécutés dans des threads). La construction des requêtes non triviales
+est partagée entre les deux modules.
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+import httpx
+import structlog
+from postgrest import AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+
+from app.config import get_settings
+# DOSSIER_SORT_KEYS et get_piece_counters (sans accès base) sont réexportés
+from app.utils.db import (  # noqa: F401
+    DOSSIER_SORT_KEYS,
+    _activity_log_buffer,
+    _best_email_match,
+    _client_data_emails,
+    _client_emails_query,
+    _dossiers_with_stats_query,
+    _identity_cache,
+    _initial_dossier_context,
+    _log_data,
+    _normalize_emails,
+    get_piece_counters,
+)
+from app.utils.identity_cache import MISSING
+
+logger = structlog.get_logger()
+
+
+class AsyncSupabaseClient:
+    """
+    Client PostgREST asynchrone singleton (un par boucle d'événements).
+
+    Le pool httpx est lié à la boucle qui l'a créé : si la boucle change
+    (tests, scripts asyncio.run), un nouveau client est créé.
+    """
+
+    _instance: Optional[AsyncPostgrestClient] = None
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def get_client(cls) -> AsyncPostgrestClient:
+        """
+        Récupère le client PostgREST asynchrone de la boucle courante.
+
+        Returns:
+            AsyncPostgrestClient: Client partagé.
+
+        Raises:
+            ValueError: Si les variables d'environnement ne sont pas configurées.
+        """
+        loop = asyncio.get_running_loop()
+        if cls._instance is None or cls._loop is not loop:
+            settings = get_settings()
+            if not settings.SUPABASE_URL or not settings.SUPABASE_KEY:
+                raise ValueError(
+                    "SUPABASE_URL et SUPABASE_KEY doivent être définis "
+                    "dans les variables d'environnement"
+                )
+            # Même clé que le client synchrone (Service Role si disponible)
+            key_to_use = settings.SUPABASE_SERVICE_ROLE_KEY or settings.SUPABASE_KEY
+
+            http_client = httpx.AsyncClient(
+                http2=True,
+                follow_redirects=True,
+                timeout=settings.SUPABASE_HTTP_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=settings.SUPABASE_POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.SUPABASE_POOL_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.SUPABASE_POOL_KEEPALIVE_EXPIRY,
+                ),
+            )
+            cls._instance = AsyncPostgrestClient(
+                f"{settings.SUPABASE_URL.rstrip('/')}/rest/v1",
+                headers={
+                    **DEFAULT_POSTGREST_CLIENT_HEADERS,
+                    "apiKey": key_to_use,
+                    "Authorization": f"Bearer {key_to_use}",
+                },
+                http_client=http_client,
+            )
+            cls._loop = loop
+        return cls._instance
+
+    @classmethod
+    async def close(cls) -> None:
+        """Ferme le pool de connexions (arrêt de l'application)."""
+        if cls._instance is not None:
+            client, cls._instance, cls._loop = cls._instance, None, None
+            await client.aclose()
+
+
+def get_async_db() -> AsyncPostgrestClient:
+    """
+    Helper pour récupérer le client PostgREST asynchrone.
+
+    Returns:
+        AsyncPostgrestClient: Client partagé de la boucle courante.
+    """
+    return AsyncSupabaseClient.get_client()
+
+
+async def close_async_db() -> None:
+    """Ferme le pool de connexions asynchrone."""
+    await AsyncSupabaseClient.close()
+
+
+def _first(response: Any) -> Optional[Dict[str, Any]]:
+    """Première ligne d'une réponse, ou None."""
+    return response.data[0] if response.data else None
+
+
+# =============================================================================
+# HELPERS COURTIERS
+# =============================================================================
+
+
+async def get_courtier_by_email(email: str) -> Optional[Dict[str, Any]]:
+    """Voir app.utils.db.get_courtier_by_email."""
+    db = get_async_db()
+    response = await db.table("courtiers").select("*").eq("email", email).eq("actif", True).execute()
+    return _first(response)
+
+
+async def get_courtier_by_id(courtier_id: UUID) -> Optional[Dict[str, Any]]:
+    """Voir app.utils.db.get_courtier_by_id."""
+    db = get_async_db()
+    response = await db.table("courtiers").select("*").eq("id", str(courtier_id)).execute()
+    return _first(response)
+
+
+async def create_courtier(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Voir app.utils.db.create_courtier."""
+    db = get_async_db()
+    response = await db.table("courtiers").insert(data).execute()
+    _identity_cache().invalidate_courtiers()
+    return response.data[0]
+
+
+async def get_all_courtiers() -> List[Dict[str, Any]]:
+    """Voir app.utils.db.get_all_courtiers."""
+    db = get_async_db()
+    response = await db.table("courtiers").select("*").order("created_at", desc=True).execute()
+    return response.data
+
+
+async def get_all_courtiers_actifs() -> List[Dict[str, Any]]:
+    """Voir app.utils.db.get_all_courtiers_actifs."""
+    db = get_async_db()
+    response = await db.table("courtiers").select("*").eq("actif", True).execute()
+    return response.data
+
+
+async def update_courtier(courtier_id: UUID, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Voir app.utils.db.update_courtier."""
+    db = get_async_db()
+    response = await db.table("courtiers").update(data).eq("id", str(courtier_id)).execute()
+    _identity_cache().invalidate_courtiers()
+    return _first(response)
+
+
+async def _load_courtiers_actifs() -> bool:
+    """Voir app.utils.db._load_courtiers_actifs."""
+    cache = _identity_cache()
+    if not cache.enabled:
+        return False
+    if not cache.courtiers_loaded():
+        cache.set_courtiers(await get_all_courtiers_actifs())
+    return True
+
+
+async def resolve_courtier_by_email(email: str) -> Optional[Dict[str, Any]]:
+    """Voir app.utils.db.resolve_courtier_by_email."""
+    if not await _load_courtiers_actifs():
+        return await get_courtier_by_email(email)
+    return _identity_cache().get_courtier_by_email(email)
+
+
+async def resolve_courtier_by_id(courtier_id: UUID) -> Optional[Dict[str, Any]]:
+    """Voir app.utils.db.resolve_courtier_by_id."""
+    if await _load_courtiers_actifs():
+        courtier = _identity_cache().get_courtier_by_id(courtier_id)
+        if courtier:
+            return courtier
+    return await get_courtier_by_id(courtier_id)
+
+
+# =============================================================================
+# HELPERS CLIENTS
+# =============================================================================
+
+
+async def get_client_by_id(client_id: UUID) -> Optional[Dict[str, Any]]:
+    """Voir app.utils.db.get_client_by_id."""
+    db = get_async_db()
+    response = await db.table("clients").select("*").eq("id", str(client_id)).execute()
+    return _first(response)
+
+
+async def get_client_by_email(email: str, courtier_id: Optional[UUID] = None) -> Optional[Dict[str, Any]]:
+    """Voir app.utils.db.get_client_by_email."""
+    db = get_async_db()
+    query = db.table("clients").select("*").ilike("email_principal", f"{email}%")
+
+    if courtier_id:
+        query = query.eq("courtier_id", str(courtier_id))
+
+    response = await query.execute()
+    return _first(response)
+
+
+async def resolve_client_by_email(email: str) -> Optional[Dict[str, Any]]:
+    """Voir app.utils.db.resolve_client_by_email."""
+    cache = _identity_cache()
+    client = cache.get_client(email)
+    if client is MISSING:
+        client = None
+        candidates = _normalize_emails([email])
+        if candidates:
+            response = await _client_emails_query(get_async_db(), candidates).execute()
+            client = _best_email_match(response.data, candidates)
+        cache.set_client(email, client)
+    return client
+
+
+async def find_client_by_email_list(emails: List[str], courtier_id: UUID) -> Optional[Dict[str, Any]]:
+    """Voir app.utils.db.find_client_by_email_list."""
+    candidates = _normalize_emails(emails)
+    if not candidates:
+        return None
+
+    response = await _client_emails_query(get_async_db(), candidates, courtier_id).execute()
+    return _best_email_match(response.data, candidates)
+
+
+async def get_clients_by_courtier(courtier_id: UUID, statut: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Voir app.utils.db.get_clients_by_courtier."""
+    db = get_async_db()
+    query = db.table("clients").select("*").eq("courtier_id", str(courtier_id))
+
+    if statut:
+        query = query.eq("statut", statut)
+
+    response = await query.order("created_at", desc=True).execute()
+    return response.data
+
+
+async def get_dossiers_with_stats(
+    courtier_id: Optional[UUID] = None,
+    statut: Optional[str] = None,
+    search: Optional[str] = None,
+    sort: str = "-created_at",
+    limit: Optional[int] = None,
+    after: Optional[Tuple[Any, str]] = None,
+    columns: str = "*"
+) -> List[Dict[str, Any]]:
+    """Voir app.utils.db.get_dossiers_with_stats."""
+    query = _dossiers_with_stats_query(
+        get_async_db(), courtier_id, statut, search, sort, limit, after, columns
+    )
+    response = await query.execute()
+    return response.data
+
+
+async def create_client_record(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Voir app.utils.db.create_client_record."""
+    db = get_async_db()
+    response = await db.table("clients").insert(data).execute()
+    _identity_cache().invalidate_client(emails=_client_data_emails(data))
+    return response.data[0]
+
+
+async def update_client(client_id: UUID, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Voir app.utils.db.update_client."""
+    db = get_async_db()
+    response = await db.table("clients").update(data).eq("id", str(client_id)).execute()
+    _identity_cache().invalidate_client(client_id, emails=_client_data_emails(data))
+    return response.data[0]
+
+
+async def add_secondary_email(client_id: UUID, email: str) -> None:
+    """Voir app.utils.db.add_secondary_email."""
+    client = await get_client_by_id(client_id)
+
+    if not client:
+        return
+
+    emails_secondaires = client.get("emails_secondaires", []) or []
+
+    if email not in emails_secondaires:
+        emails_secondaires.append(email)
+        await update_client(client_id, {"emails_secondaires": emails_secondaires})
+
+        logger.info(
+            "Email secondaire ajouté",
+            client_id=str(client_id),
+            email=email
+        )
+
+
+async def get_clients_modified_since(
+    courtier_id: UUID,
+    since_datetime
+) -> List[Dict[str, Any]]:
+    """Voir app.utils.db.get_clients_modified_since."""
+    db = get_async_db()
+    response = await (
+        db.table("clients")
+        .select("*")
+        .eq("courtier_id", str(courtier_id))
+        .gte("updated_at", since_datetime.isoformat())
+        .order("updated_at", desc=True)
+        .execute()
+    )
+    return response.data
+
+
+# =============================================================================
+# HELPERS PIÈCES
+# =============================================================================
+
+
+async def get_types_pieces_by_type_pret(type_pret: str) -> List[Dict[str, Any]]:
+    """Voir app.utils.db.get_types_pieces_by_type_pret."""
+    db = get_async_db()
+    response = await (
+        db.table("types_pieces")
+        .select("*")
+        .in_("type_pret", [type_pret, "commun"])
+        .order("ordre")
+        .execute()
+    )
+    return response.data
+
+
+async def get_pieces_by_client(client_id: UUID) -> List[Dict[str, Any]]:
+    """Voir app.utils.db.get_pieces_by_client."""
+    db = get_async_db()
+    response = await (
+        db.table("pieces_dossier")
+        .select("*, types_pieces(*)")
+        .eq("client_id", str(client_id))
+        .execute()
+    )
+    return response.data
+
+
+async def get_pieces_dossier(client_id: UUID) -> List[Dict[str, Any]]:
+    """Voir app.utils.db.get_pieces_dossier."""
+    return await get_pieces_by_client(client_id)
+
+
+async def get_type_piece(type_piece_id: UUID) -> Optional[Dict[str, Any]]:
+    """Voir app.utils.db.get_type_piece."""
+    db = get_async_db()
+    response = await db.table("types_pieces").select("*").eq("id", str(type_piece_id)).execute()
+    return _first(response)
+
+
+async def create_piece_dossier(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Voir app.utils.db.create_piece_dossier."""
+    db = get_async_db()
+    response = await db.table("pieces_dossier").insert(data).execute()
+    return response.data[0]
+
+
+async def create_pieces_dossier_bulk(
+    pieces: List[Dict[str, Any]],
+    upsert: bool = False
+) -> List[Dict[str, Any]]:
+    """Voir app.utils.db.create_pieces_dossier_bulk."""
+    if not pieces:
+        return []
+
+    db = get_async_db()
+    if upsert:
+        query = db.table("pieces_dossier").upsert(pieces, on_conflict="id", default_to_null=False)
+    else:
+        query = db.table("pieces_dossier").insert(pieces, default_to_null=False)
+    response = await query.execute()
+    return response.data
+
+
+async def update_piece_dossier(piece_id: UUID, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Voir app.utils.db.update_piece_dossier."""
+    db = get_async_db()
+    response = await db.table("pieces_dossier").update(data).eq("id", str(piece_id)).execute()
+    return response.data[0]
+
+
+# =============================================================================
+# HELPERS LOGS
+# =============================================================================
+
+
+async def log_activity(
+    action: str,
+    details: Optional[Dict[str, Any]] = None,
+    client_id: Optional[UUID] = None,
+    courtier_id: Optional[UUID] = None,
+    buffered: bool = False,
+) -> Dict[str, Any]:
+    """
+    Voir app.utils.db.log_activity (tampon partagé avec le code synchrone).
+
+    Un lot plein est envoyé dans un thread : la boucle d'événements n'est
+    pas bloquée par l'insertion synchrone.
+    """
+    log_data = _log_data(action, details, client_id, courtier_id)
+    if buffered:
+        buffer = _activity_log_buffer()
+        if buffer.add(log_data, flush_when_full=False):
+            await asyncio.to_thread(buffer.flush)
+        return log_data
+
+    db = get_async_db()
+    response = await db.table("logs_activite").insert(log_data).execute()
+    return response.data[0]
+
+
+# =============================================================================
+# HELPERS DOSSIER CONTEXT (AGENT MEMORY)
+# =============================================================================
+
+
+async def get_dossier_context(client_id: str) -> Optional[Dict[str, Any]]:
+    """Voir app.utils.db.get_dossier_context."""
+    db = get_async_db()
+    response = await db.table("dossier_context").select("*").eq("client_id", str(client_id)).execute()
+    return _first(response)
+
+
+async def create_dossier_context(client_id: str) -> Dict[str, Any]:
+    """Voir app.utils.db.create_dossier_context."""
+    existing = await get_dossier_context(client_id)
+    if existing:
+        return existing
+
+    db = get_async_db()
+    response = await db.table("dossier_context").insert(_initial_dossier_context(client_id)).execute()
+    return response.data[0]
+
+
+async def update_dossier_context(client_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
+    """Voir app.utils.db.update_dossier_context."""
+    db = get_async_db()
+    response = await db.table("dossier_context").update(updates).eq("client_id", str(client_id)).execute()
+    return _first(response)
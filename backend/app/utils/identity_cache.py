@@ -0,0 +1,150 @@
+"""
+Cache d'identification des expéditeurs et destinataires d'emails.
+
+Pour chaque email, EmailAgent résout l'expéditeur puis chaque destinataire
+(client ? courtier ?). Sans cache, chaque adresse coûte un aller-retour
+Supabase. Ce cache conserve :
+
+- un instantané des courtiers actifs (par email et par ID), rechargé
+  en une requête à expiration ;
+- la résolution adresse -> client, y compris « aucun client » pour une
+  adresse inconnue.
+
+Les écritures (create_client_record, add_secondary_email, update_client,
+create_courtier, update_courtier) invalident les entrées concernées ; la
+durée de vie (IDENTITY_CACHE_TTL) borne l'obsolescence des écritures
+faites par un autre processus.
+"""
+
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Valeur retournée en l'absence d'entrée (None = "aucun client" est mis en cache)
+MISSING = object()
+
+
+class IdentityCache:
+    """Cache TTL thread-safe des courtiers et des clients par adresse email."""
+
+    def __init__(self, ttl_seconds: int, max_entries: int = 4096):
+        """
+        Initialise le cache.
+
+        Args:
+            ttl_seconds: Durée de vie des entrées (0 = cache désactivé).
+            max_entries: Nombre max d'adresses clients en cache.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._courtiers_by_email: Dict[str, Dict[str, Any]] = {}
+        self._courtiers_by_id: Dict[str, Dict[str, Any]] = {}
+        self._courtiers_expires_at = 0.0
+        self._clients: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    @staticmethod
+    def normalize(email: str) -> str:
+        return (email or "").strip().lower()
+
+    # =========================================================================
+    # COURTIERS
+    # =========================================================================
+
+    def courtiers_loaded(self) -> bool:
+        """Indique si l'instantané des courtiers actifs est à jour."""
+        return self.enabled and self._courtiers_expires_at > time.monotonic()
+
+    def set_courtiers(self, courtiers: List[Dict[str, Any]]) -> None:
+        """Remplace l'instantané des courtiers actifs."""
+        by_email = {self.normalize(c.get("email")): c for c in courtiers if c.get("email")}
+        by_id = {str(c.get("id")): c for c in courtiers}
+        with self._lock:
+            self._courtiers_by_email = by_email
+            self._courtiers_by_id = by_id
+            self._courtiers_expires_at = time.monotonic() + self.ttl_seconds
+
+    def get_courtier_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        """Courtier actif de l'instantané (appeler courtiers_loaded() avant)."""
+        return self._courtiers_by_email.get(self.normalize(email))
+
+    def get_courtier_by_id(self, courtier_id: Any) -> Optional[Dict[str, Any]]:
+        """Courtier actif de l'instantané (None si inconnu ou inactif)."""
+        return self._courtiers_by_id.get(str(courtier_id))
+
+    def invalidate_courtiers(self) -> None:
+        """Force le rechargement des courtiers (création, mise à jour)."""
+        with self._lock:
+            self._courtiers_expires_at = 0.0
+
+    # =========================================================================
+    # CLIENTS
+    # =========================================================================
+
+    def get_client(self, email: str) -> Any:
+        """
+        Client associé à une adresse.
+
+        Returns:
+            Dict du client, None si l'adresse n'est pas celle d'un client,
+            MISSING si l'adresse n'est pas en cache.
+        """
+        if not self.enabled:
+            return MISSING
+        key = self.normalize(email)
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, client = entry
+            if expires_at <= time.monotonic():
+                del self._clients[key]
+                return MISSING
+            return client
+
+    def set_client(self, email: str, client: Optional[Dict[str, Any]]) -> None:
+        """Enregistre la résolution d'une adresse (client ou None)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if len(self._clients) >= self.max_entries:
+                # Entrée la plus ancienne (ordre d'insertion)
+                self._clients.pop(next(iter(self._clients)))
+            self._clients[self.normalize(email)] = (time.monotonic() + self.ttl_seconds, client)
+
+    def invalidate_client(self, client_id: Optional[Any] = None, emails: Iterable[str] = ()) -> None:
+        """
+        Invalide les adresses d'un client et les adresses données.
+
+        Args:
+            client_id: Client modifié (toutes ses adresses en cache).
+            emails: Adresses ajoutées (ex: résultat « aucun client » en cache).
+        """
+        keys = {self.normalize(email) for email in emails if email}
+        with self._lock:
+            if client_id is not None:
+                keys.update(
+                    key for key, (_, client) in self._clients.items()
+                    if client and str(client.get("id")) == str(client_id)
+                )
+            for key in keys:
+                self._clients.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clients.clear()
+            self._courtiers_by_email = {}
+            self._courtiers_by_id = {}
+            self._courtiers_expires_at = 0.0
+
+
+@lru_cache()
+def get_identity_cache(ttl_seconds: int) -> IdentityCache:
+    """Retourne le cache partagé du processus pour une durée de vie donnée."""
+    return IdentityCache(ttl_seconds)
@@ -13,7 +13,7 @@ import hashlib
 import tempfile
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import structlog
 
@@ -27,13 +27,83 @@ from app.models.email import EmailData
 
 # Utils DB
 from app.utils.db import (
+    check_duplicate_piece,
+    create_pieces_dossier_bulk,
     get_courtier_by_id,
+    get_pieces_by_client,
+    get_types_pieces_by_type_pret,
 )
 from uuid import UUID
 
 logger = structlog.get_logger()
 
 
+def _create_pieces_manquantes(client: dict, types_pieces: List[dict]) -> List[dict]:
+    """
+    Crée les pièces 'manquante' d'un dossier en une seule insertion groupée.
+
+    Les types déjà présents dans le dossier sont ignorés (job relancé,
+    pièce déjà reçue).
+
+    Args:
+        client: Client (dict avec id)
+        types_pieces: Types de pièces attendus (types_pieces)
+
+    Returns:
+        Types de pièces effectivement ajoutés
+    """
+    existants = {p.get('type_piece_id') for p in get_pieces_by_client(UUID(client['id']))}
+    nouveaux = []
+    for type_piece in types_pieces:
+        if type_piece['id'] not in existants:
+            existants.add(type_piece['id'])
+            nouveaux.append(type_piece)
+
+    create_pieces_dossier_bulk([
+        {
+            'client_id': client['id'],
+            'type_piece_id': type_piece['id'],
+            'statut': 'manquante'
+        }
+        for type_piece in nouveaux
+    ])
+
+    logger.info(
+        "Pièces attendues créées",
+        client_id=client['id'],
+        nb_pieces=len(nouveaux)
+    )
+    return nouveaux
+
+
+def _match_catalogue(client: dict, pieces: List[dict]) -> Tuple[List[dict], List[str]]:
+    """
+    Associe les pièces demandées au catalogue du type de prêt du client.
+
+    Args:
+        client: Client (dict avec type_pret)
+        pieces: Pièces structurées par Mistral (dict avec nom_piece)
+
+    Returns:
+        Types de pièces du catalogue trouvés, et noms des pièces hors
+        catalogue (non ajoutées)
+    """
+    catalogue = {
+        t['nom_piece'].strip().lower(): t
+        for t in get_types_pieces_by_type_pret(client.get('type_pret'))
+    }
+    types_pieces = []
+    hors_catalogue = []
+    for piece in pieces:
+        nom_piece = piece.get('nom_piece') or ''
+        type_piece = catalogue.get(nom_piece.strip().lower())
+        if type_piece:
+            types_pieces.append(type_piece)
+        else:
+            hors_catalogue.append(nom_piece)
+    return types_pieces, hors_catalogue
+
+
 def process_nouveau_dossier(
     courtier_id: str,
     email_data: dict,
@@ -130,13 +200,11 @@ def process_nouveau_dossier(
                 pieces=[p.get('nom_piece') for p in pieces_structurees]
             )
 
-        # 6. TODO Session 7+: Créer pieces_dossier en DB
-        # for piece in pieces_structurees:
-        #     db.create_piece_dossier({
-        #         'client_id': client['id'],
-        #         'type_piece_id': piece['type_piece_id'],
-        #         'statut': 'manquante'
-        #     })
+        # 6. Créer les pièces attendues du dossier (une seule insertion groupée)
+        pieces_creees = _create_pieces_manquantes(
+            client,
+            [t for t in get_types_pieces_by_type_pret(client.get('type_pret')) if t.get('obligatoire')]
+        )
 
         # 7. TODO Session 7: Notifier courtier
         # notif.send_email(
@@ -151,6 +219,7 @@ def process_nouveau_dossier(
             "client_nom": f"{client.get('prenom')} {client.get('nom')}",
             "client_folder_id": client.get('dossier_drive_id'),
             "type_pret": client.get('type_pret'),
+            "nb_pieces_attendues": len(pieces_creees),
             "pieces_mentionnees": [p.get('nom_piece') for p in pieces_structurees] if pieces_structurees else []
         }
 
@@ -280,27 +349,34 @@ def process_envoi_documents(
             for i, attachment in enumerate(attachments):
                 try:
                     filename = attachment.get('filename', f'attachment_{i}')
-                    # Pydantic serialise les bytes en base64 avec mode='json'
+                    stored_path = attachment.get('path')
+                    # Ancien format : Pydantic serialise les bytes en base64 avec mode='json'
                     # Le champ garde son nom 'content' mais est encodé en base64
                     content_base64 = attachment.get('content')
 
-                    if not content_base64:
+                    # a. Télécharger
+                    if stored_path and Path(stored_path).is_file():
+                        # Fichier déjà présent dans le store local (pas de base64)
+                        attachment_path = Path(stored_path)
+                    elif content_base64:
+                        attachment_path = tmp_path / filename
+                        with open(attachment_path, 'wb') as f:
+                            f.write(base64.b64decode(content_base64))
+                    else:
                         logger.warning(f"Pièce jointe sans contenu: {filename}")
                         continue
 
-                    # a. Télécharger
-                    attachment_path = tmp_path / filename
-                    with open(attachment_path, 'wb') as f:
-                        f.write(base64.b64decode(content_base64))
-
-                    # b. Hash (doublon ?)
-                    file_hash = calculate_file_hash(attachment_path)
+                    # b. Hash (doublon ?) : déjà calculé par le store
+                    file_hash = attachment.get('content_hash') or calculate_file_hash(attachment_path)
 
-                    # TODO Session 7: Vérifier doublon en DB
-                    # existing = db.get_piece_by_hash(client.id, file_hash)
-                    # if existing:
-                    #     logger.info("Document doublon détecté", filename=filename)
-                    #     continue
+                    existing = check_duplicate_piece(file_hash, client.get('id'))
+                    if existing:
+                        logger.info(
+                            "Document doublon détecté",
+                            filename=filename,
+                            piece_id=existing.get('id')
+                        )
+                        continue
 
                     # c. TODO Session 4: Classifier avec Mistral Vision
                     # doc_classification = await mistral.classify_document(...)
@@ -473,6 +549,7 @@ def process_modifier_liste(
 
         # 2. Structurer pièces à ajouter
         pieces_ajoutees = []
+        pieces_non_ajoutees = []
         if pieces_a_ajouter:
             pieces_structurees = mistral.extract_pieces_from_text_sync(
                 ', '.join(pieces_a_ajouter)
@@ -483,23 +560,19 @@ def process_modifier_liste(
                 nb_pieces=len(pieces_structurees)
             )
 
-            # TODO Session 7: Créer en DB
-            # for piece in pieces_structurees:
-            #     existing = db.get_type_piece_by_name(piece['nom_piece'])
-            #     if not existing:
-            #         type_piece = db.create_type_piece_custom(piece)
-            #     else:
-            #         type_piece = existing
-            #     
-            #     db.create_piece_dossier({
-            #         'client_id': client.id,
-            #         'type_piece_id': type_piece['id'],
-            #         'statut': 'manquante'
-            #     })
-            #     
-            #     pieces_ajoutees.append(piece['nom_piece'])
-
-            pieces_ajoutees = [p['nom_piece'] for p in pieces_structurees]
+            # Pièces du catalogue (type de prêt du client), une seule insertion groupée ;
+            # les pièces hors catalogue sont renvoyées à l'appelant (non_ajoutees)
+            types_a_ajouter, pieces_non_ajoutees = _match_catalogue(client, pieces_structurees)
+            if pieces_non_ajoutees:
+                logger.warning(
+                    "Pièces hors catalogue non ajoutées",
+                    client_id=client.get('id'),
+                    pieces=pieces_non_ajoutees
+                )
+
+            pieces_ajoutees = [
+                t['nom_piece'] for t in _create_pieces_manquantes(client, types_a_ajouter)
+            ]
 
         # 3. Retirer pièces
         pieces_retirees = []
@@ -523,6 +596,7 @@ def process_modifier_liste(
             client_id=client.get('id'),
             client_nom=f"{client.get('prenom')} {client.get('nom')}",
             pieces_ajoutees=pieces_ajoutees,
+            pieces_non_ajoutees=pieces_non_ajoutees,
             pieces_retirees=pieces_retirees
         )
 
@@ -531,8 +605,10 @@ def process_modifier_liste(
             "client_id": client.get('id'),
             "client_nom": f"{client.get('prenom')} {client.get('nom')}",
             "pieces_ajoutees": len(pieces_ajoutees),
+            "pieces_non_ajoutees": len(pieces_non_ajoutees),
             "pieces_retirees": len(pieces_retirees),
             "ajoutees": pieces_ajoutees,
+            "non_ajoutees": pieces_non_ajoutees,
             "retirees": pieces_retirees
         }
 
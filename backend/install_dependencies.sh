@@ -36,6 +36,7 @@ if [[ "$OSTYPE" == "linux-gnu"* ]]; then
         libreoffice-writer \
         libreoffice-calc \
         libreoffice-impress \
+        python3-uno \
         --no-install-recommends
 
     # Installation Ghostscript
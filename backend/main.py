@@ -6,6 +6,7 @@ Point d'entrée de l'application FastAPI.
 Déployé sur Railway avec structure monorepo (backend/ + frontend/).
 """
 
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from datetime import datetime
@@ -58,35 +59,18 @@ async def lifespan(app: FastAPI):
     # Initialisation du Scheduler pour les tâches de fond
     from apscheduler.schedulers.asyncio import AsyncIOScheduler
     from app.cron.check_emails import check_new_emails
-    from app.utils.db import get_config
+    from app.services.config_store import DEFAULT_POLLING_INTERVAL, get_config_store
 
     scheduler = AsyncIOScheduler()
-    
-    # Récupérer l'intervalle de polling depuis la config (défaut: 120 secondes)
+    config_store = get_config_store()
+
+    # Intervalle de polling depuis la table config (défaut: 120 secondes, min 60)
     try:
-        polling_interval = get_config("email_polling_interval")
-        
-        interval_seconds = 120 # Défaut
-        
-        if polling_interval:
-            # Si c'est un dict ({"minutes": 2}), on extrait la valeur
-            if isinstance(polling_interval, dict):
-                if "seconds" in polling_interval:
-                    interval_seconds = int(polling_interval["seconds"])
-                elif "minutes" in polling_interval:
-                    interval_seconds = int(polling_interval["minutes"]) * 60
-            else:
-                # Si c'est une valeur directe (str ou int), on suppose des SECONDES
-                # comme indiqué dans la description de la config ("300" = 5 min)
-                interval_seconds = int(polling_interval)
-            
-        # Minimum 60 secondes pour éviter le spam
-        interval_seconds = max(60, interval_seconds)
+        interval_seconds = config_store.email_polling_interval()
         logger.info(f"Intervalle de polling configuré: {interval_seconds} secondes")
-        
     except Exception as e:
+        interval_seconds = DEFAULT_POLLING_INTERVAL
         logger.warning(f"Erreur lecture config polling, utilisation défaut 120s: {e}")
-        interval_seconds = 120
 
     # Tâche 1: Vérification des emails
     scheduler.add_job(
@@ -101,14 +85,62 @@ async def lifespan(app: FastAPI):
     scheduler.start()
     logger.info("Scheduler démarré")
 
+    # Modification de email_polling_interval : replanification sans redémarrage
+    loop = asyncio.get_running_loop()
+
+    def reschedule_polling(interval: int) -> None:
+        scheduler.reschedule_job('check_emails_job', trigger='interval', seconds=interval)
+        logger.info(f"Tâche check_emails replanifiée (toutes les {interval} secondes)")
+
+    def on_config_change(cle: str, valeur: Any) -> None:
+        if cle == "email_polling_interval" and scheduler.running:
+            # Appelé depuis un thread quelconque : le scheduler vit dans la boucle
+            loop.call_soon_threadsafe(reschedule_polling, config_store.email_polling_interval())
+
+    config_store.subscribe(on_config_change)
+    config_store.start()
+
+    # Écoute push IMAP IDLE (le polling ci-dessus sert de filet de sécurité)
+    email_listener = None
+    if settings.IMAP_IDLE_ENABLED:
+        from app.cron.email_listener import EmailIdleListener
+
+        email_listener = EmailIdleListener(asyncio.get_running_loop())
+        email_listener.start()
+
+    # Instances LibreOffice chaudes pour les conversions Office
+    from app.services.office_server import OfficeServerPool
+
+    office_servers = OfficeServerPool()
+    office_servers.start()
+
+    # Index local Drive tenu à jour par le flux de modifications
+    from app.services.drive_index import DriveChangesWatcher
+
+    drive_watcher = DriveChangesWatcher()
+    drive_watcher.start()
+
     yield
 
     # Shutdown
     logger.info("Arrêt de l'application...")
+    if email_listener:
+        email_listener.stop()
+    drive_watcher.stop()
+    config_store.stop()
     if scheduler.running:
         scheduler.shutdown()
         logger.info("Scheduler arrêté")
 
+    from app.services.document_pool import shutdown_document_executor
+    shutdown_document_executor()
+    office_servers.stop()
+
+    from app.utils.db import flush_activity_log
+    from app.utils.db_async import close_async_db
+    flush_activity_log()
+    await close_async_db()
+
 
 # Création de l'application FastAPI
 settings = get_settings()
@@ -129,6 +161,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination par curseur de GET /api/dossiers
+    expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -326,3 +326,293 @@ CREATE TRIGGER update_dossier_context_updated_at BEFORE UPDATE ON dossier_contex
 -- ============================================================================
 -- FIN MIGRATION SESSION 9
 -- ============================================================================
+
+-- ============================================================================
+-- MIGRATION : Cache documentaire par hash
+-- ============================================================================
+-- À exécuter dans l'éditeur SQL Supabase
+-- ============================================================================
+
+-- 1. Index des résultats de traitement par hash SHA256 du fichier reçu
+-- Évite de re-classifier / re-convertir / re-uploader un fichier déjà vu
+CREATE TABLE IF NOT EXISTS documents_cache (
+    fichier_hash TEXT PRIMARY KEY,
+    nature TEXT,                -- Classification Mistral (ex: 'BULLETIN_SALAIRE')
+    pdf_size_bytes BIGINT,      -- Taille du PDF converti (cache disque local)
+    drive_file_id TEXT,         -- Dernier fichier Drive contenant ce document
+    metadata JSONB DEFAULT '{}',
+    created_at TIMESTAMPTZ DEFAULT now(),
+    updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+COMMENT ON TABLE documents_cache IS 'Résultats de traitement des documents indexés par hash SHA256';
+COMMENT ON COLUMN documents_cache.nature IS 'Nature du document identifiée par Mistral';
+COMMENT ON COLUMN documents_cache.drive_file_id IS 'ID Google Drive du fichier Maître contenant ce document';
+
+CREATE TRIGGER update_documents_cache_updated_at BEFORE UPDATE ON documents_cache
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+ALTER TABLE documents_cache ENABLE ROW LEVEL SECURITY;
+
+-- 2. Recherche des doublons (check_duplicate_piece)
+CREATE INDEX IF NOT EXISTS idx_pieces_client_hash ON pieces_dossier(client_id, fichier_hash);
+CREATE INDEX IF NOT EXISTS idx_pieces_metadata ON pieces_dossier USING GIN (metadata jsonb_path_ops);
+
+-- ============================================================================
+-- FIN MIGRATION CACHE DOCUMENTAIRE
+-- ============================================================================
+
+-- ============================================================================
+-- MIGRATION : Statistiques agrégées des dossiers
+-- ============================================================================
+-- À exécuter dans l'éditeur SQL Supabase
+-- ============================================================================
+
+-- Liste des dossiers avec leurs compteurs de pièces en une seule requête
+-- (remplace un appel get_pieces_dossier par client dans GET /api/dossiers) :
+-- les compteurs sont stockés sur clients (migration suivante), ces index
+-- servent à leur recalcul et au tri de la liste.
+
+-- Comptage par client et statut (parcours d'index seul)
+CREATE INDEX IF NOT EXISTS idx_pieces_client_statut ON pieces_dossier(client_id, statut);
+
+-- Liste des dossiers d'un courtier triée par date de création (départage par id)
+CREATE INDEX IF NOT EXISTS idx_clients_courtier_created ON clients(courtier_id, created_at DESC, id DESC);
+
+-- ============================================================================
+-- FIN MIGRATION STATISTIQUES DOSSIERS
+-- ============================================================================
+
+-- ============================================================================
+-- MIGRATION : Compteurs de complétion des dossiers
+-- ============================================================================
+-- À exécuter dans l'éditeur SQL Supabase
+-- ============================================================================
+
+-- 1. Compteurs stockés sur le client (lecture O(1) par dossier)
+ALTER TABLE clients ADD COLUMN IF NOT EXISTS nb_pieces_total INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE clients ADD COLUMN IF NOT EXISTS nb_pieces_recues INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE clients ADD COLUMN IF NOT EXISTS nb_pieces_manquantes INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE clients ADD COLUMN IF NOT EXISTS nb_pieces_non_conformes INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE clients ADD COLUMN IF NOT EXISTS pourcentage_completion NUMERIC(4,1) NOT NULL DEFAULT 0;
+
+COMMENT ON COLUMN clients.nb_pieces_non_conformes IS 'Pièces non conformes ou non reconnues (maintenu par trigger)';
+COMMENT ON COLUMN clients.pourcentage_completion IS 'Pièces reçues / total en % (maintenu par trigger)';
+
+-- 2. Recalcul des compteurs d'un client (via idx_pieces_client_statut)
+CREATE OR REPLACE FUNCTION refresh_client_piece_counters(p_client_id UUID)
+RETURNS VOID AS $$
+BEGIN
+    UPDATE clients c SET
+        nb_pieces_total = s.total,
+        nb_pieces_recues = s.recues,
+        nb_pieces_manquantes = s.manquantes,
+        nb_pieces_non_conformes = s.non_conformes,
+        pourcentage_completion = CASE
+            WHEN s.total > 0 THEN ROUND(s.recues * 100.0 / s.total, 1)
+            ELSE 0
+        END
+    FROM (
+        SELECT
+            COUNT(*) AS total,
+            COUNT(*) FILTER (WHERE statut = 'recue') AS recues,
+            COUNT(*) FILTER (WHERE statut = 'manquante') AS manquantes,
+            COUNT(*) FILTER (WHERE statut IN ('non_conforme', 'non_reconnu')) AS non_conformes
+        FROM pieces_dossier
+        WHERE client_id = p_client_id
+    ) s
+    WHERE c.id = p_client_id
+      -- Compteurs inchangés : pas d'UPDATE (updated_at et le tri -updated_at restent stables)
+      AND (c.nb_pieces_total, c.nb_pieces_recues, c.nb_pieces_manquantes, c.nb_pieces_non_conformes)
+          IS DISTINCT FROM (s.total, s.recues, s.manquantes, s.non_conformes);
+END;
+$$ LANGUAGE plpgsql;
+
+-- 3. Triggers sur les écritures de pièces (create_piece_dossier, insertions groupées...)
+--    Niveau instruction : une insertion de N pièces recalcule chaque client
+--    concerné une seule fois. Un trigger par opération (les tables de
+--    transition sont incompatibles avec UPDATE OF).
+CREATE OR REPLACE FUNCTION pieces_dossier_counters_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_client_piece_counters(client_id)
+        FROM (SELECT DISTINCT client_id FROM new_pieces) p;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM refresh_client_piece_counters(client_id)
+        FROM (SELECT DISTINCT client_id FROM old_pieces) p;
+    ELSE
+        -- Seules les pièces dont le statut ou le client change comptent
+        PERFORM refresh_client_piece_counters(client_id)
+        FROM (
+            SELECT n.client_id FROM new_pieces n JOIN old_pieces o ON o.id = n.id
+            WHERE n.statut IS DISTINCT FROM o.statut OR n.client_id IS DISTINCT FROM o.client_id
+            UNION
+            SELECT o.client_id FROM new_pieces n JOIN old_pieces o ON o.id = n.id
+            WHERE n.statut IS DISTINCT FROM o.statut OR n.client_id IS DISTINCT FROM o.client_id
+        ) p;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS insert_client_piece_counters ON pieces_dossier;
+DROP TRIGGER IF EXISTS update_client_piece_counters ON pieces_dossier;
+DROP TRIGGER IF EXISTS delete_client_piece_counters ON pieces_dossier;
+
+CREATE TRIGGER insert_client_piece_counters
+    AFTER INSERT ON pieces_dossier
+    REFERENCING NEW TABLE AS new_pieces
+    FOR EACH STATEMENT EXECUTE FUNCTION pieces_dossier_counters_trigger();
+
+CREATE TRIGGER update_client_piece_counters
+    AFTER UPDATE ON pieces_dossier
+    REFERENCING OLD TABLE AS old_pieces NEW TABLE AS new_pieces
+    FOR EACH STATEMENT EXECUTE FUNCTION pieces_dossier_counters_trigger();
+
+CREATE TRIGGER delete_client_piece_counters
+    AFTER DELETE ON pieces_dossier
+    REFERENCING OLD TABLE AS old_pieces
+    FOR EACH STATEMENT EXECUTE FUNCTION pieces_dossier_counters_trigger();
+
+-- 4. Initialisation des compteurs existants (updated_at inchangé : ce n'est
+--    pas une modification du dossier, get_clients_modified_since l'ignore)
+ALTER TABLE clients DISABLE TRIGGER update_clients_updated_at;
+SELECT refresh_client_piece_counters(id) FROM clients;
+ALTER TABLE clients ENABLE TRIGGER update_clients_updated_at;
+
+-- ============================================================================
+-- FIN MIGRATION COMPTEURS DOSSIERS
+-- ============================================================================
+
+-- ============================================================================
+-- MIGRATION : Pagination et recherche des dossiers
+-- ============================================================================
+-- À exécuter dans l'éditeur SQL Supabase
+-- ============================================================================
+
+-- 1. Recherche texte (nom, prénom, email) : colonne normalisée + index trigramme
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE clients ADD COLUMN IF NOT EXISTS recherche TEXT
+    GENERATED ALWAYS AS (lower(nom || ' ' || prenom || ' ' || email_principal)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_clients_recherche ON clients USING GIN (recherche gin_trgm_ops);
+
+-- 2. Pagination par curseur : un index par clé de tri (départage par id)
+-- (created_at : idx_clients_courtier_created, migration statistiques dossiers)
+CREATE INDEX IF NOT EXISTS idx_clients_courtier_updated ON clients(courtier_id, updated_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_clients_courtier_nom ON clients(courtier_id, nom, id);
+CREATE INDEX IF NOT EXISTS idx_clients_courtier_completion ON clients(courtier_id, pourcentage_completion, id);
+
+-- Vue admin (tous courtiers)
+CREATE INDEX IF NOT EXISTS idx_clients_created_id ON clients(created_at DESC, id DESC);
+
+-- ============================================================================
+-- FIN MIGRATION PAGINATION DOSSIERS
+-- ============================================================================
+
+-- ============================================================================
+-- MIGRATION : Index des emails clients
+-- ============================================================================
+-- À exécuter dans l'éditeur SQL Supabase
+-- ============================================================================
+
+-- 1. Emails principal + secondaires normalisés (minuscules, sans espaces)
+-- Identification d'un client en une requête : email IN (...) pour un courtier
+CREATE TABLE IF NOT EXISTS client_emails (
+    courtier_id UUID NOT NULL REFERENCES courtiers(id) ON DELETE CASCADE,
+    email TEXT NOT NULL,
+    client_id UUID NOT NULL REFERENCES clients(id) ON DELETE CASCADE,
+    est_principal BOOLEAN NOT NULL DEFAULT false,
+    PRIMARY KEY (courtier_id, email)
+);
+
+CREATE INDEX IF NOT EXISTS idx_client_emails_client ON client_emails(client_id);
+
+COMMENT ON TABLE client_emails IS 'Emails normalisés des clients (principal + secondaires), maintenus par trigger';
+
+ALTER TABLE client_emails ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY courtier_client_emails_policy ON client_emails
+    FOR ALL
+    USING (
+        courtier_id = (current_setting('app.current_courtier_id', true)::uuid)
+        OR current_setting('app.is_admin', true)::boolean = true
+    );
+
+-- 2. Synchronisation depuis clients (création, changement d'emails ou de courtier, suppression)
+CREATE OR REPLACE FUNCTION sync_client_emails()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM client_emails WHERE client_id = OLD.id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO client_emails (courtier_id, email, client_id, est_principal)
+        SELECT NEW.courtier_id, e.email, NEW.id, e.est_principal
+        FROM (
+            SELECT lower(trim(NEW.email_principal)) AS email, true AS est_principal, 0 AS rang
+            UNION ALL
+            SELECT lower(trim(s)), false, 1
+            FROM unnest(COALESCE(NEW.emails_secondaires, '{}')) AS s
+        ) e
+        WHERE e.email <> ''
+        ORDER BY e.rang
+        -- Adresse déjà rattachée à un autre client du courtier : le premier garde l'adresse
+        ON CONFLICT (courtier_id, email) DO NOTHING;
+    END IF;
+
+    -- Adresses libérées (retirées du client, changement de courtier, suppression) :
+    -- rattachées à un autre client du courtier qui les liste encore, dans l'ordre
+    -- de l'initialisation (email principal d'abord, puis le plus ancien client)
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO client_emails (courtier_id, email, client_id, est_principal)
+        SELECT DISTINCT ON (e.email) c.courtier_id, e.email, c.id, e.est_principal
+        FROM (
+            SELECT lower(trim(OLD.email_principal)) AS email
+            UNION
+            SELECT lower(trim(s))
+            FROM unnest(COALESCE(OLD.emails_secondaires, '{}')) AS s
+        ) libre
+        JOIN clients c ON c.courtier_id = OLD.courtier_id AND c.id <> OLD.id
+        CROSS JOIN LATERAL (
+            SELECT lower(trim(c.email_principal)) AS email, true AS est_principal
+            UNION ALL
+            SELECT lower(trim(s)), false
+            FROM unnest(COALESCE(c.emails_secondaires, '{}')) AS s
+        ) e
+        WHERE libre.email <> '' AND e.email = libre.email
+        ORDER BY e.email, e.est_principal DESC, c.created_at
+        -- Adresse toujours détenue (par le client lui-même ou un autre) : inchangée
+        ON CONFLICT (courtier_id, email) DO NOTHING;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS sync_client_emails_trigger ON clients;
+CREATE TRIGGER sync_client_emails_trigger
+    AFTER INSERT OR UPDATE OF email_principal, emails_secondaires, courtier_id OR DELETE ON clients
+    FOR EACH ROW EXECUTE FUNCTION sync_client_emails();
+
+-- 3. Initialisation depuis les clients existants (plus anciens en premier)
+INSERT INTO client_emails (courtier_id, email, client_id, est_principal)
+SELECT c.courtier_id, lower(trim(c.email_principal)), c.id, true
+FROM clients c
+WHERE trim(c.email_principal) <> ''
+ORDER BY c.created_at
+ON CONFLICT (courtier_id, email) DO NOTHING;
+
+INSERT INTO client_emails (courtier_id, email, client_id, est_principal)
+SELECT c.courtier_id, lower(trim(s)), c.id, false
+FROM clients c, unnest(COALESCE(c.emails_secondaires, '{}')) AS s
+WHERE trim(s) <> ''
+ORDER BY c.created_at
+ON CONFLICT (courtier_id, email) DO NOTHING;
+
+-- ============================================================================
+-- FIN MIGRATION EMAILS CLIENTS
+-- ============================================================================
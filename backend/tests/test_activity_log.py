@@ -0,0 +1,88 @@
+"""
+Tests unitaires pour le tampon du journal d'activité.
+"""
+
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock, Mock, patch
+
+from app.utils import db, db_async
+from app.utils.activity_log import ActivityLogBuffer
+
+
+def test_flush_when_batch_full():
+    """Test qu'un lot complet est inséré en un seul appel."""
+    flush_func = Mock()
+    buffer = ActivityLogBuffer(flush_func, batch_size=3, flush_seconds=60)
+
+    buffer.add({"action": "a"})
+    buffer.add({"action": "b"})
+    flush_func.assert_not_called()
+
+    buffer.add({"action": "c"})
+    flush_func.assert_called_once_with([{"action": "a"}, {"action": "b"}, {"action": "c"}])
+    assert buffer.pending() == 0
+
+
+def test_flush_after_delay():
+    """Test de l'envoi des lignes en attente après le délai max."""
+    flush_func = Mock()
+    buffer = ActivityLogBuffer(flush_func, batch_size=50, flush_seconds=0.05)
+
+    buffer.add({"action": "a"})
+    deadline = time.monotonic() + 2
+    while not flush_func.called and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    flush_func.assert_called_once_with([{"action": "a"}])
+
+
+def test_failed_flush_keeps_rows():
+    """Test que les lignes sont conservées (dans l'ordre) si l'insertion échoue."""
+    flush_func = Mock(side_effect=[Exception("Supabase indisponible"), None])
+    buffer = ActivityLogBuffer(flush_func, batch_size=50, flush_seconds=60)
+
+    buffer.add({"action": "a"})
+    assert buffer.flush() == 0
+    buffer.add({"action": "b"})
+
+    assert buffer.flush() == 2
+    assert flush_func.call_args[0][0] == [{"action": "a"}, {"action": "b"}]
+
+
+def test_logs_and_pieces_single_insert():
+    """Test que create_logs_bulk et create_pieces_dossier_bulk font une seule insertion multi-lignes."""
+    client = MagicMock()
+    rows = [{"action": "a"}, {"action": "b"}, {"action": "c"}]
+    pieces = [{"client_id": "c1", "type_piece_id": f"t{i}", "statut": "manquante"} for i in range(3)]
+
+    with patch.object(db, "get_db", return_value=client):
+        db.create_logs_bulk(rows)
+        db.create_pieces_dossier_bulk(pieces)
+        db.create_pieces_dossier_bulk([])
+
+    assert [c.args for c in client.table.call_args_list] == [("logs_activite",), ("pieces_dossier",)]
+    logs_insert, pieces_insert = client.table.return_value.insert.call_args_list
+    assert logs_insert.args == (rows,)
+    assert logs_insert.kwargs["returning"] == db.ReturnMethod.minimal
+    assert pieces_insert.args == (pieces,)
+    assert client.table.return_value.insert.return_value.execute.call_count == 2
+
+
+def test_async_full_batch_flushed_off_loop():
+    """Test qu'un lot plein tamponné depuis asyncio est envoyé hors de la boucle."""
+    threads = []
+    buffer = ActivityLogBuffer(lambda rows: threads.append(threading.current_thread()), batch_size=2)
+
+    async def log_twice():
+        with patch.object(db_async, "_activity_log_buffer", return_value=buffer):
+            await db_async.log_activity("a", buffered=True)
+            await db_async.log_activity("b", buffered=True)
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(log_twice())
+
+    assert len(threads) == 1
+    assert threads[0] is not loop_thread
+    assert buffer.pending() == 0
@@ -0,0 +1,68 @@
+"""
+Tests unitaires pour le store local des pièces jointes.
+"""
+
+import base64
+import hashlib
+import os
+
+from app.services.attachment_store import AttachmentStore
+
+
+def test_write_bytes_content_addressed(tmp_path):
+    """Test du stockage adressé par contenu et de la déduplication."""
+    store = AttachmentStore(str(tmp_path))
+    content = b"bulletin de salaire"
+
+    content_hash, path, size = store.write_bytes(content)
+    same_hash, same_path, _ = store.write_bytes(content)
+
+    assert content_hash == hashlib.sha256(content).hexdigest()
+    assert path == store.path_for(content_hash)
+    assert same_path == path
+    assert size == len(content)
+    assert store.read_bytes(content_hash) == content
+    # Aucun fichier temporaire résiduel
+    assert not list(tmp_path.glob(".spool_*"))
+
+
+def test_write_encoded_base64_streaming(tmp_path):
+    """Test du décodage base64 MIME ligne à ligne vers le store."""
+    store = AttachmentStore(str(tmp_path))
+    content = os.urandom(200_000)
+
+    content_hash, path, size = store.write_encoded(base64.encodebytes(content), "base64")
+
+    assert size == len(content)
+    assert path.read_bytes() == content
+    assert content_hash == hashlib.sha256(content).hexdigest()
+
+
+def test_purge_expired_files(tmp_path):
+    """Test de la purge des fichiers au-delà de la rétention."""
+    store = AttachmentStore(str(tmp_path))
+    _, old_path, _ = store.write_bytes(b"ancien")
+    _, new_path, _ = store.write_bytes(b"recent")
+    os.utime(old_path, (0, 0))
+
+    removed = store.purge(max_age_hours=1)
+
+    assert removed == 1
+    assert not old_path.exists()
+    assert new_path.exists()
+
+
+def test_purge_stale_spool_files(tmp_path):
+    """Test de la purge des fichiers temporaires abandonnés (écriture interrompue)."""
+    store = AttachmentStore(str(tmp_path))
+    stale = tmp_path / ".spool_abandonne"
+    stale.write_bytes(b"partiel")
+    os.utime(stale, (0, 0))
+    in_progress = tmp_path / ".spool_en_cours"
+    in_progress.write_bytes(b"partiel")
+
+    removed = store.purge(max_age_hours=1)
+
+    assert removed == 1
+    assert not stale.exists()
+    assert in_progress.exists()
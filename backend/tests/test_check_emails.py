@@ -0,0 +1,155 @@
+"""
+Tests unitaires pour la vérification des emails (avancement du curseur UID).
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.cron import check_emails
+from app.cron.check_emails import _UidLedger, check_new_emails
+from app.models.email import EmailData
+
+
+def _email(uid: int) -> EmailData:
+    return EmailData(
+        message_id=f"<{uid}@example.com>",
+        subject=f"Email {uid}",
+        from_address="client@example.com",
+        to_addresses=["leonie@example.com"],
+        date=datetime(2026, 1, 5, tzinfo=timezone.utc),
+        uid=uid,
+    )
+
+
+@pytest.fixture(autouse=True)
+def fresh_ledger():
+    with patch.object(check_emails, "_ledger", _UidLedger()):
+        yield
+
+
+@pytest.fixture
+def imap_fetchers():
+    """Fetcher de récupération (1er EmailFetcher créé) et connexion de traitement (2e)."""
+    fetcher, session = MagicMock(), MagicMock()
+    session.imap.select.return_value = ("OK", [b"1"])
+    with patch.object(check_emails, "EmailFetcher", side_effect=[fetcher, session]), \
+         patch("app.services.config_store.get_config_store") as mock_store, \
+         patch.object(check_emails, "get_attachment_store"), \
+         patch("app.config.get_settings") as mock_settings:
+        mock_store.return_value.maintenance_mode.return_value = False
+        mock_settings.return_value.IMAP_MAX_ATTEMPTS = 3
+        yield fetcher, session
+
+
+def test_ledger_cursor_target():
+    """Test que le curseur s'arrête avant le plus petit UID en cours ou en échec."""
+    ledger = _UidLedger()
+    ledger.claim(42, [11, 12, 13])
+    assert ledger.cursor_target(13) == 10
+
+    ledger.done(11)
+    ledger.fail(12, max_attempts=3)
+    ledger.done(13)
+    assert ledger.cursor_target(20) == 11
+
+    # Email en échec récupéré à nouveau puis traité
+    ledger.claim(42, [12])
+    ledger.done(12)
+    assert ledger.cursor_target(20) == 20
+
+
+def test_cursor_not_advanced_past_failed_email(imap_fetchers):
+    """Test qu'un email en échec reste au-delà du curseur et non lu."""
+    fetcher, session = imap_fetchers
+    fetcher.fetch_new_emails.return_value = [_email(11), _email(12), _email(13)]
+    fetcher.last_fetch = {"uidvalidity": 42, "uids": [11, 12, 13], "ceiling": 13}
+
+    agent = MagicMock()
+    agent.process_incoming_email = AsyncMock(side_effect=[True, Exception("boom"), True])
+    with patch("app.services.email_agent.EmailAgent", return_value=agent):
+        stats = asyncio.run(check_new_emails())
+
+    assert stats["processed_success"] == 2
+    assert stats["processed_error"] == 1
+    # Connexion de récupération fermée avant le traitement
+    fetcher.disconnect.assert_called_once()
+    assert [c.args[0] for c in session.mark_uid_as_read.call_args_list] == [11, 13]
+    assert [c.args for c in fetcher.commit_uid_cursor.call_args_list] == [
+        (42, 11), (42, 11), (42, 11)
+    ]
+    session.disconnect.assert_called_once()
+
+
+def test_unfetched_uids_block_cursor(imap_fetchers):
+    """Test qu'un UID trouvé mais non récupéré (lot en erreur) bloque le curseur."""
+    fetcher, session = imap_fetchers
+    fetcher.fetch_new_emails.return_value = [_email(11)]
+    fetcher.last_fetch = {"uidvalidity": 42, "uids": [11, 12], "ceiling": 20}
+
+    agent = MagicMock()
+    agent.process_incoming_email = AsyncMock(return_value=True)
+    with patch("app.services.email_agent.EmailAgent", return_value=agent):
+        asyncio.run(check_new_emails())
+
+    fetcher.commit_uid_cursor.assert_called_with(42, 11)
+    assert check_emails._ledger.failed == {12}
+
+
+def test_ledger_gives_up_after_max_attempts():
+    """Test qu'un UID en échec répété est abandonné et ne bloque plus le curseur."""
+    ledger = _UidLedger()
+    for _ in range(2):
+        ledger.claim(42, [12])
+        assert ledger.fail(12, max_attempts=3) is False
+    assert ledger.cursor_target(20) == 11
+
+    ledger.claim(42, [12])
+    assert ledger.fail(12, max_attempts=3) is True
+    assert ledger.cursor_target(20) == 20
+    assert ledger.attempts == {}
+
+
+def test_failing_email_marked_read_after_max_attempts(imap_fetchers):
+    """Test qu'un email toujours en échec est marqué comme lu à la dernière tentative."""
+    fetcher, session = imap_fetchers
+    fetcher.fetch_new_emails.return_value = [_email(12)]
+    fetcher.last_fetch = {"uidvalidity": 42, "uids": [12], "ceiling": 12}
+    check_emails._ledger.claim(42, [12])
+    check_emails._ledger.fail(12, max_attempts=3)
+    check_emails._ledger.claim(42, [12])
+    check_emails._ledger.fail(12, max_attempts=3)
+
+    agent = MagicMock()
+    agent.process_incoming_email = AsyncMock(side_effect=Exception("boom"))
+    with patch("app.services.email_agent.EmailAgent", return_value=agent):
+        stats = asyncio.run(check_new_emails())
+
+    assert stats["processed_error"] == 1
+    session.mark_uid_as_read.assert_called_once_with(12)
+    fetcher.commit_uid_cursor.assert_called_with(42, 12)
+    assert check_emails._ledger.failed == set()
+
+
+def test_idle_fetcher_reused_for_processing():
+    """Test que le fetcher du listener IDLE sert aussi au traitement, sans nouvelle connexion."""
+    fetcher = MagicMock()
+    fetcher.fetch_new_emails.return_value = [_email(11)]
+    fetcher.last_fetch = {"uidvalidity": 42, "uids": [11], "ceiling": 11}
+
+    agent = MagicMock()
+    agent.process_incoming_email = AsyncMock(return_value=True)
+    with patch.object(check_emails, "EmailFetcher") as mock_fetcher_cls, \
+         patch("app.services.config_store.get_config_store") as mock_store, \
+         patch.object(check_emails, "get_attachment_store"), \
+         patch("app.config.get_settings"), \
+         patch("app.services.email_agent.EmailAgent", return_value=agent):
+        mock_store.return_value.maintenance_mode.return_value = False
+        asyncio.run(check_new_emails(fetcher=fetcher))
+
+    mock_fetcher_cls.assert_not_called()
+    fetcher.mark_uid_as_read.assert_called_once_with(11)
+    fetcher.connect.assert_not_called()
+    fetcher.disconnect.assert_not_called()
@@ -0,0 +1,114 @@
+"""
+Tests unitaires pour le cache de la table config.
+"""
+
+import json
+from unittest.mock import Mock, patch
+
+import pytest
+
+from app.services.config_store import ConfigStore
+
+
+@patch("app.services.config_store.db")
+def test_reads_are_cached(mock_db):
+    """Test qu'une seule requête charge toute la table pour plusieurs lectures."""
+    mock_db.get_all_config.return_value = {
+        "maintenance_mode": True,
+        "email_polling_interval": {"minutes": 5},
+    }
+    store = ConfigStore(ttl_seconds=60)
+
+    assert store.maintenance_mode() is True
+    assert store.email_polling_interval() == 300
+    assert store.get("inconnue", "defaut") == "defaut"
+    mock_db.get_all_config.assert_called_once()
+
+    store.invalidate()
+    store.get("maintenance_mode")
+    assert mock_db.get_all_config.call_count == 2
+
+
+@patch("app.services.config_store.db")
+def test_typed_accessors(mock_db):
+    """Test des accesseurs typés et des bornes de l'intervalle de polling."""
+    mock_db.get_all_config.return_value = {
+        "flag": "true",
+        "nombre": "42",
+        "invalide": "abc",
+        "email_polling_interval": "30",
+    }
+    store = ConfigStore(ttl_seconds=60)
+
+    assert store.get_bool("flag") is True
+    assert store.get_bool("absent", default=True) is True
+    assert store.get_int("nombre") == 42
+    assert store.get_int("invalide", default=7) == 7
+    assert store.get_dict("nombre") == {}
+    # Minimum 60 secondes
+    assert store.email_polling_interval() == 60
+
+
+@patch("app.services.config_store.db")
+def test_failed_first_load_raises(mock_db):
+    """Test qu'un premier chargement en échec n'est pas masqué par les valeurs par défaut."""
+    mock_db.get_all_config.side_effect = Exception("Supabase indisponible")
+    store = ConfigStore(ttl_seconds=60)
+
+    with pytest.raises(Exception):
+        store.get("imap_uid_cursor")
+    with pytest.raises(Exception):
+        store.maintenance_mode()
+
+    # Copie locale existante : conservée si un rechargement échoue
+    mock_db.get_all_config.side_effect = None
+    mock_db.get_all_config.return_value = {"imap_uid_cursor": {"uidvalidity": 42, "last_uid": 10}}
+    store.refresh()
+    mock_db.get_all_config.side_effect = Exception("Supabase indisponible")
+    store.invalidate()
+    assert store.get("imap_uid_cursor") == {"uidvalidity": 42, "last_uid": 10}
+
+
+@patch("app.services.config_store.db")
+def test_listeners_notified_on_change(mock_db):
+    """Test de la notification des abonnés (écriture locale et rechargement)."""
+    mock_db.get_all_config.return_value = {"email_polling_interval": "300"}
+    store = ConfigStore(ttl_seconds=60)
+    listener = Mock()
+    store.subscribe(listener)
+
+    store.get("email_polling_interval")
+    listener.assert_not_called()
+
+    store.set("email_polling_interval", "600")
+    mock_db.set_config.assert_called_once_with("email_polling_interval", "600", None)
+    listener.assert_called_once_with("email_polling_interval", "600")
+    assert store.get("email_polling_interval") == "600"
+
+    # Modification faite ailleurs, détectée au rechargement
+    listener.reset_mock()
+    mock_db.get_all_config.return_value = {"email_polling_interval": "900"}
+    store.refresh()
+    listener.assert_called_once_with("email_polling_interval", "900")
+
+
+@patch("app.services.config_store.get_redis")
+@patch("app.services.config_store.db")
+def test_redis_publish_and_receive(mock_db, mock_get_redis):
+    """Test de la publication Redis et du rechargement sur message d'un autre processus."""
+    mock_db.get_all_config.return_value = {"maintenance_mode": False}
+    store = ConfigStore(ttl_seconds=60, use_redis=True)
+    store.get("maintenance_mode")
+
+    store.set("maintenance_mode", True)
+    channel, message = mock_get_redis.return_value.publish.call_args[0]
+    assert channel == "leonie:config"
+
+    # Notre propre publication est ignorée
+    store._handle_message(message)
+    assert mock_db.get_all_config.call_count == 1
+
+    mock_db.get_all_config.return_value = {"maintenance_mode": False}
+    store._handle_message(json.dumps({"cle": "maintenance_mode", "origin": "autre"}))
+    assert mock_db.get_all_config.call_count == 2
+    assert store.maintenance_mode() is False
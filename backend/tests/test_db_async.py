@@ -0,0 +1,118 @@
+"""
+Tests unitaires pour l'accès Supabase asynchrone (transport httpx simulé).
+"""
+
+import asyncio
+import json
+from functools import partial
+from unittest.mock import MagicMock, patch
+from uuid import UUID
+
+import httpx
+import pytest
+
+from app.utils import db_async
+
+COURTIER_ID = UUID("11111111-1111-1111-1111-111111111111")
+CLIENT_ID = UUID("22222222-2222-2222-2222-222222222222")
+
+
+@pytest.fixture
+def requests_log():
+    """Client PostgREST sur un MockTransport : chaque requête est enregistrée."""
+    log = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        log.append(request)
+        if request.method == "GET":
+            return httpx.Response(200, json=[{"id": str(CLIENT_ID)}])
+        body = json.loads(request.content)
+        rows = body if isinstance(body, list) else [body]
+        return httpx.Response(201, json=rows)
+
+    settings = MagicMock(
+        SUPABASE_URL="https://projet.supabase.co",
+        SUPABASE_KEY="anon",
+        SUPABASE_SERVICE_ROLE_KEY="service",
+        SUPABASE_HTTP_TIMEOUT=5.0,
+        SUPABASE_POOL_MAX_CONNECTIONS=2,
+        SUPABASE_POOL_MAX_KEEPALIVE=1,
+        SUPABASE_POOL_KEEPALIVE_EXPIRY=5.0,
+    )
+    mock_client = partial(httpx.AsyncClient, transport=httpx.MockTransport(handler))
+    with patch.object(db_async, "get_settings", return_value=settings), \
+         patch.object(db_async.httpx, "AsyncClient", mock_client):
+        yield log
+
+
+def _run(coroutine):
+    async def run_and_close():
+        try:
+            return await coroutine
+        finally:
+            await db_async.close_async_db()
+
+    return asyncio.run(run_and_close())
+
+
+def test_courtiers_and_clients(requests_log):
+    """Test d'une requête par helper (courtiers, clients, index client_emails)."""
+    _run(db_async.get_courtier_by_email("courtier@example.com"))
+    _run(db_async.get_client_by_id(CLIENT_ID))
+    _run(db_async.find_client_by_email_list(["Client@Example.com "], COURTIER_ID))
+
+    assert len(requests_log) == 3
+    courtier, client, client_emails = requests_log
+    assert courtier.url.path == "/rest/v1/courtiers"
+    assert courtier.url.params["email"] == "eq.courtier@example.com"
+    assert courtier.url.params["actif"] == "eq.true"
+    assert courtier.headers["authorization"] == "Bearer service"
+    assert client.url.path == "/rest/v1/clients"
+    assert client.url.params["id"] == f"eq.{CLIENT_ID}"
+    assert client_emails.url.path == "/rest/v1/client_emails"
+    assert client_emails.url.params["email"] == "in.(client@example.com)"
+
+
+
+def test_resolve_client_exact_on_client_emails(requests_log):
+    """Test que l'expéditeur est résolu par égalité sur client_emails, tous courtiers."""
+    with patch.object(db_async, "_identity_cache") as mock_cache:
+        mock_cache.return_value.get_client.return_value = db_async.MISSING
+        _run(db_async.resolve_client_by_email(" Jean_D@Example.com"))
+
+    (request,) = requests_log
+    assert request.url.path == "/rest/v1/client_emails"
+    assert request.url.params["email"] == "in.(jean_d@example.com)"
+    assert "courtier_id" not in request.url.params
+    mock_cache.return_value.set_client.assert_called_once()
+
+def test_dossiers_with_stats(requests_log):
+    """Test de la requête paginée des dossiers (tri, keyset, projection)."""
+    _run(db_async.get_dossiers_with_stats(
+        courtier_id=COURTIER_ID, sort="-created_at", limit=20, columns="id,nom"
+    ))
+
+    (request,) = requests_log
+    assert request.url.path == "/rest/v1/clients"
+    assert request.url.params["select"] == "id,nom"
+    assert request.url.params["courtier_id"] == f"eq.{COURTIER_ID}"
+    assert request.url.params["limit"] == "20"
+    assert request.url.params["order"].startswith("created_at.desc")
+
+
+def test_pieces_logs_and_context(requests_log):
+    """Test des écritures : insertion multi-lignes, journal, contexte dossier."""
+    pieces = [{"client_id": str(CLIENT_ID), "statut": "recu"} for _ in range(3)]
+    created = _run(db_async.create_pieces_dossier_bulk(pieces))
+    _run(db_async.log_activity("test", {"a": 1}, client_id=CLIENT_ID))
+    _run(db_async.update_dossier_context(str(CLIENT_ID), {"resume": "ok"}))
+
+    assert len(created) == 3
+    assert len(requests_log) == 3
+    bulk, log, context = requests_log
+    assert (bulk.method, bulk.url.path) == ("POST", "/rest/v1/pieces_dossier")
+    assert len(json.loads(bulk.content)) == 3
+    assert (log.method, log.url.path) == ("POST", "/rest/v1/logs_activite")
+    assert json.loads(log.content)["client_id"] == str(CLIENT_ID)
+    assert (context.method, context.url.path) == ("PATCH", "/rest/v1/dossier_context")
+    assert context.url.params["client_id"] == f"eq.{CLIENT_ID}"
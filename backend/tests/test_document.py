@@ -9,14 +9,23 @@ Ce module teste les fonctionnalités du DocumentProcessor:
 - Calcul de hash
 """
 
+import asyncio
+import multiprocessing
 import os
+import signal
 import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from pathlib import Path
+from unittest.mock import Mock, patch
 
 import pytest
 from PIL import Image
 
 from app.services.document import DocumentProcessor
+from app.services.document_pool import AsyncDocumentProcessor, _reset_executor
+from app.services.office_server import convert_with_server
 
 
 @pytest.fixture
@@ -110,6 +119,32 @@ class TestDocumentProcessor:
         assert Path(pdf_path).exists()
         assert Path(pdf_path).suffix == ".pdf"
 
+    def test_convert_photo_normalized(self, processor, temp_dir):
+        """Test de la normalisation d'une photo : orientation EXIF et réduction."""
+        from pypdf import PdfReader
+
+        photo_path = Path(temp_dir) / "photo.jpg"
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Rotation 90° (photo prise en portrait)
+        Image.new("RGB", (4000, 3000), color=(200, 40, 40)).save(photo_path, "JPEG", exif=exif)
+
+        pdf_path = processor.convert_to_pdf(str(photo_path))
+
+        page = PdfReader(pdf_path).pages[0]
+        # Page en portrait, au format A4 (~842 points de haut)
+        assert page.mediabox.height > page.mediabox.width
+        assert float(page.mediabox.height) == pytest.approx(842, abs=2)
+
+    def test_normalize_image_grayscale(self, processor):
+        """Test du passage en niveaux de gris d'un document sans couleur."""
+        img = Image.new("RGB", (3000, 4000), color=(240, 240, 238))
+
+        normalized, resolution = processor._normalize_image(img)
+
+        assert normalized.mode == "L"
+        assert max(normalized.size) <= 11.69 * processor.IMAGE_PAGE_DPI
+        assert resolution == pytest.approx(processor.IMAGE_PAGE_DPI, abs=1)
+
     def test_convert_pdf_returns_same_path(self, processor, temp_dir):
         """Test que la conversion d'un PDF retourne le même chemin."""
         # Créer un PDF factice
@@ -186,6 +221,79 @@ class TestDocumentProcessor:
         with pytest.raises(FileNotFoundError):
             processor.compress_pdf("/nonexistent/file.pdf")
 
+    def test_compress_pdf_skips_text_only(self, processor, temp_dir):
+        """Test qu'un PDF sans images n'est pas envoyé à Ghostscript."""
+        from pypdf import PdfWriter
+
+        writer = PdfWriter()
+        writer.add_blank_page(595, 842)
+        pdf_path = str(Path(temp_dir) / "texte.pdf")
+        with open(pdf_path, "wb") as f:
+            writer.write(f)
+
+        with patch.object(processor, "_compress_with_ghostscript") as mock_gs:
+            compressed_path = processor.compress_pdf(pdf_path, target_size_mb=0.0001)
+
+        assert compressed_path == pdf_path
+        mock_gs.assert_not_called()
+
+    def test_compress_pdf_single_pass(self, processor, sample_image, temp_dir):
+        """Test qu'un seul passage Ghostscript suffit quand la cible est atteinte."""
+        pdf_path = processor.convert_to_pdf(sample_image)
+        small_pdf = Path(temp_dir) / "small.pdf"
+        small_pdf.write_bytes(b"%PDF-1.4 small")
+
+        with patch.object(processor, "_get_ghostscript_command", return_value="gs"), \
+             patch.object(processor, "_compress_with_ghostscript", return_value=str(small_pdf)) as mock_gs:
+            compressed_path = processor.compress_pdf(pdf_path, target_size_mb=0.001)
+
+        assert compressed_path == str(small_pdf)
+        mock_gs.assert_called_once()
+
+    def test_analyze_pdf_images_in_form_xobject(self, processor, sample_image, temp_dir):
+        """Test que les images placées dans un XObject /Form sont mesurées."""
+        from pypdf import PdfReader, PdfWriter
+        from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+        pdf_path = processor.convert_to_pdf(sample_image)
+        direct = processor._analyze_pdf_images(Path(pdf_path))
+        assert direct["image_bytes"] > 0
+
+        # Même image, enveloppée dans un formulaire (logo, page importée...)
+        writer = PdfWriter(clone_from=PdfReader(pdf_path))
+        page = writer.pages[0]
+        form = DecodedStreamObject()
+        form.set_data(b"q 595 0 0 842 0 0 cm /Im0 Do Q")
+        form.update({
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Form"),
+            NameObject("/BBox"): page.mediabox,
+            NameObject("/Resources"): page["/Resources"],
+        })
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/XObject"): DictionaryObject({NameObject("/Fm0"): writer._add_object(form)})
+        })
+        form_pdf = Path(temp_dir) / "form.pdf"
+        with open(form_pdf, "wb") as f:
+            writer.write(f)
+
+        stats = processor._analyze_pdf_images(form_pdf)
+        assert stats["image_bytes"] == pytest.approx(direct["image_bytes"], abs=100)
+        assert stats["max_dpi"] == direct["max_dpi"]
+
+    def test_estimate_compression_settings(self, processor):
+        """Test de l'estimation DPI / qualité JPEG selon le budget."""
+        stats = {"total_bytes": 8_000_000, "image_bytes": 7_800_000, "pages": 4, "max_dpi": 300.0}
+
+        dpi, quality = processor._estimate_compression_settings(stats, 4_000_000)
+        assert processor.MIN_COMPRESSION_DPI < dpi <= 300
+        assert quality == processor.DEFAULT_JPEG_QUALITY
+
+        # Budget très serré : résolution plancher et qualité dégradée
+        dpi, quality = processor._estimate_compression_settings(stats, 200_000)
+        assert dpi == processor.MIN_COMPRESSION_DPI
+        assert processor.MIN_JPEG_QUALITY <= quality < processor.DEFAULT_JPEG_QUALITY
+
     def test_merge_pdfs_simple(self, processor, sample_image, temp_dir):
         """Test la fusion de plusieurs PDFs."""
         # Créer 2 PDFs
@@ -248,6 +356,20 @@ class TestDocumentProcessor:
         page_count = processor.get_pdf_page_count(merged_path)
         assert page_count == 2
 
+    def test_append_pdf_incremental(self, processor, sample_image, temp_dir):
+        """Test de l'ajout incrémental : le maître est recopié tel quel."""
+        master = processor.merge_pdfs(
+            [processor.convert_to_pdf(sample_image)] * 2,
+            str(Path(temp_dir) / "master.pdf")
+        )
+        new_pdf = processor.convert_to_pdf(sample_image)
+        output = str(Path(temp_dir) / "master_updated.pdf")
+
+        processor.append_pdf(master, new_pdf, output)
+
+        assert processor.get_pdf_page_count(output) == 3
+        assert Path(output).read_bytes().startswith(Path(master).read_bytes())
+
     def test_libreoffice_command_detection(self, processor):
         """Test la détection de LibreOffice."""
         cmd = processor._get_libreoffice_command()
@@ -329,6 +451,131 @@ class TestDocumentProcessorIntegration:
         assert page_count == 3
 
 
+class TestAsyncDocumentProcessor:
+    """Tests de la façade asynchrone (exécution hors event loop)."""
+
+    @pytest.fixture(autouse=True)
+    def thread_settings(self):
+        """Pool désactivé : exécution dans un thread, plus rapide en test."""
+        settings = Mock(DOCUMENT_POOL_WORKERS=0, DOCUMENT_TASK_TIMEOUT=30)
+        with patch("app.services.document_pool.get_settings", return_value=settings):
+            yield settings
+
+    def test_convert_many(self, processor, sample_image, temp_dir):
+        """Test de la conversion parallèle, un échec n'arrêtant pas les autres."""
+        async_processor = AsyncDocumentProcessor(processor)
+        missing = str(Path(temp_dir) / "absent.png")
+
+        pdf_paths = asyncio.run(async_processor.convert_many([sample_image, missing]))
+
+        assert pdf_paths[0].endswith(".pdf")
+        assert Path(pdf_paths[0]).exists()
+        assert pdf_paths[1] is None
+
+    def test_task_timeout(self, processor, sample_image):
+        """Test du timeout par tâche."""
+        async_processor = AsyncDocumentProcessor(processor, timeout=0.1)
+
+        with patch.object(processor, "convert_to_pdf", side_effect=lambda p: time.sleep(1)):
+            with pytest.raises(TimeoutError):
+                asyncio.run(async_processor.convert_to_pdf(sample_image))
+
+
+    def test_reset_cancels_pending_tasks_without_cancelling_caller(self, processor, sample_image):
+        """Test qu'une tâche annulée par le remplacement du pool lève RuntimeError."""
+        executor = ThreadPoolExecutor(max_workers=1)
+        fast_timeout = AsyncDocumentProcessor(processor, timeout=0.2)
+        # En attente derrière la première tâche, annulée au remplacement du pool
+        pending = AsyncDocumentProcessor(processor, timeout=5)
+
+        async def run_both():
+            return await asyncio.gather(
+                fast_timeout.convert_to_pdf(sample_image),
+                pending.convert_to_pdf(sample_image),
+                return_exceptions=True
+            )
+
+        with patch("app.services.document_pool.get_document_executor", return_value=executor), \
+             patch.object(DocumentProcessor, "convert_to_pdf", side_effect=lambda p: time.sleep(0.5)):
+            results = asyncio.run(run_both())
+
+        assert isinstance(results[0], TimeoutError)
+        assert isinstance(results[1], RuntimeError)
+
+    def test_reset_kills_hung_worker(self):
+        """Test qu'un processus bloqué au-delà du timeout est tué au remplacement du pool."""
+        executor = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=os.setsid
+        )
+        future = executor.submit(time.sleep, 60)
+        with pytest.raises(FuturesTimeoutError):
+            future.result(timeout=1)
+
+        # Relevé avant le reset : shutdown() vide _processes
+        workers = list(executor._processes.values())
+        assert workers and all(worker.is_alive() for worker in workers)
+
+        _reset_executor(executor)
+
+        for worker in workers:
+            worker.join(timeout=5)
+            assert not worker.is_alive()
+            assert worker.exitcode == -signal.SIGKILL
+
+
+class TestOfficeServer:
+    """Tests de la conversion Office via les instances LibreOffice chaudes."""
+
+    def test_office_conversion_uses_server(self, processor, temp_dir):
+        """Test que la conversion passe par le serveur quand il est disponible."""
+        docx_path = Path(temp_dir) / "contrat.docx"
+        docx_path.write_bytes(b"fake docx")
+
+        def fake_convert(office_path, pdf_path):
+            pdf_path.write_bytes(b"%PDF-1.4 fake")
+            return True
+
+        with patch("app.services.document.convert_with_server", side_effect=fake_convert), \
+             patch("app.services.document.subprocess.run") as mock_run:
+            pdf_path = processor._convert_office_to_pdf(docx_path)
+
+        assert pdf_path == str(Path(temp_dir) / "contrat.pdf")
+        mock_run.assert_not_called()
+
+    def test_office_conversion_falls_back_to_soffice(self, processor, temp_dir):
+        """Test du repli sur soffice quand aucun serveur n'est disponible."""
+        docx_path = Path(temp_dir) / "contrat.docx"
+        docx_path.write_bytes(b"fake docx")
+
+        def fake_soffice(cmd, **kwargs):
+            (Path(temp_dir) / "contrat.pdf").write_bytes(b"%PDF-1.4 fake")
+            return Mock(returncode=0, stderr="")
+
+        with patch("app.services.document.convert_with_server", return_value=False), \
+             patch.object(processor, "_get_libreoffice_command", return_value="soffice"), \
+             patch("app.services.document.subprocess.run", side_effect=fake_soffice) as mock_run:
+            pdf_path = processor._convert_office_to_pdf(docx_path)
+
+        assert pdf_path.endswith("contrat.pdf")
+        assert mock_run.call_args[0][0][0] == "soffice"
+
+    def test_convert_with_server_without_pool(self, temp_dir):
+        """Test qu'aucune conversion n'est tentée si aucune instance n'écoute."""
+        settings = Mock(LIBREOFFICE_SERVER_POOL_SIZE=2, LIBREOFFICE_SERVER_BASE_PORT=2003)
+        with patch("app.services.office_server.get_settings", return_value=settings), \
+             patch("app.services.office_server.shutil.which", return_value="/usr/bin/unoconvert"), \
+             patch("app.services.office_server._is_listening", return_value=False), \
+             patch("app.services.office_server.subprocess.run") as mock_run:
+            converted = convert_with_server(
+                Path(temp_dir) / "contrat.docx", Path(temp_dir) / "contrat.pdf"
+            )
+
+        assert converted is False
+        mock_run.assert_not_called()
+
+
 # ==============================================================================
 # Tests de performance (optionnels, à lancer manuellement)
 # ==============================================================================
@@ -0,0 +1,81 @@
+"""
+Tests unitaires pour le cache documentaire (indexé par hash).
+"""
+
+import os
+from unittest.mock import patch
+
+import pytest
+
+from app.services.document_cache import DocumentCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Cache disque de 1 MB dans un répertoire temporaire."""
+    with patch("app.services.document_cache.get_settings"):
+        return DocumentCache(cache_dir=str(tmp_path / "cache"), max_size_mb=1)
+
+
+@patch("app.services.document_cache.upsert_document_cache_entry")
+def test_converted_pdf_roundtrip(mock_upsert, cache, tmp_path):
+    """Test de mise en cache puis relecture d'un PDF converti."""
+    pdf = tmp_path / "scan_converted.pdf"
+    pdf.write_bytes(b"%PDF-1.4 converti")
+
+    cached = cache.put_converted_pdf("a" * 64, str(pdf))
+    work_copy = tmp_path / "scan_cache.pdf"
+
+    assert cache.get_converted_pdf("a" * 64, work_copy) == work_copy
+    assert cached.read_bytes() == b"%PDF-1.4 converti"
+    assert work_copy.read_bytes() == b"%PDF-1.4 converti"
+    assert cache.get_converted_pdf("b" * 64, tmp_path / "autre.pdf") is None
+    mock_upsert.assert_called_once_with("a" * 64, {"pdf_size_bytes": len(b"%PDF-1.4 converti")})
+
+
+@patch("app.services.document_cache.upsert_document_cache_entry")
+def test_lru_eviction(mock_upsert, cache, tmp_path):
+    """Test de l'éviction des PDF les moins récemment utilisés."""
+    pdf = tmp_path / "gros.pdf"
+    pdf.write_bytes(b"x" * 600 * 1024)
+
+    first = cache.put_converted_pdf("1" * 64, str(pdf))
+    in_use = cache.get_converted_pdf("1" * 64, tmp_path / "en_cours.pdf")
+    os.utime(first, (0, 0))
+    cache.put_converted_pdf("2" * 64, str(pdf))
+
+    assert cache.get_converted_pdf("1" * 64, tmp_path / "un.pdf") is None
+    assert cache.get_converted_pdf("2" * 64, tmp_path / "deux.pdf") is not None
+    # Le PDF remis avant l'éviction reste utilisable
+    assert in_use.read_bytes() == pdf.read_bytes()
+
+
+@patch("app.services.document_cache.upsert_document_cache_entry")
+def test_disk_cache_disabled(mock_upsert, tmp_path):
+    """Test que max_size_mb=0 désactive le cache disque (pas remplacé par la valeur par défaut)."""
+    with patch("app.services.document_cache.get_settings") as mock_settings:
+        mock_settings.return_value.DOCUMENT_CACHE_MAX_MB = 500
+        cache = DocumentCache(cache_dir=str(tmp_path / "cache"), max_size_mb=0)
+    pdf = tmp_path / "scan.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+
+    assert cache.put_converted_pdf("a" * 64, str(pdf)) == pdf
+    assert cache.get_converted_pdf("a" * 64, tmp_path / "copie.pdf") is None
+    assert not (tmp_path / "cache").exists()
+    mock_upsert.assert_not_called()
+
+
+@patch("app.services.document_cache.upsert_document_cache_entry")
+@patch("app.services.document_cache.get_document_cache_entry")
+def test_nature_index(mock_get_entry, mock_upsert, cache):
+    """Test de la lecture/écriture de la nature dans l'index Supabase."""
+    mock_get_entry.return_value = {"fichier_hash": "c" * 64, "nature": "BULLETIN_SALAIRE"}
+
+    assert cache.get_nature("c" * 64) == "BULLETIN_SALAIRE"
+    assert cache.get_nature("c" * 64) == "BULLETIN_SALAIRE"
+    # Une seule lecture Supabase par hash
+    mock_get_entry.assert_called_once()
+
+    # Valeur identique : pas de nouvelle écriture
+    cache.record("c" * 64, nature="BULLETIN_SALAIRE")
+    mock_upsert.assert_not_called()
@@ -0,0 +1,142 @@
+"""
+Tests unitaires pour la liste paginée des dossiers (GET /api/dossiers).
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+from urllib.parse import parse_qs
+
+import pytest
+from fastapi import HTTPException, Response
+from postgrest import SyncPostgrestClient
+
+from app.api import dossiers
+from app.api.dossiers import _decode_cursor, _encode_cursor, list_dossiers
+from app.middleware.auth import AuthUser
+from app.utils.db import _dossiers_with_stats_query
+
+COURTIER_ID = "11111111-1111-1111-1111-111111111111"
+
+
+def _client(index: int) -> dict:
+    return {
+        "id": f"00000000-0000-0000-0000-{index:012d}",
+        "nom": f"Client {index}",
+        "prenom": "Jean",
+        "created_at": f"2026-01-{index:02d}T10:00:00+00:00",
+        "nb_pieces_total": 4,
+        "nb_pieces_recues": 2,
+        "pourcentage_completion": 50.0,
+    }
+
+
+def _list(rows, **params):
+    """Appelle list_dossiers avec get_dossiers_with_stats simulé."""
+    query = {"statut": None, "q": None, "sort": "-created_at", "limit": None, "cursor": None, "fields": None}
+    query.update(params)
+    user = AuthUser("user", "courtier@example.com", courtier_data={"id": COURTIER_ID})
+    response = Response()
+    mock_get = AsyncMock(return_value=rows)
+    with patch.object(dossiers, "get_dossiers_with_stats", mock_get):
+        result = asyncio.run(list_dossiers(response, user=user, **query))
+    return result, response, mock_get
+
+
+def test_cursor_roundtrip():
+    """Test de l'encodage opaque du curseur (tri, valeur de tri, id)."""
+    cursor = _encode_cursor("-created_at", "2026-01-03T10:00:00+00:00", _client(3)["id"])
+
+    assert _decode_cursor(cursor, "-created_at") == ("2026-01-03T10:00:00+00:00", _client(3)["id"])
+    with pytest.raises(HTTPException) as exc:
+        _decode_cursor("pas-un-curseur", "-created_at")
+    assert exc.value.status_code == 400
+
+
+def test_cursor_rejected_for_other_sort():
+    """Test qu'un curseur émis pour un tri est refusé (400) avec un autre tri."""
+    cursor = _encode_cursor("nom", "Client 3", _client(3)["id"])
+
+    with pytest.raises(HTTPException) as exc:
+        _list([], sort="-created_at", cursor=cursor)
+    assert exc.value.status_code == 400
+    with pytest.raises(HTTPException):
+        _decode_cursor(cursor, "-nom")
+
+
+def test_search_escapes_ilike_wildcards():
+    """Test que _ et \\ de la recherche sont échappés (pas de joker ILIKE)."""
+    query = _dossiers_with_stats_query(
+        SyncPostgrestClient("http://supabase.test/rest/v1"),
+        None, None, "Jean_D%*", "-created_at", None, None, "id,nom"
+    )
+    params = parse_qs(str(query.request.params))
+
+    assert params["recherche"] == ["ilike.*jean\\_d*"]
+
+
+def test_keyset_filter():
+    """Test du filtre keyset : (tri < valeur) ou (tri = valeur et id < dernier id)."""
+    query = _dossiers_with_stats_query(
+        SyncPostgrestClient("http://supabase.test/rest/v1"),
+        None, None, None, "-created_at", 21,
+        ("2026-01-03T10:00:00+00:00", "abc"), "id,nom"
+    )
+    params = parse_qs(str(query.request.params))
+
+    assert params["or"] == [
+        '(created_at.lt."2026-01-03T10:00:00+00:00",'
+        'and(created_at.eq."2026-01-03T10:00:00+00:00",id.lt.abc))'
+    ]
+    assert params["order"] == ["created_at.desc,id.desc"]
+    assert params["limit"] == ["21"]
+
+
+def test_list_without_limit_returns_everything():
+    """Test que sans limit ni cursor la liste est complète, sans en-tête de page."""
+    rows = [_client(i) for i in range(1, 76)]
+
+    result, response, mock_get = _list(rows)
+
+    assert len(result) == 75
+    assert "X-Next-Cursor" not in response.headers
+    assert mock_get.call_args.kwargs["limit"] is None
+
+
+def test_list_paginated():
+    """Test d'une page : limit + 1 demandé, curseur sur le dernier dossier rendu."""
+    rows = [_client(i) for i in (5, 4, 3)]
+
+    result, response, mock_get = _list(rows, limit=2)
+
+    assert [d.id for d in result] == [rows[0]["id"], rows[1]["id"]]
+    assert mock_get.call_args.kwargs["limit"] == 3
+    assert _decode_cursor(response.headers["X-Next-Cursor"], "-created_at") == (
+        rows[1]["created_at"], rows[1]["id"]
+    )
+
+    # Page suivante : curseur seul, taille de page par défaut
+    _, _, mock_get = _list([], cursor=response.headers["X-Next-Cursor"])
+    assert mock_get.call_args.kwargs["after"] == (rows[1]["created_at"], rows[1]["id"])
+    assert mock_get.call_args.kwargs["limit"] == dossiers.DEFAULT_PAGE_SIZE + 1
+
+
+def test_list_fields_projection():
+    """Test de fields= : colonnes demandées + id et clé de tri, réponse réduite."""
+    result, _, mock_get = _list([_client(1)], fields="nom,pourcentage_completion")
+
+    assert mock_get.call_args.kwargs["columns"] == "id,nom,pourcentage_completion,created_at"
+    assert result[0].model_dump(exclude_unset=True) == {
+        "id": _client(1)["id"], "nom": "Client 1", "pourcentage_completion": 50.0
+    }
+
+
+@pytest.mark.parametrize("params", [
+    {"sort": "-inconnu"},
+    {"fields": "nom,mot_de_passe"},
+    {"cursor": "invalide"},
+])
+def test_list_bad_request(params):
+    """Test des erreurs 400 (tri, champs, curseur invalides)."""
+    with pytest.raises(HTTPException) as exc:
+        _list([], **params)
+    assert exc.value.status_code == 400
@@ -43,6 +43,12 @@ def mock_settings(mock_credentials):
         mock_settings_obj = Mock()
         mock_settings_obj.GOOGLE_CREDENTIALS_JSON = json.dumps(mock_credentials)
         mock_settings_obj.GOOGLE_DRIVE_MASTER_FOLDER_ID = "test-master-folder-id"
+        mock_settings_obj.DRIVE_CACHE_MAX_MB = 0
+        mock_settings_obj.DRIVE_LOOKUP_CACHE_TTL = 0
+        mock_settings_obj.DRIVE_CHANGES_POLL_SECONDS = 0
+        mock_settings_obj.DRIVE_UPLOAD_CONCURRENCY = 4
+        mock_settings_obj.DRIVE_MULTIPART_MAX_MB = 5
+        mock_settings_obj.DRIVE_UPLOAD_SESSION_DIR = tempfile.mkdtemp()
         mock_get_settings.return_value = mock_settings_obj
         yield mock_settings_obj
 
@@ -76,6 +82,26 @@ class TestDriveManager:
             assert manager.master_folder_id == "test-master-folder-id"
             assert manager.service is not None
 
+    def test_drive_service_per_thread(self, mock_settings):
+        """Test du client Drive partagé par thread (pas de build à chaque instance)."""
+        import threading
+        from app.services.drive import get_drive_service
+
+        credentials = Mock()
+        with patch('app.services.drive.build', side_effect=lambda *a, **k: MagicMock()) as mock_build, \
+             patch('app.services.drive.AuthorizedHttp'):
+            service = get_drive_service(credentials)
+            assert get_drive_service(credentials) is service
+
+            other = []
+            thread = threading.Thread(target=lambda: other.append(get_drive_service(credentials)))
+            thread.start()
+            thread.join()
+
+        assert other[0] is not service
+        assert mock_build.call_count == 2
+        assert mock_build.call_args[1]['static_discovery'] is True
+
     def test_create_folder(self, drive_manager, mock_drive_service):
         """Test la création d'un dossier."""
         # Mock de la réponse de l'API
@@ -182,6 +208,108 @@ class TestDriveManager:
         call_args = mock_drive_service.files().create.call_args
         assert call_args[1]['body']['name'] == "original_name.pdf"
 
+    def test_upload_file_multipart_small_file(self, drive_manager, mock_drive_service, tmp_path):
+        """Test qu'un petit fichier est envoyé en multipart (une seule requête)."""
+        test_file = tmp_path / "small.pdf"
+        test_file.write_bytes(b"Small")
+
+        mock_drive_service.files().create().execute.return_value = {'id': 'small-id'}
+
+        assert drive_manager.upload_file(test_file, "folder-id") == "small-id"
+
+        media = mock_drive_service.files().create.call_args[1]['media_body']
+        assert media.resumable() is False
+
+    def test_upload_file_resumes_session(self, drive_manager, mock_drive_service, tmp_path):
+        """Test la reprise d'un upload résumable depuis l'URI persisté."""
+        import httplib2
+        from app.services.drive_upload import UploadSessionStore
+
+        test_file = tmp_path / "big.pdf"
+        test_file.write_bytes(b"x" * 1024)
+        drive_manager.multipart_max_bytes = 0
+
+        key = UploadSessionStore.key_for("create", "folder-id", test_file, "big.pdf")
+        drive_manager.upload_sessions.save(key, "https://upload.example/session-1")
+
+        request = MagicMock()
+        # Statut de la session : 512 octets déjà reçus par Drive
+        request.http.request.return_value = (
+            httplib2.Response({"status": 308, "range": "bytes=0-511"}), b""
+        )
+        request.next_chunk.return_value = (None, {'id': 'big-id'})
+        mock_drive_service.files().create.return_value = request
+
+        file_id = drive_manager.upload_file(test_file, "folder-id")
+
+        assert file_id == "big-id"
+        media = mock_drive_service.files().create.call_args[1]['media_body']
+        assert media.resumable() is True
+        # Reprise sur la session existante, supprimée une fois l'upload terminé
+        assert request.http.request.call_args[0][:2] == ("https://upload.example/session-1", "PUT")
+        assert request.http.request.call_args[1]["headers"]["Content-Range"] == "bytes */1024"
+        assert request.resumable_uri == "https://upload.example/session-1"
+        assert request.resumable_progress == 512
+        assert drive_manager.upload_sessions.load(key) is None
+
+    def test_upload_file_expired_session_restarts(self, drive_manager, mock_drive_service, tmp_path):
+        """Test qu'une session expirée (404/410) repart d'un upload complet."""
+        import httplib2
+        from app.services.drive_upload import UploadSessionStore
+
+        test_file = tmp_path / "big.pdf"
+        test_file.write_bytes(b"x" * 1024)
+        drive_manager.multipart_max_bytes = 0
+        key = UploadSessionStore.key_for("create", "folder-id", test_file, "big.pdf")
+        drive_manager.upload_sessions.save(key, "https://upload.example/expired")
+
+        request = MagicMock(resumable_uri=None)
+        request.http.request.return_value = (httplib2.Response({"status": 404}), b"")
+        request.next_chunk.return_value = (None, {'id': 'big-id'})
+        mock_drive_service.files().create.return_value = request
+
+        assert drive_manager.upload_file(test_file, "folder-id") == "big-id"
+        assert request.resumable_uri is None
+        assert drive_manager.upload_sessions.load(key) is None
+
+    def test_upload_session_key_and_purge(self, tmp_path):
+        """Test de la clé par contenu (fichier régénéré) et de la purge des sessions expirées."""
+        import os
+        from app.services.drive_upload import UploadSessionStore
+
+        test_file = tmp_path / "master.pdf"
+        test_file.write_bytes(b"contenu")
+        key = UploadSessionStore.key_for("update", "file-id", test_file)
+
+        # Régénéré à l'identique (nouvelle date de modification) : même clé
+        test_file.unlink()
+        test_file.write_bytes(b"contenu")
+        os.utime(test_file, (1, 1))
+        assert UploadSessionStore.key_for("update", "file-id", test_file) == key
+        test_file.write_bytes(b"autre contenu")
+        assert UploadSessionStore.key_for("update", "file-id", test_file) != key
+
+        store = UploadSessionStore(tmp_path / "sessions")
+        store.save("ancienne", "https://upload.example/old")
+        store.save("recente", "https://upload.example/new")
+        old = store.session_dir / "ancienne.json"
+        os.utime(old, (1, 1))
+
+        assert store.purge() == 1
+        assert store.load("ancienne") is None
+        assert store.load("recente") == "https://upload.example/new"
+
+    def test_upload_session_store_purged_once(self, tmp_path):
+        """Test que le stockage de sessions est partagé et purgé à la première demande seulement."""
+        from app.services.drive_upload import UploadSessionStore, get_upload_session_store
+
+        session_dir = str(tmp_path / "sessions")
+        with patch.object(UploadSessionStore, "purge") as mock_purge:
+            store = get_upload_session_store(session_dir)
+            assert get_upload_session_store(session_dir) is store
+
+        mock_purge.assert_called_once()
+
     def test_download_file(self, drive_manager, mock_drive_service, tmp_path):
         """Test le téléchargement d'un fichier."""
         output_path = tmp_path / "downloaded.pdf"
@@ -208,6 +336,27 @@ class TestDriveManager:
             assert output_path.exists()
             mock_drive_service.files().get_media.assert_called_once_with(fileId="file-id")
 
+    def test_download_file_from_cache(self, drive_manager, mock_drive_service, tmp_path):
+        """Test qu'un fichier déjà uploadé n'est pas retéléchargé."""
+        import hashlib
+        from app.services.drive_cache import DriveFileCache
+
+        drive_manager.file_cache = DriveFileCache(str(tmp_path / "cache"), max_size_mb=10)
+        uploaded = tmp_path / "master.pdf"
+        uploaded.write_bytes(b"%PDF-1.4 maitre")
+        drive_manager.file_cache.put("file-id", uploaded)
+
+        mock_drive_service.files().get().execute.return_value = {
+            'md5Checksum': hashlib.md5(b"%PDF-1.4 maitre").hexdigest()
+        }
+
+        output_path = tmp_path / "downloaded.pdf"
+        result = drive_manager.download_file("file-id", output_path)
+
+        assert result == output_path
+        assert output_path.read_bytes() == b"%PDF-1.4 maitre"
+        mock_drive_service.files().get_media.assert_not_called()
+
     def test_delete_file(self, drive_manager, mock_drive_service):
         """Test la suppression d'un fichier."""
         mock_drive_service.files().delete().execute.return_value = None
@@ -255,6 +404,39 @@ class TestDriveManager:
         # Devrait retourner un lien de fallback
         assert link == "https://drive.google.com/file/d/test-file-id/view"
 
+    def test_get_shareable_links_batch(self, drive_manager, mock_drive_service):
+        """Test des liens de partage groupés en une requête batch."""
+        batches = []
+
+        class FakeBatch:
+            def __init__(self, callback):
+                self.callback = callback
+                self.request_ids = []
+                batches.append(self)
+
+            def add(self, request, request_id):
+                self.request_ids.append(request_id)
+
+            def execute(self):
+                for request_id in self.request_ids:
+                    file_id = request_id.split(":", 1)[1]
+                    if file_id == "file-ko":
+                        self.callback(request_id, None, Exception("403"))
+                    else:
+                        self.callback(request_id, {
+                            'id': 'perm',
+                            'webViewLink': f"https://drive.google.com/file/d/{file_id}/view?usp=drivesdk"
+                        }, None)
+
+        mock_drive_service.new_batch_http_request.side_effect = lambda callback: FakeBatch(callback)
+
+        links = drive_manager.get_shareable_links(["file-1", "file-2", "file-ko"])
+
+        assert len(batches) == 1
+        assert len(batches[0].request_ids) == 6
+        assert links["file-1"] == "https://drive.google.com/file/d/file-1/view?usp=drivesdk"
+        assert links["file-ko"] == "https://drive.google.com/file/d/file-ko/view"
+
     def test_list_files_in_folder(self, drive_manager, mock_drive_service):
         """Test le listing de fichiers dans un dossier."""
         mock_drive_service.files().list().execute.return_value = {
@@ -323,6 +505,26 @@ class TestDriveManager:
 
         assert file_id is None
 
+    def test_find_file_by_name_cached(self, drive_manager, mock_drive_service, tmp_path):
+        """Test du cache des recherches, invalidé par nos propres uploads."""
+        from app.services.drive_lookup_cache import DriveLookupCache
+
+        drive_manager.lookup_cache = DriveLookupCache(ttl_seconds=60)
+        mock_drive_service.files().list().execute.return_value = {'files': []}
+        mock_drive_service.files().list.reset_mock()
+
+        assert drive_manager.find_file_by_name("_RAPPORT_SUIVI.docx", "folder-id") is None
+        assert drive_manager.find_file_by_name("_RAPPORT_SUIVI.docx", "folder-id") is None
+        assert mock_drive_service.files().list.call_count == 1
+
+        test_file = tmp_path / "rapport.docx"
+        test_file.write_bytes(b"docx")
+        mock_drive_service.files().create().execute.return_value = {'id': 'report-id'}
+        drive_manager.upload_file(test_file, "folder-id", "_RAPPORT_SUIVI.docx")
+
+        mock_drive_service.files().list().execute.return_value = {'files': [{'id': 'report-id'}]}
+        assert drive_manager.find_file_by_name("_RAPPORT_SUIVI.docx", "folder-id") == "report-id"
+
     def test_folder_exists(self, drive_manager, mock_drive_service):
         """Test vérification existence dossier."""
         mock_drive_service.files().list().execute.return_value = {
@@ -0,0 +1,44 @@
+"""
+Tests unitaires pour le cache disque des fichiers Drive.
+"""
+
+import hashlib
+import os
+
+import pytest
+
+from app.services.drive_cache import DriveFileCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Cache de 1 MB dans un répertoire temporaire."""
+    return DriveFileCache(str(tmp_path / "drive_cache"), max_size_mb=1)
+
+
+def test_get_validates_checksum(cache, tmp_path):
+    """Test qu'une copie n'est servie que si le MD5 correspond à Drive."""
+    master = tmp_path / "master.pdf"
+    master.write_bytes(b"%PDF-1.4 maitre v1")
+    cache.put("file123", master)
+
+    cached = cache.get("file123", hashlib.md5(b"%PDF-1.4 maitre v1").hexdigest())
+
+    assert cached.read_bytes() == b"%PDF-1.4 maitre v1"
+    assert cache.get("file123", hashlib.md5(b"%PDF-1.4 maitre v2").hexdigest()) is None
+    assert cache.get("inconnu", "0" * 32) is None
+
+
+def test_lru_eviction(cache, tmp_path):
+    """Test de l'éviction des fichiers les moins récemment utilisés."""
+    content = b"x" * 600 * 1024
+    source = tmp_path / "gros.pdf"
+    source.write_bytes(content)
+    md5 = hashlib.md5(content).hexdigest()
+
+    cache.put("ancien", source)
+    os.utime(cache.cache_dir / "ancien", (1, 1))
+    cache.put("recent", source)
+
+    assert cache.get("ancien", md5) is None
+    assert cache.get("recent", md5) is not None
@@ -0,0 +1,86 @@
+"""
+Tests unitaires pour l'index local Drive et la synchronisation changes.list.
+"""
+
+from unittest.mock import MagicMock, Mock, patch
+
+from app.services.drive_index import FOLDER_MIME_TYPE, DriveChangesWatcher, DriveIndex
+from app.services.drive_lookup_cache import MISSING
+
+
+def _folder(file_id, name, parent_id):
+    return {"id": file_id, "name": name, "mimeType": FOLDER_MIME_TYPE, "parents": [parent_id]}
+
+
+def _pdf(file_id, name, parent_id):
+    return {"id": file_id, "name": name, "mimeType": "application/pdf", "parents": [parent_id]}
+
+
+def test_rebuild_and_lookup(tmp_path):
+    """Test de la reconstruction depuis un listing et des recherches locales."""
+    index = DriveIndex(str(tmp_path / "index.sqlite3"))
+    index.rebuild("root", [
+        _folder("courtier", "Courtier_Jean_Dupont", "root"),
+        _folder("client", "CLIENT_Marie_Martin", "courtier"),
+        _pdf("releves", "Releves_Bancaires.pdf", "client"),
+        _pdf("ailleurs", "Autre.pdf", "hors-arborescence"),
+    ])
+
+    assert index.lookup("client", "Releves_Bancaires.pdf") == "releves"
+    assert index.lookup("client", "Inconnu.pdf") is None
+    assert index.lookup("root", "Courtier_Jean_Dupont", folders_only=True) == "courtier"
+    assert index.lookup("courtier", "CLIENT_Marie_Martin", folders_only=True) == "client"
+    # Dossier hors arborescence : réponse demandée à Drive
+    assert index.lookup("hors-arborescence", "Autre.pdf") is MISSING
+
+
+def test_upsert_folder_indexing(tmp_path):
+    """Test qu'un dossier apparu par le flux n'est indexé que s'il a été créé par nous."""
+    index = DriveIndex(str(tmp_path / "index.sqlite3"))
+    index.rebuild("root", [])
+
+    index.upsert(_folder("manuel", "CLIENT_Manuel", "root"))
+    index.upsert(_folder("cree", "CLIENT_Cree", "root"), created=True)
+
+    assert index.lookup("root", "CLIENT_Manuel", folders_only=True) == "manuel"
+    assert index.lookup("manuel", "x.pdf") is MISSING
+    assert index.lookup("cree", "x.pdf") is None
+
+
+def test_watcher_applies_changes(tmp_path):
+    """Test de l'application des modifications (renommage, corbeille, déplacement)."""
+    index = DriveIndex(str(tmp_path / "index.sqlite3"))
+    index.rebuild("root", [
+        _folder("client", "CLIENT_Marie_Martin", "root"),
+        _pdf("cni", "CNI.pdf", "client"),
+        _pdf("kbis", "Kbis.pdf", "client"),
+        _pdf("avis", "Avis.pdf", "client"),
+    ])
+    index.set_state("page_token", "token-1")
+
+    service = MagicMock()
+    service.changes().list().execute.return_value = {
+        "newStartPageToken": "token-2",
+        "changes": [
+            {"fileId": "cni", "file": _pdf("cni", "CNI_Recto.pdf", "client")},
+            {"fileId": "kbis", "file": dict(_pdf("kbis", "Kbis.pdf", "client"), trashed=True)},
+            {"fileId": "avis", "removed": True},
+            {"fileId": "client", "file": _folder("client", "CLIENT_Marie_Martin_OK", "root")},
+        ]
+    }
+
+    drive_manager = Mock(index=index, service=service, master_folder_id="root")
+    with patch("app.services.drive_index.get_settings"):
+        watcher = DriveChangesWatcher(drive_manager=drive_manager, poll_seconds=30)
+
+    assert watcher.sync() == 4
+
+    assert index.lookup("client", "CNI.pdf") is None
+    assert index.lookup("client", "CNI_Recto.pdf") == "cni"
+    assert index.lookup("client", "Kbis.pdf") is None
+    assert index.lookup("client", "Avis.pdf") is None
+    # Dossier renommé : son contenu reste indexé
+    assert index.lookup("root", "CLIENT_Marie_Martin_OK", folders_only=True) == "client"
+    assert index.get_state("page_token") == "token-2"
+    assert index.is_fresh(60)
+    drive_manager._cache_invalidate.assert_any_call("client")
@@ -0,0 +1,63 @@
+"""
+Tests unitaires pour le cache des recherches Drive.
+"""
+
+from unittest.mock import patch
+
+from app.services.drive_lookup_cache import MISSING, NEGATIVE_TTL_SECONDS, DriveLookupCache
+
+
+def test_get_set_and_negative_results():
+    """Test du cache d'un résultat, y compris "introuvable" (None)."""
+    cache = DriveLookupCache(ttl_seconds=60)
+
+    assert cache.get("folder-1", "name:rapport.docx") is MISSING
+
+    cache.set("folder-1", "name:rapport.docx", None)
+    cache.set("folder-1", "folder:CLIENT_Jean_Dupont", "folder-2")
+
+    assert cache.get("folder-1", "name:rapport.docx") is None
+    assert cache.get("folder-1", "folder:CLIENT_Jean_Dupont") == "folder-2"
+
+
+def test_invalidate_parent_only():
+    """Test qu'une écriture n'invalide que les recherches de son dossier."""
+    cache = DriveLookupCache(ttl_seconds=60)
+    cache.set("folder-1", "list:*", [{"id": "a"}])
+    cache.set("folder-2", "list:*", [{"id": "b"}])
+
+    cache.invalidate("folder-1")
+
+    assert cache.get("folder-1", "list:*") is MISSING
+    assert cache.get("folder-2", "list:*") == [{"id": "b"}]
+
+
+def test_ttl_and_lru_eviction():
+    """Test de l'expiration et de l'éviction LRU."""
+    cache = DriveLookupCache(ttl_seconds=60, max_entries=2)
+
+    with patch("app.services.drive_lookup_cache.time.monotonic", return_value=0):
+        cache.set("p", "a", 1)
+        cache.set("p", "b", 2)
+        cache.get("p", "a")
+        cache.set("p", "c", 3)
+
+        # "b" est le moins récemment utilisé
+        assert cache.get("p", "b") is MISSING
+        assert cache.get("p", "a") == 1
+
+    with patch("app.services.drive_lookup_cache.time.monotonic", return_value=61):
+        assert cache.get("p", "a") is MISSING
+
+
+def test_negative_results_short_ttl():
+    """Test qu'un "introuvable" expire vite en mémoire (dossier créé par un autre processus)."""
+    cache = DriveLookupCache(ttl_seconds=300)
+
+    with patch("app.services.drive_lookup_cache.time.monotonic", return_value=0):
+        cache.set("parent", "folder:CLIENT_Jean_Dupont", None)
+        cache.set("parent", "folder:CLIENT_Marie_Durand", "folder-3")
+
+    with patch("app.services.drive_lookup_cache.time.monotonic", return_value=NEGATIVE_TTL_SECONDS + 1):
+        assert cache.get("parent", "folder:CLIENT_Jean_Dupont") is MISSING
+        assert cache.get("parent", "folder:CLIENT_Marie_Durand") == "folder-3"
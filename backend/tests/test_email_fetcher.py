@@ -5,6 +5,8 @@ Ces tests utilisent des mocks pour éviter les vraies connexions IMAP.
 """
 
 import email
+import hashlib
+import socket
 from datetime import datetime
 from email.message import Message
 from unittest.mock import MagicMock, Mock, patch
@@ -13,10 +15,11 @@ import pytest
 
 from app.models.email import EmailAttachment, EmailData
 from app.services.email_fetcher import EmailFetcher
+from app.services.imap_parser import flatten_bodystructure, parse_fetch_response
 
 
 @pytest.fixture
-def mock_settings():
+def mock_settings(tmp_path):
     """Fixture des settings mockés."""
     settings = Mock()
     settings.IMAP_HOST = "imap.gmail.com"
@@ -24,6 +27,10 @@ def mock_settings():
     settings.IMAP_EMAIL = "test@example.com"
     settings.IMAP_PASSWORD = "password"
     settings.IMAP_FOLDER = "INBOX"
+    settings.IMAP_LABEL = "LEONIE"
+    settings.IMAP_FETCH_BATCH_SIZE = 50
+    settings.IMAP_LAZY_ATTACHMENTS = False
+    settings.ATTACHMENT_STORE_DIR = str(tmp_path / "attachments")
     return settings
 
 
@@ -210,25 +217,41 @@ class TestEmailFetcher:
         assert attachments[0].filename == "document.pdf"
         assert attachments[0].content_type == "application/pdf"
         assert attachments[0].size_bytes > 0
+        # Contenu écrit dans le store, pas conservé dans le modèle
+        assert attachments[0].content is None
+        assert attachments[0].read_content() == b"fake pdf content"
 
-    @patch("app.services.email_fetcher.imaplib.IMAP4_SSL")
+    @patch("app.services.email_fetcher.set_config")
+    @patch("app.services.email_fetcher.get_config")
     @patch("app.services.email_fetcher.get_settings")
     def test_fetch_new_emails_success(
-        self, mock_get_settings, mock_imap_class, mock_settings, sample_raw_email
+        self, mock_get_settings, mock_get_config, mock_set_config,
+        mock_settings, sample_raw_email
     ):
-        """Test de récupération des nouveaux emails."""
+        """Test de récupération des nouveaux emails depuis le curseur UID."""
         # Setup
         mock_get_settings.return_value = mock_settings
+        mock_get_config.return_value = {"uidvalidity": 42, "last_uid": 10}
         mock_imap = MagicMock()
-        mock_imap_class.return_value = mock_imap
 
         # Configuration du mock IMAP
         mock_imap.select.return_value = ("OK", [b"1"])
-        mock_imap.search.return_value = ("OK", [b"1 2"])
+        mock_imap.response.side_effect = lambda code: (
+            code, [{"UIDVALIDITY": b"42", "UIDNEXT": b"13"}[code]]
+        )
+
+        # Mock de UID SEARCH / UID FETCH avec email brut
+        raw_email_bytes = sample_raw_email.as_string().encode()
 
-        # Mock de fetch avec email brut
-        raw_email_bytes = sample_raw_email.as_bytes()
-        mock_imap.fetch.return_value = ("OK", [(b"1", raw_email_bytes)])
+        def uid_command(command, *args):
+            if command == "SEARCH":
+                return ("OK", [b"11 12"])
+            return ("OK", [
+                (b"1 (UID 11 BODY[] {100}", raw_email_bytes), b")",
+                (b"2 (UID 12 BODY[] {100}", raw_email_bytes), b")",
+            ])
+
+        mock_imap.uid.side_effect = uid_command
 
         # Exécution
         fetcher = EmailFetcher()
@@ -240,6 +263,269 @@ class TestEmailFetcher:
         # Vérifications
         assert len(emails) == 2
         assert all(isinstance(e, EmailData) for e in emails)
+        mock_imap.uid.assert_any_call("SEARCH", None, "UID 11:* UNSEEN")
+        mock_imap.uid.assert_any_call("FETCH", "11:12", "(UID BODY.PEEK[])")
+        assert [e.uid for e in emails] == [11, 12]
+        # Le curseur n'avance qu'après traitement (commit_uid_cursor)
+        mock_set_config.assert_not_called()
+        assert fetcher.last_fetch == {"uidvalidity": 42, "uids": [11, 12], "ceiling": 12}
+
+    @patch("app.services.email_fetcher.set_config")
+    @patch("app.services.email_fetcher.get_config")
+    @patch("app.services.email_fetcher.get_settings")
+    def test_commit_uid_cursor_never_moves_back(
+        self, mock_get_settings, mock_get_config, mock_set_config, mock_settings
+    ):
+        """Test que le curseur n'est jamais reculé pour un même UIDVALIDITY."""
+        mock_get_settings.return_value = mock_settings
+        mock_get_config.return_value = {"uidvalidity": 42, "last_uid": 12}
+
+        fetcher = EmailFetcher()
+        fetcher.commit_uid_cursor(42, 11)
+        mock_set_config.assert_not_called()
+
+        fetcher.commit_uid_cursor(42, 15)
+        mock_set_config.assert_called_once_with(
+            "imap_uid_cursor",
+            {"uidvalidity": 42, "last_uid": 15},
+            "Curseur UID IMAP du label LEONIE"
+        )
+
+        # Nouvel UIDVALIDITY : le curseur est remplacé
+        fetcher.commit_uid_cursor(43, 3)
+        assert mock_set_config.call_args[0][1] == {"uidvalidity": 43, "last_uid": 3}
+
+    @patch("app.services.email_fetcher.set_config")
+    @patch("app.services.email_fetcher.get_config")
+    @patch("app.services.email_fetcher.get_settings")
+    def test_fetch_new_emails_no_new_uid(
+        self, mock_get_settings, mock_get_config, mock_set_config, mock_settings
+    ):
+        """Test que UIDNEXT inchangé évite toute recherche."""
+        mock_get_settings.return_value = mock_settings
+        mock_get_config.return_value = {"uidvalidity": 42, "last_uid": 12}
+        mock_imap = MagicMock()
+        mock_imap.select.return_value = ("OK", [b"1"])
+        mock_imap.response.side_effect = lambda code: (
+            code, [{"UIDVALIDITY": b"42", "UIDNEXT": b"13"}[code]]
+        )
+
+        fetcher = EmailFetcher()
+        fetcher.connected = True
+        fetcher.imap = mock_imap
+
+        emails = fetcher.fetch_new_emails()
+
+        assert emails == []
+        mock_imap.uid.assert_not_called()
+        mock_set_config.assert_not_called()
+
+    @patch("app.services.email_fetcher.set_config")
+    @patch("app.services.email_fetcher.get_config")
+    @patch("app.services.email_fetcher.get_settings")
+    def test_fetch_new_emails_uidvalidity_changed(
+        self, mock_get_settings, mock_get_config, mock_set_config, mock_settings
+    ):
+        """Test de la réinitialisation du curseur quand UIDVALIDITY change."""
+        mock_get_settings.return_value = mock_settings
+        mock_get_config.side_effect = lambda key: (
+            {"uidvalidity": 41, "last_uid": 500} if key == "imap_uid_cursor" else None
+        )
+        mock_imap = MagicMock()
+        mock_imap.select.return_value = ("OK", [b"1"])
+        mock_imap.response.side_effect = lambda code: (
+            code, [{"UIDVALIDITY": b"42", "UIDNEXT": b"8"}[code]]
+        )
+        mock_imap.uid.return_value = ("OK", [b""])
+
+        fetcher = EmailFetcher()
+        fetcher.connected = True
+        fetcher.imap = mock_imap
+
+        emails = fetcher.fetch_new_emails()
+
+        assert emails == []
+        # Recherche d'amorçage UNSEEN SINCE
+        assert "UNSEEN SINCE" in mock_imap.uid.call_args[0][2]
+        # Amorçage : tout ce qui précède UIDNEXT peut être dépassé par le curseur
+        assert fetcher.last_fetch == {"uidvalidity": 42, "uids": [], "ceiling": 7}
+        assert all(c.args[0] != "imap_uid_cursor" for c in mock_set_config.call_args_list)
+
+    @patch("app.services.email_fetcher.get_settings")
+    def test_fetch_messages_batches(
+        self, mock_get_settings, mock_settings, sample_raw_email
+    ):
+        """Test du découpage en lots des commandes UID FETCH."""
+        mock_settings.IMAP_FETCH_BATCH_SIZE = 2
+        mock_get_settings.return_value = mock_settings
+        raw_email_bytes = sample_raw_email.as_string().encode()
+
+        def uid_fetch(command, uid_set, items):
+            uids = []
+            for r in uid_set.split(","):
+                first, _, last = r.partition(":")
+                uids.extend(range(int(first), int(last or first) + 1))
+            response = []
+            for uid in uids:
+                response.append((f"1 (UID {uid} BODY[] {{100}}".encode(), raw_email_bytes))
+                response.append(b")")
+            return ("OK", response)
+
+        mock_imap = MagicMock()
+        mock_imap.uid.side_effect = uid_fetch
+
+        fetcher = EmailFetcher()
+        fetcher.imap = mock_imap
+
+        fetched = list(fetcher._fetch_messages([3, 4, 5, 9, 10]))
+
+        assert [uid for uid, _ in fetched] == [3, 4, 5, 9, 10]
+        assert [c.args[1] for c in mock_imap.uid.call_args_list] == ["3:4", "5,9", "10"]
+
+    @patch("app.services.email_fetcher.get_settings")
+    def test_fetch_messages_stops_at_failed_batch(
+        self, mock_get_settings, mock_settings, sample_raw_email
+    ):
+        """Test qu'un lot en erreur arrête la récupération (UIDs suivants non rendus)."""
+        mock_settings.IMAP_FETCH_BATCH_SIZE = 2
+        mock_get_settings.return_value = mock_settings
+        raw_email_bytes = sample_raw_email.as_string().encode()
+
+        def uid_fetch(command, uid_set, items):
+            if uid_set == "5:6":
+                return ("NO", [b"erreur"])
+            first = int(uid_set.split(":")[0])
+            return ("OK", [
+                (f"1 (UID {first} BODY[] {{100}}".encode(), raw_email_bytes), b")",
+                (f"2 (UID {first + 1} BODY[] {{100}}".encode(), raw_email_bytes), b")",
+            ])
+
+        mock_imap = MagicMock()
+        mock_imap.uid.side_effect = uid_fetch
+
+        fetcher = EmailFetcher()
+        fetcher.imap = mock_imap
+
+        fetched = list(fetcher._fetch_messages([3, 4, 5, 6, 7, 8]))
+
+        assert [uid for uid, _ in fetched] == [3, 4]
+        assert mock_imap.uid.call_count == 2
+
+    @patch("app.services.email_fetcher.get_settings")
+    def test_fetch_structures_lazy_attachments(self, mock_get_settings, mock_settings):
+        """Test du mode IMAP_LAZY_ATTACHMENTS : pièces jointes chargées à la demande."""
+        mock_settings.IMAP_LAZY_ATTACHMENTS = True
+        mock_get_settings.return_value = mock_settings
+
+        header = (
+            b"From: Sophie Martin <sophie.martin@email.com>\r\n"
+            b"To: leonie@voxperience.com\r\n"
+            b"Subject: Documents\r\n"
+            b"Date: Mon, 15 Jan 2024 10:30:00 +0100\r\n"
+            b"Message-ID: <abc123@gmail.com>\r\n\r\n"
+        )
+        bodystructure = (
+            b'(("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "QUOTED-PRINTABLE" 20 1 NIL NIL NIL)'
+            b'("APPLICATION" "PDF" ("NAME" "document.pdf") NIL NIL "BASE64" 16 NIL '
+            b'("ATTACHMENT" ("FILENAME" "document.pdf")) NIL NIL) "MIXED" ("BOUNDARY" "x") NIL NIL)'
+        )
+
+        def uid_command(command, uid_set, items):
+            if "BODYSTRUCTURE" in items:
+                return ("OK", [
+                    (b"1 (UID 11 BODYSTRUCTURE " + bodystructure + b" BODY[HEADER] {200}", header),
+                    b")",
+                ])
+            if items == "(UID BODY.PEEK[1])":
+                return ("OK", [(b"1 (UID 11 BODY[1] {20}", b"Voici mes pi=C3=A8ces"), b")"])
+            if items == "(UID BODY.PEEK[2])":
+                return ("OK", [(b"1 (UID 11 BODY[2] {16}", b"JVBERi0xLjQKJQ=="), b")"])
+            return ("NO", [None])
+
+        mock_imap = MagicMock()
+        mock_imap.uid.side_effect = uid_command
+
+        fetcher = EmailFetcher()
+        fetcher.connected = True
+        fetcher.imap = mock_imap
+
+        (uid, structure), = list(fetcher._fetch_structures([11]))
+        email_data = fetcher._parse_structure(structure)
+        email_data.uid = uid
+
+        assert email_data.body_text == "Voici mes pièces"
+        assert email_data.from_address == "sophie.martin@email.com"
+        assert len(email_data.attachments) == 1
+        assert not email_data.attachments[0].is_loaded
+        assert email_data.attachments[0].imap_section == "2"
+
+        # Aucune section de pièce jointe n'a été téléchargée avant load_attachments
+        assert all("PEEK[2]" not in c.args[2] for c in mock_imap.uid.call_args_list)
+
+        attachments = fetcher.load_attachments(email_data)
+
+        assert attachments[0].content is None
+        assert attachments[0].read_content() == b"%PDF-1.4\n%"
+        assert attachments[0].size_bytes == len(b"%PDF-1.4\n%")
+        assert attachments[0].content_hash == hashlib.sha256(b"%PDF-1.4\n%").hexdigest()
+
+    def test_parse_fetch_response_with_literals(self):
+        """Test du parsing d'une réponse FETCH contenant des littéraux."""
+        msg_data = [
+            (b'1 (UID 5 BODYSTRUCTURE ("APPLICATION" "PDF" NIL NIL NIL "BASE64" 40 NIL '
+             b'("ATTACHMENT" ("FILENAME" {11}', "relevé.pdf".encode()),
+            (b')) NIL NIL) BODY[HEADER] {13}', b"Subject: a\r\n\r\n"),
+            b")",
+        ]
+
+        response = parse_fetch_response(msg_data)
+        parts = flatten_bodystructure(response[5]["BODYSTRUCTURE"])
+
+        assert response[5]["BODY[HEADER]"] == b"Subject: a\r\n\r\n"
+        assert parts == [{
+            "section": "1",
+            "content_type": "application/pdf",
+            "charset": None,
+            "encoding": "base64",
+            "size": 40,
+            "disposition": "attachment",
+            "filename": "relevé.pdf",
+        }]
+
+    def test_flatten_bodystructure_forwarded_message(self):
+        """Test de la descente dans un message/rfc822 (email transféré en pièce jointe)."""
+        structure = [
+            ["TEXT", "PLAIN", ["CHARSET", "UTF-8"], None, None, "7BIT", 20, 1],
+            ["MESSAGE", "RFC822", None, None, None, "7BIT", 900,
+             [None] * 10,  # enveloppe
+             [
+                 ["TEXT", "PLAIN", ["CHARSET", "UTF-8"], None, None, "7BIT", 30, 2],
+                 ["APPLICATION", "PDF", ["NAME", "avis.pdf"], None, None, "BASE64", 400,
+                  None, ["ATTACHMENT", ["FILENAME", "avis.pdf"]], None],
+                 "MIXED",
+             ],
+             12, None, ["ATTACHMENT", None]],
+            ["MESSAGE", "RFC822", None, None, None, "7BIT", 500,
+             [None] * 10,
+             ["IMAGE", "JPEG", ["NAME", "scan.jpg"], None, None, "BASE64", 200,
+              None, ["ATTACHMENT", ["FILENAME", "scan.jpg"]], None],
+             8, None, None],
+            "MIXED",
+        ]
+
+        parts = flatten_bodystructure(structure)
+
+        assert [(p["section"], p["content_type"], p["filename"]) for p in parts] == [
+            ("1", "text/plain", None),
+            ("2.1", "text/plain", None),
+            ("2.2", "application/pdf", "avis.pdf"),
+            ("3.1", "image/jpeg", "scan.jpg"),
+        ]
+
+    def test_format_uid_set(self):
+        """Test du formatage compact des ensembles d'UIDs."""
+        assert EmailFetcher._format_uid_set([1, 2, 3, 7, 9, 10]) == "1:3,7,9:10"
+        assert EmailFetcher._format_uid_set([5]) == "5"
 
     @patch("app.services.email_fetcher.imaplib.IMAP4_SSL")
     @patch("app.services.email_fetcher.get_settings")
@@ -301,3 +587,92 @@ class TestEmailFetcher:
         # Vérifications - déconnexion automatique
         mock_imap.close.assert_called_once()
         mock_imap.logout.assert_called_once()
+
+    @patch("app.services.email_fetcher.select.select")
+    @patch("app.services.email_fetcher.get_settings")
+    def test_idle_new_mail(self, mock_get_settings, mock_select, mock_settings):
+        """Test d'un IDLE interrompu par une notification EXISTS."""
+        mock_get_settings.return_value = mock_settings
+        mock_imap = MagicMock()
+        mock_imap.socket.return_value.pending.return_value = 0
+        mock_imap.file.peek.return_value = b""
+        mock_imap.readline.side_effect = [
+            b"+ idling\r\n",
+            b"* 4 EXISTS\r\n",
+            b"idle1 OK IDLE terminated\r\n",
+        ]
+        mock_select.return_value = ([mock_imap.socket.return_value], [], [])
+
+        fetcher = EmailFetcher()
+        fetcher.connected = True
+        fetcher.imap = mock_imap
+
+        assert fetcher.idle(timeout=10) is True
+        mock_imap.send.assert_any_call(b"idle1 IDLE\r\n")
+        mock_imap.send.assert_any_call(b"DONE\r\n")
+
+    @patch("app.services.email_fetcher.select.select")
+    @patch("app.services.email_fetcher.get_settings")
+    def test_idle_timeout(self, mock_get_settings, mock_select, mock_settings):
+        """Test d'un IDLE expiré sans notification du serveur."""
+        mock_get_settings.return_value = mock_settings
+        mock_imap = MagicMock()
+        mock_imap.socket.return_value.pending.return_value = 0
+        mock_imap.file.peek.return_value = b""
+        mock_imap.readline.side_effect = [
+            b"+ idling\r\n",
+            b"idle1 OK IDLE terminated\r\n",
+        ]
+        mock_select.return_value = ([], [], [])
+
+        fetcher = EmailFetcher()
+        fetcher.connected = True
+        fetcher.imap = mock_imap
+
+        assert fetcher.idle(timeout=2) is False
+        assert mock_select.call_count == 2
+        mock_imap.send.assert_any_call(b"DONE\r\n")
+
+    @patch("app.services.email_fetcher.get_settings")
+    def test_idle_notification_already_buffered(self, mock_get_settings, mock_settings):
+        """Test qu'une notification lue avec "+ idling" n'attend pas la socket."""
+        mock_get_settings.return_value = mock_settings
+        server, client = socket.socketpair()
+        try:
+            mock_imap = MagicMock()
+            mock_imap.socket.return_value = client
+            mock_imap.file = client.makefile("rb")
+            mock_imap.readline.side_effect = mock_imap.file.readline
+            # "+ idling" et la notification arrivent dans le même segment
+            server.sendall(b"+ idling\r\n* 4 EXISTS\r\n")
+
+            fetcher = EmailFetcher()
+            fetcher.connected = True
+            fetcher.imap = mock_imap
+            assert fetcher.imap.readline() == b"+ idling\r\n"
+
+            with patch("app.services.email_fetcher.select.select") as mock_select:
+                assert fetcher._wait_for_server_data(10) is True
+            mock_select.assert_not_called()
+            assert fetcher.imap.readline() == b"* 4 EXISTS\r\n"
+
+            # Buffer vide : peek() non bloquant, la socket reste utilisable
+            assert fetcher._has_buffered_data(client) is False
+            assert client.gettimeout() is None
+            server.sendall(b"* 5 EXISTS\r\n")
+            assert fetcher.imap.readline() == b"* 5 EXISTS\r\n"
+        finally:
+            server.close()
+            client.close()
+
+    @patch("app.services.email_fetcher.get_settings")
+    def test_supports_idle(self, mock_get_settings, mock_settings):
+        """Test de la détection de la capability IDLE."""
+        mock_get_settings.return_value = mock_settings
+        fetcher = EmailFetcher()
+        assert fetcher.supports_idle() is False
+
+        fetcher.connected = True
+        fetcher.imap = MagicMock()
+        fetcher.imap.capabilities = ("IMAP4REV1", "IDLE")
+        assert fetcher.supports_idle() is True
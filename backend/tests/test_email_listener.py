@@ -0,0 +1,20 @@
+"""
+Tests unitaires pour le listener IMAP IDLE.
+"""
+
+from unittest.mock import MagicMock, patch
+
+from app.cron.email_listener import EmailIdleListener
+
+
+def test_drain_rechecks_until_no_new_email():
+    """Test que la vérification est relancée tant que des emails arrivent pendant le traitement."""
+    with patch("app.cron.email_listener.get_settings"):
+        listener = EmailIdleListener(loop=MagicMock())
+    fetcher = MagicMock()
+
+    with patch.object(listener, "_process_new_emails", side_effect=[2, 1, 0]) as mock_process:
+        listener._drain_new_emails(fetcher)
+
+    assert mock_process.call_count == 3
+    mock_process.assert_called_with(fetcher)
@@ -0,0 +1,54 @@
+"""
+Tests unitaires pour le cache d'identification courtiers/clients.
+"""
+
+from app.utils.identity_cache import MISSING, IdentityCache
+
+
+def test_courtiers_snapshot():
+    """Test de l'instantané des courtiers (email insensible à la casse, invalidation)."""
+    cache = IdentityCache(ttl_seconds=300)
+    assert not cache.courtiers_loaded()
+
+    cache.set_courtiers([{"id": "c1", "email": "Jean.Dupont@Courtage.fr"}])
+
+    assert cache.courtiers_loaded()
+    assert cache.get_courtier_by_email(" jean.dupont@courtage.fr")["id"] == "c1"
+    assert cache.get_courtier_by_id("c1")["email"] == "Jean.Dupont@Courtage.fr"
+    assert cache.get_courtier_by_email("inconnu@courtage.fr") is None
+
+    cache.invalidate_courtiers()
+    assert not cache.courtiers_loaded()
+
+
+def test_clients_negative_and_invalidation():
+    """Test de la mise en cache des absences et de l'invalidation par client."""
+    cache = IdentityCache(ttl_seconds=300)
+    client = {"id": "cl1", "email_principal": "marie@example.com"}
+
+    assert cache.get_client("marie@example.com") is MISSING
+    cache.set_client("marie@example.com", client)
+    cache.set_client("MARIE.PRO@example.com", client)
+    cache.set_client("prospect@example.com", None)
+
+    assert cache.get_client("Marie@Example.com") == client
+    assert cache.get_client("prospect@example.com") is None
+
+    # Nouvelle adresse secondaire : toutes les adresses du client + l'adresse ajoutée
+    cache.invalidate_client("cl1", emails=["prospect@example.com"])
+    assert cache.get_client("marie@example.com") is MISSING
+    assert cache.get_client("marie.pro@example.com") is MISSING
+    assert cache.get_client("prospect@example.com") is MISSING
+
+
+def test_disabled_and_bounded():
+    """Test du cache désactivé (TTL 0) et de la borne sur le nombre d'adresses."""
+    disabled = IdentityCache(ttl_seconds=0)
+    disabled.set_client("marie@example.com", None)
+    assert disabled.get_client("marie@example.com") is MISSING
+
+    cache = IdentityCache(ttl_seconds=300, max_entries=2)
+    for email in ("a@x.fr", "b@x.fr", "c@x.fr"):
+        cache.set_client(email, None)
+    assert cache.get_client("a@x.fr") is MISSING
+    assert cache.get_client("c@x.fr") is None
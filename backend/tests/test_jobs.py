@@ -12,7 +12,9 @@ from app.workers.jobs import (
     process_nouveau_dossier,
     process_envoi_documents,
     process_modifier_liste,
-    calculate_file_hash
+    calculate_file_hash,
+    _create_pieces_manquantes,
+    _match_catalogue
 )
 
 
@@ -362,3 +364,34 @@ def test_calculate_file_hash_different_content(tmp_path):
     hash2 = calculate_file_hash(test_file2)
     
     assert hash1 != hash2
+
+
+@patch('app.workers.jobs.create_pieces_dossier_bulk')
+@patch('app.workers.jobs.get_pieces_by_client')
+def test_create_pieces_manquantes_single_insert(mock_get_pieces, mock_bulk):
+    """Test que les pièces attendues sont créées en une insertion, sans doublon."""
+    client = {"id": "22222222-2222-2222-2222-222222222222"}
+    mock_get_pieces.return_value = [{"type_piece_id": "t1", "statut": "recue"}]
+    types_pieces = [{"id": "t1", "nom_piece": "CNI"}, {"id": "t2", "nom_piece": "RIB"},
+                    {"id": "t3", "nom_piece": "Avis d'imposition"}, {"id": "t2", "nom_piece": "RIB"}]
+
+    ajoutes = _create_pieces_manquantes(client, types_pieces)
+
+    assert [t["id"] for t in ajoutes] == ["t2", "t3"]
+    mock_bulk.assert_called_once_with([
+        {"client_id": client["id"], "type_piece_id": "t2", "statut": "manquante"},
+        {"client_id": client["id"], "type_piece_id": "t3", "statut": "manquante"},
+    ])
+
+
+@patch('app.workers.jobs.get_types_pieces_by_type_pret')
+def test_match_catalogue_reports_unknown_pieces(mock_get_types):
+    """Test que les pièces hors catalogue sont renvoyées au lieu d'être ignorées."""
+    mock_get_types.return_value = [{"id": "t1", "nom_piece": "RIB"}, {"id": "t2", "nom_piece": "CNI"}]
+    pieces = [{"nom_piece": " rib "}, {"nom_piece": "Attestation employeur"}, {"nom_piece": "CNI"}]
+
+    types_pieces, hors_catalogue = _match_catalogue({"type_pret": "immobilier"}, pieces)
+
+    assert [t["id"] for t in types_pieces] == ["t1", "t2"]
+    assert hors_catalogue == ["Attestation employeur"]
+    mock_get_types.assert_called_once_with("immobilier")
@@ -0,0 +1,80 @@
+"""
+Tests unitaires pour le pool de serveurs LibreOffice.
+"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services import office_server
+from app.services.office_server import OfficeServerPool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    settings = MagicMock(
+        LIBREOFFICE_SERVER_POOL_SIZE=1,
+        LIBREOFFICE_SERVER_BASE_PORT=2003,
+        DOCUMENT_TEMP_DIR=str(tmp_path),
+    )
+    with patch.object(office_server, "get_settings", return_value=settings), \
+         patch.object(office_server.subprocess, "Popen") as mock_popen:
+        mock_popen.return_value.poll.return_value = None
+        yield OfficeServerPool(), mock_popen
+
+
+def test_instance_ready_when_listening(pool):
+    """Test qu'une instance n'est prête qu'une fois son port à l'écoute."""
+    pool, mock_popen = pool
+    pool._spawn(0)
+
+    with patch.object(office_server, "_is_listening", return_value=False):
+        pool._check_instance(0)
+    assert pool._ready == [False]
+
+    with patch.object(office_server, "_is_listening", return_value=True):
+        pool._check_instance(0)
+    assert pool._ready == [True]
+    assert pool._failures == [0]
+
+
+def test_backoff_then_disabled(pool):
+    """Test de la relance exponentielle puis de l'abandon après échecs consécutifs."""
+    pool, mock_popen = pool
+    # Instance qui s'arrête aussitôt (ex: module uno introuvable)
+    mock_popen.return_value.poll.return_value = 1
+    pool._spawn(0)
+
+    delays = []
+    with patch.object(office_server.time, "monotonic", return_value=1000.0):
+        for _ in range(office_server._MAX_CONSECUTIVE_FAILURES):
+            pool._check_instance(0)
+            if pool._disabled[0]:
+                break
+            delays.append(pool._next_start[0] - 1000.0)
+            # Échéance atteinte : relance
+            pool._next_start[0] = 0.0
+            pool._check_instance(0)
+
+    assert delays == [5, 10, 20, 40]
+    assert pool._disabled == [True]
+    assert not pool.enabled
+    assert mock_popen.call_count == office_server._MAX_CONSECUTIVE_FAILURES
+
+    # Instance abandonnée : plus de relance
+    pool._check_instance(0)
+    assert mock_popen.call_count == office_server._MAX_CONSECUTIVE_FAILURES
+
+
+def test_hung_instance_restarted(pool):
+    """Test qu'une instance sans écoute après le délai de démarrage est arrêtée."""
+    pool, mock_popen = pool
+    pool._spawn(0)
+    pool._started_at[0] -= office_server._STARTUP_TIMEOUT + 1
+
+    with patch.object(office_server, "_is_listening", return_value=False):
+        pool._check_instance(0)
+
+    mock_popen.return_value.terminate.assert_called_once()
+    assert pool._processes == [None]
+    assert pool._failures == [1]
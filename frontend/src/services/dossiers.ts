@@ -13,6 +13,8 @@ import type { Dossier, DossierDetail, StatutDossier } from '../types';
 
 /**
  * Liste tous les dossiers du courtier authentifié.
+ *
+ * Sans limit ni cursor, l'API retourne la liste complète en une réponse.
  */
 export const listDossiers = async (statut?: StatutDossier): Promise<Dossier[]> => {
   const params = statut ? { statut } : {};